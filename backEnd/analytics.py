@@ -0,0 +1,503 @@
+# pyre-ignore-all-errors
+"""
+FHSIS analytics for /api/admin/analytics.
+
+The dashboard is answered from daily rollups instead of scanning
+appointments with ILIKE filters on every load:
+
+  analytics_daily_counts          appointments per (day, metric, dimension, status)
+  analytics_program_appointments  appointment ids per program, for the patient lists
+  analytics_dirty_days            days changed since their last refresh
+
+Triggers on appointments (and on users' address columns) mark days dirty;
+refresh_dirty() recomputes only those days. It runs on a ScheduledJob
+(ANALYTICS_REFRESH_INTERVAL) and before each rollup read, so responses are
+never staler than the latest commit. live_analytics() is the original
+direct query, used when the rollup tables are missing and by
+benchmarks/bench_analytics.py.
+"""
+import os
+import time
+from datetime import date, timedelta
+
+import psycopg2.extras  # type: ignore
+
+from database import db_connection  # type: ignore
+from scheduler import ScheduledJob  # type: ignore
+
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv('ANALYTICS_REFRESH_INTERVAL', '60'))
+ANALYTICS_LOCK_ID = 2
+
+# Keyword filters over appointments (every query here takes parameters, hence %%)
+PRENATAL_FILTER = """(
+    service_type ILIKE '%%prenatal%%'
+    OR service_type ILIKE '%%maternal%%'
+    OR service_type ILIKE '%%antenatal%%'
+    OR service_type ILIKE '%%obstetric%%'
+)"""
+
+IMMUNIZATION_FILTER = """(
+    service_type ILIKE '%%immuniz%%'
+    OR service_type ILIKE '%%vaccin%%'
+    OR service_type ILIKE '%%bcg%%'
+    OR service_type ILIKE '%%hepatitis%%'
+    OR service_type ILIKE '%%polio%%'
+    OR service_type ILIKE '%%measles%%'
+    OR service_type ILIKE '%%pentavalent%%'
+)"""
+
+# Breakdown by vaccine type (simple keyword match)
+VACCINE_TYPES = {
+    'BCG':        "service_type ILIKE '%%bcg%%'",
+    'Hepatitis B':"service_type ILIKE '%%hepatitis%%'",
+    'Oral Polio': "service_type ILIKE '%%polio%%'",
+    'Measles':    "service_type ILIKE '%%measles%%'",
+    'Pentavalent':"service_type ILIKE '%%pentavalent%%'",
+}
+
+# The generic immunization bucket
+OTHER_VACCINE_FILTER = """(
+    (service_type ILIKE '%%immuniz%%' OR service_type ILIKE '%%vaccin%%')
+    AND service_type NOT ILIKE '%%bcg%%'
+    AND service_type NOT ILIKE '%%hepatitis%%'
+    AND service_type NOT ILIKE '%%polio%%'
+    AND service_type NOT ILIKE '%%measles%%'
+    AND service_type NOT ILIKE '%%pentavalent%%'
+)"""
+
+TB_FILTER = """(
+    service_type ILIKE '%%dots%%'
+    OR service_type ILIKE '%%tuberculosis%%'
+    OR service_type ILIKE '%% tb %%'
+    OR service_type ILIKE '%%tb-%%'
+    OR service_type ILIKE '%%-tb%%'
+    OR diagnosis ILIKE '%%tuberculosis%%'
+    OR diagnosis ILIKE '%%tb%%'
+)"""
+
+DENGUE_FILTER = "(diagnosis ILIKE '%%dengue%%' OR service_type ILIKE '%%dengue%%')"
+
+HOTSPOT_AREA = "COALESCE(u.subdivision, u.barangay, u.address, 'Unknown Area')"
+
+
+# ── Shared helpers ─────────────────────────────────────────────────
+def parse_as_of(value):
+    """?as_of=YYYY-MM-DD -> date (None when absent); raises ValueError on bad input."""
+    return date.fromisoformat(value) if value else None
+
+
+def _params(as_of):
+    """
+    Query bounds: appointments up to `as_of` (no bound without it), and this
+    month / last month relative to it.
+    """
+    anchor = as_of or date.today()
+    this_month_start = anchor.replace(day=1)
+    # Last month: subtract one day from this_month_start to get last day of prev month
+    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
+    return {
+        'upto': as_of or date.max,
+        'anchor': anchor,
+        'this_month_start': this_month_start,
+        'last_month_start': last_month_start,
+    }
+
+
+def _trend(this_m, last_m):
+    if last_m == 0:
+        return 'stable'
+    if this_m > last_m:
+        return 'up'
+    if this_m < last_m:
+        return 'down'
+    return 'stable'
+
+
+def _format_patients(rows):
+    patients = []
+    for p in rows:
+        row = dict(p)
+        if row.get('appointment_date'):
+            row['appointment_date'] = row['appointment_date'].strftime('%b %d, %Y')
+        patients.append(row)
+    return patients
+
+
+def _hotspots(rows):
+    """[(area, count)] ranked -> hotspot cards; the top area is High, the next two Medium."""
+    hotspots = []
+    for i, (area, count) in enumerate(rows):
+        if i == 0:
+            level = 'High'
+        elif i <= 2:
+            level = 'Medium'
+        else:
+            level = 'Low'
+        hotspots.append({'area': area, 'count': count, 'level': level})
+    return hotspots
+
+
+def _payload(as_of, source, prenatal_count, prenatal_prev, prenatal_patients,
+             immunization_count, immunization_prev, breakdown, immunization_patients,
+             tb_completed, tb_total, tb_patients, morbidity, dengue_hotspots, dengue_total):
+    tb_pct = float(round((tb_completed / tb_total * 100), 1)) if tb_total > 0 else 0.0
+    return {
+        "as_of": as_of.isoformat() if as_of else None,
+        "source": source,
+        "prenatal": {
+            "count":      prenatal_count,
+            "prev_month": prenatal_prev,
+            "target":     1600,
+            "patients":   prenatal_patients
+        },
+        "immunization": {
+            "count":      immunization_count,
+            "prev_month": immunization_prev,
+            "target_pct": 95,
+            "breakdown":  breakdown,
+            "patients":   immunization_patients
+        },
+        "tb_treatment": {
+            "completed":   tb_completed,
+            "total":       tb_total,
+            "success_pct": tb_pct,
+            "patients":    tb_patients
+        },
+        "morbidity": morbidity,
+        "dengue_hotspots": dengue_hotspots,
+        "dengue_total": dengue_total
+    }
+
+
+# ── Direct queries over appointments ───────────────────────────────
+def live_analytics(cur, as_of=None):
+    """Compute the dashboard straight from appointments (RealDictCursor)."""
+    p = _params(as_of)
+
+    # ── 1. Prenatal visits ─────────────────────────────────────────
+    cur.execute(f"""
+        SELECT COUNT(*) as n,
+               COUNT(*) FILTER (WHERE appointment_date >= %(last_month_start)s
+                                  AND appointment_date < %(this_month_start)s) as prev_month
+        FROM appointments
+        WHERE {PRENATAL_FILTER} AND appointment_date <= %(upto)s
+    """, p)
+    row = cur.fetchone()
+    prenatal_count, prenatal_prev = row['n'], row['prev_month']
+
+    # Prenatal modal patients
+    cur.execute(f"""
+        SELECT
+            u.first_name || ' ' || u.last_name AS patient_name,
+            a.appointment_date,
+            a.service_type
+        FROM appointments a
+        JOIN users u ON a.user_id = u.id
+        WHERE {PRENATAL_FILTER}
+          AND a.status NOT IN ('cancelled')
+          AND a.appointment_date <= %(upto)s
+        ORDER BY a.appointment_date DESC, a.id DESC
+    """, p)
+    prenatal_patients = _format_patients(cur.fetchall())
+
+    # ── 2. Immunization ────────────────────────────────────────────
+    # Totals and the per-vaccine breakdown (plus the generic "Other" bucket) in one
+    # pass; every vaccine keyword is part of IMMUNIZATION_FILTER
+    vaccines = {**VACCINE_TYPES, 'Other': OTHER_VACCINE_FILTER}
+    vaccine_counts = ",\n               ".join(
+        f"COUNT(*) FILTER (WHERE {cond}) as vaccine_{i}" for i, cond in enumerate(vaccines.values()))
+    cur.execute(f"""
+        SELECT COUNT(*) as n,
+               COUNT(*) FILTER (WHERE appointment_date >= %(last_month_start)s
+                                  AND appointment_date < %(this_month_start)s) as prev_month,
+               {vaccine_counts}
+        FROM appointments
+        WHERE {IMMUNIZATION_FILTER} AND appointment_date <= %(upto)s
+    """, p)
+    row = cur.fetchone()
+    immunization_count, immunization_prev = row['n'], row['prev_month']
+    breakdown = {vaccine: row[f'vaccine_{i}'] for i, vaccine in enumerate(vaccines)}
+
+    # Immunization patients
+    cur.execute(f"""
+        SELECT
+            u.first_name || ' ' || u.last_name AS patient_name,
+            a.appointment_date,
+            a.service_type,
+            a.status
+        FROM appointments a
+        JOIN users u ON a.user_id = u.id
+        WHERE {IMMUNIZATION_FILTER}
+          AND a.status NOT IN ('cancelled')
+          AND a.appointment_date <= %(upto)s
+        ORDER BY a.appointment_date DESC, a.id DESC
+    """, p)
+    immunization_patients = _format_patients(cur.fetchall())
+
+    # ── 3. TB / DOTS Treatment Success ────────────────────────────
+    cur.execute(f"""
+        SELECT status, COUNT(*) as n
+        FROM appointments
+        WHERE {TB_FILTER} AND appointment_date <= %(upto)s
+        GROUP BY status
+    """, p)
+    tb_rows = cur.fetchall()
+    tb_total     = sum(r['n'] for r in tb_rows)
+    tb_completed = sum(r['n'] for r in tb_rows if r['status'] == 'completed')
+
+    # TB patients
+    cur.execute(f"""
+        SELECT
+            u.first_name || ' ' || u.last_name AS patient_name,
+            a.appointment_date,
+            a.service_type,
+            a.status
+        FROM appointments a
+        JOIN users u ON a.user_id = u.id
+        WHERE {TB_FILTER} AND a.appointment_date <= %(upto)s
+        ORDER BY a.appointment_date DESC, a.id DESC
+    """, p)
+    tb_patients = _format_patients(cur.fetchall())
+
+    # ── 4. Top Morbidity (by diagnosis) ───────────────────────────
+    # Trend compares this month (up to the anchor day) with last month, per diagnosis
+    cur.execute("""
+        SELECT diagnosis, COUNT(*) as cases,
+               COUNT(*) FILTER (WHERE appointment_date >= %(this_month_start)s
+                                  AND appointment_date < %(anchor)s) as this_month,
+               COUNT(*) FILTER (WHERE appointment_date >= %(last_month_start)s
+                                  AND appointment_date < %(this_month_start)s) as last_month
+        FROM appointments
+        WHERE status = 'completed'
+          AND diagnosis IS NOT NULL
+          AND diagnosis != ''
+          AND appointment_date <= %(upto)s
+        GROUP BY diagnosis
+        ORDER BY cases DESC, diagnosis COLLATE "C"
+        LIMIT 10
+    """, p)
+    morbidity = [
+        {
+            'name':  row['diagnosis'],
+            'cases': row['cases'],
+            'trend': _trend(row['this_month'], row['last_month'])
+        }
+        for row in cur.fetchall()
+    ]
+
+    # Also include service_type as fallback if no diagnoses recorded
+    if not morbidity:
+        cur.execute("""
+            SELECT service_type as name, COUNT(*) as cases
+            FROM appointments
+            WHERE service_type IS NOT NULL AND service_type != ''
+              AND appointment_date <= %(upto)s
+            GROUP BY service_type
+            ORDER BY cases DESC, service_type COLLATE "C"
+            LIMIT 10
+        """, p)
+        for row in cur.fetchall():
+            morbidity.append({
+                'name':  row['name'],
+                'cases': row['cases'],
+                'trend': 'stable'
+            })
+
+    # ── 5. Dengue Hotspots ─────────────────────────────────────────
+    cur.execute(f"""
+        SELECT
+            {HOTSPOT_AREA} as area,
+            COUNT(*) as case_count
+        FROM appointments a
+        JOIN users u ON a.user_id = u.id
+        WHERE {DENGUE_FILTER}
+          AND a.status = 'completed'
+          AND a.appointment_date <= %(upto)s
+        GROUP BY area
+        ORDER BY case_count DESC, {HOTSPOT_AREA} COLLATE "C"
+        LIMIT 5
+    """, p)
+    dengue_hotspots = _hotspots([(r['area'], r['case_count']) for r in cur.fetchall()])
+
+    # Total dengue count for the card
+    cur.execute(f"""
+        SELECT COUNT(*) as n FROM appointments
+        WHERE {DENGUE_FILTER}
+          AND status = 'completed'
+          AND appointment_date <= %(upto)s
+    """, p)
+    dengue_total = cur.fetchone()['n']
+
+    return _payload(as_of, 'live', prenatal_count, prenatal_prev, prenatal_patients,
+                    immunization_count, immunization_prev, breakdown, immunization_patients,
+                    tb_completed, tb_total, tb_patients, morbidity, dengue_hotspots, dengue_total)
+
+
+# ── Rollups ────────────────────────────────────────────────────────
+# One row per metric an appointment counts towards; dimension '' when the metric has none
+_METRICS = ",\n            ".join(
+    [f"('prenatal', '', {PRENATAL_FILTER})",
+     f"('immunization', '', {IMMUNIZATION_FILTER})"]
+    + [f"('vaccine', '{name}', {cond})" for name, cond in VACCINE_TYPES.items()]
+    + [f"('vaccine', 'Other', {OTHER_VACCINE_FILTER})",
+       f"('tb', '', {TB_FILTER})",
+       "('diagnosis', a.diagnosis, a.diagnosis IS NOT NULL AND a.diagnosis != '')",
+       "('service_type', a.service_type, a.service_type IS NOT NULL AND a.service_type != '')",
+       f"('dengue', '', {DENGUE_FILTER})",
+       f"('dengue_area', {HOTSPOT_AREA}, {DENGUE_FILTER} AND u.id IS NOT NULL)"]
+)
+
+_PROGRAMS = ",\n            ".join([
+    f"('prenatal', {PRENATAL_FILTER})",
+    f"('immunization', {IMMUNIZATION_FILTER})",
+    f"('tb', {TB_FILTER})",
+])
+
+
+def refresh_days(cur, days):
+    """Recompute both rollup tables for the given days."""
+    cur.execute("DELETE FROM analytics_daily_counts WHERE day = ANY(%(days)s)", {'days': days})
+    cur.execute(f"""
+        INSERT INTO analytics_daily_counts (day, metric, dimension, status, count)
+        SELECT a.appointment_date, m.metric, m.dimension, a.status, COUNT(*)
+        FROM appointments a
+        LEFT JOIN users u ON u.id = a.user_id
+        CROSS JOIN LATERAL (VALUES
+            {_METRICS}
+        ) AS m(metric, dimension, hit)
+        WHERE a.appointment_date = ANY(%(days)s) AND m.hit
+        GROUP BY a.appointment_date, m.metric, m.dimension, a.status
+    """, {'days': days})
+
+    cur.execute("DELETE FROM analytics_program_appointments WHERE appointment_date = ANY(%(days)s)", {'days': days})
+    cur.execute(f"""
+        INSERT INTO analytics_program_appointments (program, appointment_id, appointment_date)
+        SELECT m.program, a.id, a.appointment_date
+        FROM appointments a
+        CROSS JOIN LATERAL (VALUES
+            {_PROGRAMS}
+        ) AS m(program, hit)
+        WHERE a.appointment_date = ANY(%(days)s) AND m.hit
+    """, {'days': days})
+
+
+def refresh_dirty():
+    """
+    Claim and recompute every dirty day in one transaction. Concurrent callers
+    skip days another refresh has claimed, so they never block each other.
+    """
+    started = time.perf_counter()
+    with db_connection() as (conn, cur):
+        cur.execute("""
+            DELETE FROM analytics_dirty_days
+            WHERE day IN (SELECT day FROM analytics_dirty_days FOR UPDATE SKIP LOCKED)
+            RETURNING day
+        """)
+        days = [row[0] for row in cur.fetchall()]
+        if days:
+            refresh_days(cur, days)
+    return {'days': len(days), 'elapsed_s': round(time.perf_counter() - started, 3)}
+
+
+def rebuild_rollups():
+    """Mark every appointment day dirty and recompute (e.g. after changing a filter)."""
+    with db_connection() as (conn, cur):
+        cur.execute("""
+            INSERT INTO analytics_dirty_days (day)
+            SELECT DISTINCT appointment_date FROM appointments
+            UNION SELECT DISTINCT day FROM analytics_daily_counts
+            ON CONFLICT DO NOTHING
+        """)
+    return refresh_dirty()
+
+
+def rollup_analytics(cur, as_of=None):
+    """Compute the dashboard from the rollup tables (RealDictCursor)."""
+    p = _params(as_of)
+
+    cur.execute("""
+        SELECT metric, dimension, status,
+               SUM(count) AS total,
+               SUM(count) FILTER (WHERE day >= %(this_month_start)s AND day < %(anchor)s) AS this_month,
+               SUM(count) FILTER (WHERE day >= %(last_month_start)s AND day < %(this_month_start)s) AS last_month
+        FROM analytics_daily_counts
+        WHERE day <= %(upto)s
+        GROUP BY metric, dimension, status
+    """, p)
+    counts = {}
+    for row in cur.fetchall():
+        by_status = counts.setdefault(row['metric'], {}).setdefault(row['dimension'], {})
+        by_status[row['status']] = (int(row['total']), int(row['this_month'] or 0), int(row['last_month'] or 0))
+
+    def total(metric, dimension='', status=None, column=0):
+        by_status = counts.get(metric, {}).get(dimension, {})
+        return sum(v[column] for s, v in by_status.items() if status is None or s == status)
+
+    def ranked(metric, status=None, limit=10):
+        dims = [(dim, total(metric, dim, status)) for dim in counts.get(metric, {})]
+        dims = [(dim, n) for dim, n in dims if n > 0]
+        # Ties by byte order, matching COLLATE "C" in live_analytics
+        dims.sort(key=lambda d: (-d[1], d[0]))
+        return dims[:limit]
+
+    def patients(program, with_status=True, exclude_cancelled=True):
+        # Built as JSON by Postgres: these lists run to tens of thousands of rows
+        cur.execute(f"""
+            SELECT COALESCE(json_agg(json_build_object(
+                'patient_name', u.first_name || ' ' || u.last_name,
+                'appointment_date', to_char(a.appointment_date, 'Mon DD, YYYY'),
+                'service_type', a.service_type
+                {", 'status', a.status" if with_status else ''}
+            ) ORDER BY p.appointment_date DESC, a.id DESC), '[]') AS patients
+            FROM analytics_program_appointments p
+            JOIN appointments a ON a.id = p.appointment_id
+            JOIN users u ON a.user_id = u.id
+            WHERE p.program = %(program)s
+              AND p.appointment_date <= %(upto)s
+              {"AND a.status NOT IN ('cancelled')" if exclude_cancelled else ''}
+        """, {**p, 'program': program})
+        return cur.fetchone()['patients']
+
+    breakdown = {vaccine: total('vaccine', vaccine) for vaccine in VACCINE_TYPES}
+    breakdown['Other'] = total('vaccine', 'Other')
+
+    morbidity = [
+        {'name': diag, 'cases': cases,
+         'trend': _trend(total('diagnosis', diag, 'completed', 1), total('diagnosis', diag, 'completed', 2))}
+        for diag, cases in ranked('diagnosis', 'completed')
+    ]
+    # Also include service_type as fallback if no diagnoses recorded
+    if not morbidity:
+        morbidity = [{'name': name, 'cases': cases, 'trend': 'stable'} for name, cases in ranked('service_type')]
+
+    return _payload(
+        as_of, 'rollup',
+        total('prenatal'), total('prenatal', column=2),
+        patients('prenatal', with_status=False),
+        total('immunization'), total('immunization', column=2), breakdown,
+        patients('immunization'),
+        total('tb', status='completed'), total('tb'),
+        patients('tb', exclude_cancelled=False),
+        morbidity,
+        _hotspots(ranked('dengue_area', 'completed', limit=5)),
+        total('dengue', status='completed'),
+    )
+
+
+def get_analytics(as_of=None, source='rollup'):
+    """Dashboard payload; falls back to direct queries if the rollups can't be used."""
+    if source != 'live':
+        try:
+            refresh_dirty()
+            with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+                return rollup_analytics(cur, as_of)
+        except Exception as e:
+            # Rollup tables missing (migration not applied) or refresh failed
+            print(f"[Analytics] Rollups unavailable, querying appointments directly: {e}")
+    with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+        return live_analytics(cur, as_of)
+
+
+def start_analytics_refresh(app, interval=ANALYTICS_REFRESH_INTERVAL):
+    """Keep the rollups warm so dashboard loads rarely find dirty days."""
+    return ScheduledJob('analytics_rollup', ANALYTICS_LOCK_ID, interval, refresh_dirty, app=app).start()
@@ -1,22 +1,21 @@
 # pyre-ignore-all-errors
-from flask import Flask, request, jsonify  # type: ignore
+from flask import Flask, request, jsonify, Response, stream_with_context  # type: ignore
 from typing import Set, Optional, List, Any, Dict
 from flask_cors import CORS  # type: ignore
 from werkzeug.utils import secure_filename  # type: ignore
 from psycopg2 import sql  # type: ignore
 import psycopg2.extras  # type: ignore
 from psycopg2.extras import RealDictCursor  # type: ignore
-from database import get_db_connection  # type: ignore
+from database import get_db_connection, init_app as init_db_pool, pool_stats  # type: ignore
 import random
 import time
 import string
 from flask_bcrypt import Bcrypt  # type: ignore
 import os
 from dotenv import load_dotenv  # type: ignore
-import requests  # type: ignore
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps  # type: ignore
-import io
+from image_preprocess import ImageTooLarge, preprocess_image  # type: ignore
 import re
+import base64
 from datetime import datetime, date, timedelta
 from email_config import (  # type: ignore
     init_mail,
@@ -34,7 +33,20 @@ from email_config import (  # type: ignore
     send_walkin_patient_credentials_email,
     check_forgot_cooldown,
 )
-from reminder_service import start_reminder_service # type: ignore
+from reminder_service import reminder_stats, start_reminder_service # type: ignore
+from email_outbox import EmailOutbox  # type: ignore
+from response_cache import ResponseCache  # type: ignore
+from live_events import live_hub, notify_appointment_change  # type: ignore
+from live_queue import live_queue  # type: ignore
+from wait_estimator import wait_estimator  # type: ignore
+from analytics import get_analytics, parse_as_of, start_analytics_refresh  # type: ignore
+from ocr_backends import OCRError, OCRNoText, OCRTimeout, get_ocr_backend, recognize_sides  # type: ignore
+from ocr_cache import CachedOCRBackend, OCRResultCache, content_key  # type: ignore
+from ocr_jobs import OCRJobManager, QueueFull  # type: ignore
+from ocr_parser import BatchStats, PHIDParser, format_ocr_dump, parse_batch  # type: ignore
+from ocr_log import debug_buffer, event, log as ocr_log, sampled  # type: ignore
+import logging
+import json
 load_dotenv()
 
 START_TIME = datetime.now()
@@ -43,6 +55,12 @@ app = Flask(__name__, static_folder='static')
 CORS(app)
 bcrypt = Bcrypt(app)
 mail = init_mail(app)  # Initialize Flask-Mail
+# Handlers queue mail here instead of talking SMTP inline (EMAIL_* settings in email_outbox.py)
+email_outbox = EmailOutbox(app, mail)
+app.extensions['email_outbox'] = email_outbox
+# Polled admin dashboard endpoints (see @response_cache.cached below)
+response_cache = ResponseCache()
+init_db_pool(app)  # Return pooled DB connections at the end of every request
 
 # In-memory rate limit for public contact form (email + IP -> last submit datetime).
 # Resets when the server restarts.
@@ -159,12 +177,28 @@ try:
     conn.close()
     print("Database connection verified and schema updated.")
 
+    try:
+        email_outbox.start()
+        print(f"Email outbox workers started ({email_outbox.workers}).")
+    except Exception as e:
+        print(f"Failed to start email outbox workers: {e}")
+
     # Start the Appointment Reminder Service
     try:
-        start_reminder_service(app, mail)
+        app.extensions['reminder_scheduler'] = start_reminder_service(app, mail)
         print("Appointment Reminder Service activated.")
     except Exception as e:
         print(f"Failed to start Reminder Service: {e}")
+
+    try:
+        app.extensions['analytics_refresh'] = start_analytics_refresh(app)
+    except Exception as e:
+        print(f"Failed to start analytics rollup refresh: {e}")
+
+    # Builds today's in-memory queue and keeps it (and the live streams) current
+    if live_hub.enabled:
+        live_hub.start()
+        print("Live events listener started.")
 except Exception as e:
     print(f"CRITICAL: Database connection failed at startup: {e}")
 
@@ -173,1084 +207,66 @@ def get_db():
 
 OCR_API_KEY = os.getenv('OCR_API_KEY')
 
-# ============= ADVANCED OCR PREPROCESSING =============
-def preprocess_image(image_bytes):
-    """Enhanced image preprocessing for better OCR accuracy"""
-    img = Image.open(io.BytesIO(image_bytes))
-    
-    # Convert to RGB if needed
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # 1. Scale image to optimal OCR size (large enough to read, but strict < 1MB limit for OCR.space)
-    target_width = 1200
-    if img.width != target_width:
-        ratio = target_width / img.width
-        img = img.resize((target_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
-    
-    # 2. Normalize lighting/contrast
-    img = ImageOps.autocontrast(img, cutoff=1)
-    
-    # 3. Enhance local contrast
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.5)  # Reverted to 1.5 to prevent noise
-    
-    # 4. Enhance sharpness
-    enhancer = ImageEnhance.Sharpness(img)
-    img = enhancer.enhance(1.8)  # Reverted slightly from 2.5 to prevent artifacts
-    
-    # 5. Convert to grayscale
-    img = img.convert('L')
-    
-    # Save to bytes (quality 85 to ensure 1400px image stays under 1000KB)
-    output = io.BytesIO()
-    img.save(output, format='JPEG', quality=85)
-    
-    size_kb = len(output.getvalue()) / 1024
-    print(f"[OCR PREPROCESSOR] Final image width: {img.width}px, File size: {size_kb:.1f} KB")
-    
-    return output.getvalue()
-
-# ============= FIELD VALIDATORS =============
-class FieldValidator:
-    @staticmethod
-    def validate_name(text):
-        """Validate and clean name fields"""
-        if not text:
-            return None, 0.0
-        cleaned = re.sub(r'[^a-zA-Z\s\-]', '', text).strip()
-        if not cleaned or len(cleaned) < 2:
-            return None, 0.0
-        confidence = 0.9 if len(cleaned) > 2 else 0.6
-        return cleaned.title(), confidence
-    
-    @staticmethod
-    def validate_date(text):
-        """Validate and parse date fields"""
-        if not text:
-            return None, 0.0
-        
-        # Try multiple patterns
-        patterns = [
-            (r'(\d{4})[/-](\d{2})[/-](\d{2})', '%Y-%m-%d', 0.95),
-            (r'(\d{2})[/-](\d{2})[/-](\d{4})', '%m/%d/%Y', 0.90),
-            (r'(JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[a-z]*\s+(\d{1,2})[\s,]+(\d{4})', 'text', 0.85)
-        ]
-        
-        for pattern, fmt, conf in patterns:
-            match = re.search(pattern, text, re.I)
-            if match:
-                try:
-                    if fmt == 'text':
-                        months = {'JAN':'01','FEB':'02','MAR':'03','APR':'04','MAY':'05','JUN':'06',
-                                 'JUL':'07','AUG':'08','SEP':'09','OCT':'10','NOV':'11','DEC':'12'}
-                        month_name = str(match.group(1) or "")
-                        m = months.get(month_name[0:3].upper(), "01")  # type: ignore
-                        d = str(match.group(2) or "01").zfill(2)
-                        y = str(match.group(3))
-                        return f"{y}-{m}-{d}", conf
-                    elif fmt == '%m/%d/%Y':
-                        date_str = f"{match.group(1)}/{match.group(2)}/{match.group(3)}"
-                        dt = datetime.strptime(date_str, fmt)
-                        return dt.strftime('%Y-%m-%d'), conf
-                    else:
-                        date_str = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
-                        return date_str, conf
-                except:
-                    continue
-        return None, 0.0
-    
-    @staticmethod
-    def validate_gender(text):
-        """Validate gender field"""
-        if not text:
-            return None, 0.0
-        
-        clean = text.upper()
-        if 'FEMALE' in clean or clean == 'F':
-            return 'Female', 0.95
-        elif 'MALE' in clean or clean == 'M':
-            return 'Male', 0.95
-        return None, 0.0
-
-# ============= ADVANCED OCR PARSER =============
-class PHIDParser:
-    def __init__(self, expected_id_type=None):
-        self.expected_id_type = expected_id_type
-        self.fields = {
-            'first_name': None,
-            'middle_name': None,
-            'last_name': None,
-            'suffix': None,
-            'dob': None,
-            'gender': None,
-            'phone': None,
-            'contact': None, # Match registration form key
-            'address': None,
-            'city': None,
-            'id_type': expected_id_type if expected_id_type else 'Government ID',
-            'crn': None,
-            'email': None,
-            'region': None,
-            'region_name': None,
-            'province': None,
-            'province_name': None,
-            'city_code': None,
-            'barangay': None,
-            'barangay_code': None
-        }
-        self.confidence = {}
-    
-    def parse(self, text):
-        """Parse OCR text with confidence scoring"""
-        print("\n>>> INITIALIZING V4 PARSER (Address Precision Patch) <<<")
-        lines = [l.strip() for l in text.split('\n') if len(l.strip()) > 1]
-        clean_text = text.replace('\n', ' ')
-        
-        # 0. Identify ID Type for better guidance
-        self._identify_id_type(clean_text)
-        
-        # 1. Extract Names
-        self._extract_names(lines)
-        self._extract_suffix_from_names()
-        
-        # 2. Extract DOB
-        self._extract_dob(clean_text)
-        
-        # 3. Extract Gender
-        self._extract_gender(text)
-        
-        # 4. Extract CRN/ID No.
-        self._extract_crn(clean_text)
-        
-        # 5. Extract Phone Number
-        self._extract_phone(text)
-        
-        # 5b. Extract Email
-        self._extract_email(clean_text)
 
-        # 5c. Extract PhilHealth ID
-        self._extract_philhealth_id(clean_text)
+# OCR text per preprocessed image and parser output per text (OCR_CACHE_*)
+ocr_cache = OCRResultCache()
 
-        # 6. Extract Address
-        self._extract_address(lines, clean_text)
-        
-        return self.fields, self.confidence
-    
-    def _identify_id_type(self, text):
-        """Detect the type of Philippine ID from OCR text"""
-        if self.expected_id_type:
-             print(f"[ID TYPE] Using user-selected type: {self.expected_id_type}")
-             self.fields['id_type'] = self.expected_id_type
-             return
-             
-        ul = text.upper()
-        if 'POSTAL' in ul: self.fields['id_type'] = 'Postal ID'
-        elif any(k in ul for k in ['SOCIAL SECURITY', ' SSS ']): self.fields['id_type'] = 'SSS ID'
-        elif 'UNIFIED MULTI-PURPOSE' in ul or 'UMID' in ul: self.fields['id_type'] = 'UMID ID'
-        elif any(k in ul for k in ['PHILIPPINES IDENTIFICATION', 'NATIONAL ID', 'PHILID']): self.fields['id_type'] = 'National ID'
-        elif 'PROFESSIONAL REGULATION' in ul or ' PRC ' in ul: self.fields['id_type'] = 'PRC ID'
-        elif 'VOTER' in ul: self.fields['id_type'] = 'Voter\'s ID'
-        elif 'PHILHEALTH' in ul: self.fields['id_type'] = 'PhilHealth ID'
-        elif 'DRIVER' in ul and 'LICENSE' in ul: self.fields['id_type'] = 'Driver\'s License'
-        print(f"[ID TYPE] Auto-identified as: {self.fields['id_type']}")
-
-    def _extract_crn(self, text):
-        """Extract CRN or ID Number"""
-        patterns = [
-            r'CRN[:\s]*(\d{4}-\d{7}-\d)',  # UMID pattern: 0028-1215160-9
-            r'ID\s*NO\.?[:\s]*([A-Z0-9-]{10,20})',
-            r'SSS\s*NO\.?[:\s]*(\d{2}-\d{7}-\d)',
-            r'PRC\s*NO\.?[:\s]*(\d{7})'
-        ]
-        
-        # Strategy 1: Look for patterns in the whole text (same line)
-        for p in patterns:
-             match = re.search(p, text.upper())
-             if match:
-                 self.fields['crn'] = match.group(1)
-                 self.confidence['crn'] = 0.95
-                 print(f"[CRN] Found via same-line: {self.fields['crn']}")
-                 return
-        
-        # Strategy 2: Look for ID Number labels and grab the next word/line
-        crn_labels = ['ID NUMBER', 'ID NO', 'CRN', 'NATIONAL ID', 'PHILID']
-        lines = text.split('\n')
-        for i, line in enumerate(lines):
-            if any(l in line.upper() for l in crn_labels):
-                # Check next 2 lines for a potential ID number (alphanumeric, 6-20 chars)
-                search_scope = " ".join(lines[i:min(i+3, len(lines))])
-                # Remove the label itself to avoid matching it
-                clean_scope = search_scope.replace(line, '').strip()
-                match = re.search(r'\b([A-Z0-9-]{6,20})\b', clean_scope)
-                if match:
-                     self.fields['crn'] = match.group(1)
-                     self.confidence['crn'] = 0.85
-                     print(f"[CRN] Found via next-line search: {self.fields['crn']}")
-                     return
-
-    def _extract_philhealth_id(self, text):
-        """Extract PhilHealth ID (Format: XX-XXXXXXXXX-X)"""
-        # Look for 12 digits potentially with dashes or common OCR errors (O for 0, I/l for 1)
-        # Normalize O/o to 0, I/i/l to 1 for this specific field
-        normalized_text = text.upper().replace('O', '0').replace('I', '1').replace('L', '1')
-        
-        patterns = [
-            r'(\d{2})[- ]?(\d{9})[- ]?(\d{1})', # 12 digits: XX-XXXXXXXXX-X
-            r'(\d{12})', # raw 12 digits
-            r'PHILHEALTH\s*(?:ID|NO)?[:\s]*([0-9-]{12,14})'
-        ]
-        
-        for p in patterns:
-            match = re.search(p, normalized_text)
-            if match:
-                if len(match.groups()) == 3:
-                    val = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
-                else:
-                    raw = re.sub(r'[^0-9]', '', str(match.group(1) or ""))
-                    if len(raw) == 12:
-                        val = f"{raw[0:2]}-{raw[2:11]}-{raw[11:]}"  # type: ignore
-                    else:
-                        continue
-                
-                self.fields['philhealth_id'] = val
-                self.confidence['philhealth_id'] = 0.95
-                print(f"[PHILHEALTH] Found: {val}")
-                return
-
-    def _extract_email(self, text):
-        """Extract email address from OCR text"""
-        email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        match = re.search(email_pattern, text)
-        if match:
-            self.fields['email'] = match.group(0).lower()
-            self.confidence['email'] = 0.95
-            print(f"[EMAIL] Found: {self.fields['email']}")
-
-    def _extract_names(self, lines):
-        """Extract names with broader header and label detection for all PH IDs"""
-        
-        # NATIONAL ID SPECIFIC LOGIC (Top Priority, no header labels)
-        if self.fields.get('id_type') == "National ID":
-             # Find "National ID" or "Republika" line
-             start_idx = -1
-             for i, line in enumerate(lines):
-                 if any(k in line.upper() for k in ['NATIONAL ID', 'PHILID', 'REPUBLIKA']):
-                     start_idx = i
-             
-             if start_idx != -1:
-                 # Names are usually the next 3 lines
-                 idx = start_idx + 1
-                 if idx < len(lines):
-                     last, _ = FieldValidator.validate_name(lines[idx])
-                     self.fields['last_name'] = last
-                     self.confidence['last_name'] = 0.90
-                 
-                 idx += 1
-                 if idx < len(lines):
-                     first, _ = FieldValidator.validate_name(lines[idx])
-                     self.fields['first_name'] = first
-                     self.confidence['first_name'] = 0.90
-                 
-                 idx += 1
-                 if idx < len(lines) and 'SEX' not in lines[idx].upper() and 'DATE' not in lines[idx].upper():
-                     middle, _ = FieldValidator.validate_name(lines[idx])
-                     self.fields['middle_name'] = middle
-                     self.confidence['middle_name'] = 0.90
-                 
-                 print(f"[NAMES] Extracted via National ID rules: {self.fields['first_name']} {self.fields['middle_name']} {self.fields['last_name']}")
-                 return
-                 
-        # TIN ID SPECIFIC LOGIC
-        if self.fields.get('id_type') == "TIN ID":
-             for i, line in enumerate(lines):
-                 if re.match(r'^TIN\s*:?\s*\d{3}', line.upper().strip()):
-                     # Name is typically the line right above the TIN number
-                     if i > 0:
-                         name_line = lines[i-1].strip()
-                         # Format is usually: Last Name, First Name Middle Name
-                         if ',' in name_line:
-                             parts = [p.strip() for p in name_line.split(',', 1)]
-                             self.fields['last_name'], _ = FieldValidator.validate_name(parts[0])
-                             self.confidence['last_name'] = 0.90
-                             
-                             if len(parts) > 1:
-                                 rest = parts[1].split()
-                                 if len(rest) > 1:
-                                     self.fields['first_name'], _ = FieldValidator.validate_name(' '.join(rest[:-1]))
-                                     self.fields['middle_name'], _ = FieldValidator.validate_name(rest[-1])
-                                 elif len(rest) == 1:
-                                     self.fields['first_name'], _ = FieldValidator.validate_name(rest[0])
-                                 self.confidence['first_name'] = 0.90
-                                 self.confidence['middle_name'] = 0.90
-                         else:
-                             # Fallback if comma is missed
-                             parts = name_line.split()
-                             if len(parts) >= 1:
-                                 self.fields['last_name'], _ = FieldValidator.validate_name(parts[0])
-                             if len(parts) >= 2:
-                                 self.fields['first_name'], _ = FieldValidator.validate_name(parts[1])
-                             if len(parts) > 2:
-                                 self.fields['middle_name'], _ = FieldValidator.validate_name(' '.join(parts[2:]))
-                     
-                     print(f"[NAMES] Extracted via TIN ID rules: {self.fields.get('first_name')} {self.fields.get('middle_name')} {self.fields.get('last_name')}")
-                     return
-
-        # Strategy 1: Combined header (e.g. UMID, SSS, PRC, DL)
-        header_idx = None
-        for i, line in enumerate(lines):
-            ul = line.upper()
-            has_last = 'LAST' in ul or 'SURNAME' in ul
-            has_first = 'FIRST' in ul or 'GIVEN' in ul
-            has_middle = 'MIDDLE' in ul
-            
-            if (has_last and has_first) or (has_last and has_middle) or (has_last and i + 1 < len(lines) and ',' in lines[i+1]):
-                header_idx = i
-                break
-        
-        # pyre-ignore[58]
-        if header_idx is not None and int(header_idx) >= 0 and (int(header_idx) + 1) < len(lines):
-            data_line = lines[int(header_idx) + 1]
-            
-            # DRIVER'S LICENSE SPECIFIC LOGIC (Format: SALVACION, LANCE ALDRIC CUREG)
-            if self.fields.get('id_type') == "Driver's License" and ',' in data_line:
-                parts = [p.strip() for p in data_line.split(',', 1)]
-                last, conf_l = FieldValidator.validate_name(parts[0])
-                self.fields['last_name'] = last
-                self.confidence['last_name'] = 0.95
-                
-                if len(parts) > 1:
-                     rest = parts[1].strip().split()
-                     # In DL, the last word is almost always the middle name (unless there's a suffix, which we handle later)
-                     if len(rest) > 1:
-                          middle, conf_m = FieldValidator.validate_name(rest[-1])
-                          self.fields['middle_name'] = middle
-                          self.confidence['middle_name'] = 0.90
-                          
-                          first, conf_f = FieldValidator.validate_name(' '.join(rest[:-1]))
-                          self.fields['first_name'] = first
-                          self.confidence['first_name'] = 0.90
-                     elif len(rest) == 1:
-                          first, conf_f = FieldValidator.validate_name(rest[0])
-                          self.fields['first_name'] = first
-                          self.confidence['first_name'] = 0.90
-                print(f"[NAMES] Extracted via Driver's License rules: {self.fields['first_name']} {self.fields['middle_name']} {self.fields['last_name']}")
-                return
-                
 
-            if ',' in data_line:
-                parts = [p.strip() for p in data_line.split(',', 1)]
-                last, conf_l = FieldValidator.validate_name(parts[0])
-                self.fields['last_name'] = last
-                self.confidence['last_name'] = conf_l
-                
-                if len(parts) > 1:
-                    rest = parts[1].strip().split()
-                    if len(rest) >= 1:
-                        first, conf_f = FieldValidator.validate_name(rest[0])
-                        self.fields['first_name'] = first
-                        self.confidence['first_name'] = conf_f
-                    if len(rest) >= 2:
-                        middle, conf_m = FieldValidator.validate_name(' '.join(rest[1:]))
-                        self.fields['middle_name'] = middle
-                        self.confidence['middle_name'] = conf_m
-                return
-            else:
-                # OCR missed the comma (e.g. "ESTIOKO GREGORY JR REYES")
-                parts = data_line.split()
-                if len(parts) >= 1:
-                    last, conf_l = FieldValidator.validate_name(parts[0])
-                    self.fields['last_name'] = last
-                    self.confidence['last_name'] = conf_l
-                if len(parts) >= 2:
-                    first, conf_f = FieldValidator.validate_name(parts[1])
-                    self.fields['first_name'] = first
-                    self.confidence['first_name'] = conf_f
-                if len(parts) > 2:
-                    middle, conf_m = FieldValidator.validate_name(' '.join(parts[2:]))
-                    self.fields['middle_name'] = middle
-                    self.confidence['middle_name'] = conf_m
-                return
+def parse_id_text(front_text, back_text, id_type=None):
+    """Run PHIDParser over the combined front/back OCR text (cached by content)."""
+    trace = [] if sampled() else None
+    key = content_key('parse', front_text, back_text, id_type or '')
+    result = ocr_cache.get(key)
+    cached = result is not None
 
-        # Strategy 2: Individual labels (Generalized for all cards)
-        for i, line in enumerate(lines):
-            ul = line.upper()
-            if i + 1 < len(lines):
-                # Surname Labels
-                if any(k in ul for k in ['LAST NAME', 'SURNAME', 'FAMILY NAME', ' SUR NAMES']):
-                    # Check same line after colon first
-                    if ':' in line:
-                        potential = line.split(':', 1)[1].strip()
-                        if len(potential) > 2:
-                            val, conf = FieldValidator.validate_name(potential)
-                            self.fields['last_name'] = val
-                            self.confidence['last_name'] = conf
-                            continue
-                    # Check next line
-                    val, conf = FieldValidator.validate_name(lines[i+1])
-                    if val and not self.fields['last_name']:
-                        self.fields['last_name'] = val
-                        self.confidence['last_name'] = conf
-
-                # First Name Labels
-                elif any(k in ul for k in ['FIRST NAME', 'GIVEN NAME', 'GIVEN NAM ES']):
-                    if ':' in line:
-                        potential = line.split(':', 1)[1].strip()
-                        if len(potential) > 2:
-                            val, conf = FieldValidator.validate_name(potential)
-                            self.fields['first_name'] = val
-                            self.confidence['first_name'] = conf
-                            continue
-                    val, conf = FieldValidator.validate_name(lines[i+1])
-                    if val and not self.fields['first_name']:
-                        self.fields['first_name'] = val
-                        self.confidence['first_name'] = conf
-
-                # Middle Name Labels
-                elif any(k in ul for k in ['MIDDLE NAME', 'MIDDLE INITIAL', 'M.I.']):
-                    if ':' in line:
-                        potential = line.split(':', 1)[1].strip()
-                        if len(potential) > 1:
-                            val, conf = FieldValidator.validate_name(potential)
-                            self.fields['middle_name'] = val
-                            self.confidence['middle_name'] = conf
-                            continue
-                    val, conf = FieldValidator.validate_name(lines[i+1])
-                    if val and not self.fields['middle_name']:
-                        self.fields['middle_name'] = val
-                        self.confidence['middle_name'] = conf
-        
-        # Strategy 3: Unlabeled PhilHealth ID Format Fallback (e.g. LAST NAME, FIRST NAME MIDDLE NAME)
-        if self.fields['id_type'] == 'PhilHealth ID' and not self.fields.get('last_name'):
-            # Looking for a line with a comma (LAST_NAME, FIRST MODIFIER) right after the header/id
-            for i, line in enumerate(lines):
-                 if ',' in line and len(line) > 5 and 'PHILHEALTH' not in line.upper():
-                     parts = [p.strip() for p in line.split(',', 1)]
-                     
-                     # Extract Last Name (before the comma)
-                     last, conf_l = FieldValidator.validate_name(parts[0])
-                     if last:
-                         self.fields['last_name'] = last
-                         self.confidence['last_name'] = conf_l
-                         
-                     # Extract First and Middle Names (after the comma)
-                     if len(parts) > 1:
-                         rest = parts[1].split()
-                         if len(rest) >= 1:
-                             # The first word after the comma is definitely part of the first name
-                             first_parts = [rest[0]]
-                             middle_parts = []
-                             
-                             # Simple heuristic: last word is usually the middle name, middle words are first name
-                             if len(rest) == 2:
-                                 # (First, Middle)
-                                 first, conf_f = FieldValidator.validate_name(rest[0])
-                                 self.fields['first_name'] = first
-                                 self.confidence['first_name'] = conf_f
-                                 
-                                 middle, conf_m = FieldValidator.validate_name(rest[1])
-                                 self.fields['middle_name'] = middle
-                                 self.confidence['middle_name'] = conf_m
-                             elif len(rest) > 2:
-                                 # Multiple first names (e.g. Juan De La Cruz)
-                                 # Assume the last word is the middle name
-                                 middle, conf_m = FieldValidator.validate_name(rest[-1])
-                                 self.fields['middle_name'] = middle
-                                 self.confidence['middle_name'] = conf_m
-                                 
-                                 first, conf_f = FieldValidator.validate_name(' '.join(rest[:-1]))
-                                 self.fields['first_name'] = first
-                                 self.confidence['first_name'] = conf_f
-                     print(f"[NAMES] Extracted via PhilHealth rules: {self.fields['first_name']} {self.fields['middle_name']} {self.fields['last_name']}")
-                     return
-
-        # POST-PROCESSING FOR DRIVER'S LICENSE:
-        if self.fields.get('id_type') == "Driver's License" and not self.fields.get('middle_name'):
-             first_name_str = self.fields.get('first_name')
-             if isinstance(first_name_str, str):
-                 f_name_parts = first_name_str.split()
-                 if len(f_name_parts) > 1:
-                     self.fields['middle_name'] = str(f_name_parts.pop())
-                     self.fields['first_name'] = str(' '.join(f_name_parts))
-                     self.confidence['middle_name'] = 0.85
-                     print(f"[NAMES] Post-processed DL names: {self.fields.get('first_name')} {self.fields.get('middle_name')} {self.fields.get('last_name')}")
-    def _extract_suffix_from_names(self):
-        """Extract suffix from names if present (e.g., Jr, Sr, III)"""
-        valid_suffixes_map = {
-            'JR': 'Jr.', 'SR': 'Sr.', 'II': 'II', 'III': 'III', 'IV': 'IV', 'V': 'V'
+    if not cached:
+        combined_text = front_text + "\n" + back_text
+        parser = PHIDParser(expected_id_type=id_type, trace=trace)
+        fields, confidence = parser.parse(combined_text)
+        result = {
+            "fields": fields,
+            "confidence": confidence,
+            "raw_front": front_text,
+            "raw_back": back_text
         }
-        for field in ['last_name', 'first_name', 'middle_name']:
-            val = self.fields.get(field)
-            if val:
-                parts = val.split()
-                new_parts = []
-                extracted = None
-                for part in parts:
-                    clean_part = re.sub(r'[^A-Z]', '', part.upper())
-                    if clean_part in valid_suffixes_map and not self.fields.get('suffix'):
-                        extracted = valid_suffixes_map.get(clean_part)
-                        self.fields['suffix'] = str(extracted)
-                        self.confidence['suffix'] = float(self.confidence.get(field, 0.9) or 0.9)
-                    else:
-                        new_parts.append(part)
-                
-                if extracted and len(new_parts) != len(parts):
-                    if new_parts:
-                        self.fields[field] = ' '.join(new_parts)
-                    else:
-                        self.fields[field] = None
-                    print(f"[SUFFIX] Extracted {extracted} from {field}. Main is now '{self.fields[field]}'")
-    
-    def _extract_dob(self, text):
-        """Extract date of birth with smart filtering to avoid issuance/expiry dates"""
-        # Look for birth date specific labels
-        birth_keywords = [
-            'DATE OF BIRTH', 'BIRTH DATE', 'DOB', 'D.O.B', 
-            'BIRTHDAY', 'BORN', 'BIRTHDATE', 'DATE BIRTH'
-        ]
-        
-        # Split into lines for label detection
-        lines = text.split('\n')
-        
-        # Strategy 1: Look for labeled birth date
-        for i, line in enumerate(lines):
-            upper_line = line.upper()
-            if any(keyword in upper_line for keyword in birth_keywords):
-                # Search same line and next 2 lines
-                search_text = ' '.join(lines[i:min(i+3, len(lines))])
-                dob, conf = self._find_valid_birth_date(search_text)
-                if dob:
-                    self.fields['dob'] = dob
-                    self.confidence['dob'] = conf
-                    print(f"[DOB] Found via label: {dob}")
-                    return
-        
-        # Strategy 2: Global search for any date that passes as a birth date
-        all_dates = self._find_all_dates(text)
-        for date_str, conf in all_dates:
-            if self._is_valid_birth_date(date_str):
-                # Check if it might be an issuance/expiry date (heuristic: close to today)
-                dt = datetime.strptime(date_str, '%Y-%m-%d')
-                age = (datetime.now() - dt).days / 365.25
-                if 10 < age < 120:
-                    self.fields['dob'] = date_str
-                    self.confidence['dob'] = conf * 0.7 
-                    print(f"[DOB] Found via age validation: {date_str}")
-                    return
-        
-        print("[DOB] No valid birth date found")
-    
-    def _find_valid_birth_date(self, text):
-        """Find a date in text and validate it's a reasonable birth date"""
-        dob, conf = FieldValidator.validate_date(text)
-        if dob and self._is_valid_birth_date(dob):
-            return dob, conf
-        return None, 0.0
-    
-    def _find_all_dates(self, text):
-        """Find all dates in text"""
-        dates = []
-        patterns = [
-            (r'(\d{4})[/-](\d{2})[/-](\d{2})', '%Y-%m-%d', 0.95),
-            (r'(\d{2})[/-](\d{2})[/-](\d{4})', '%m/%d/%Y', 0.90),
-        ]
-        
-        for pattern, fmt, conf in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                try:
-                    if fmt == '%m/%d/%Y':
-                        date_str = f"{match.group(1)}/{match.group(2)}/{match.group(3)}"
-                        dt = datetime.strptime(date_str, fmt)
-                        dates.append((dt.strftime('%Y-%m-%d'), conf))
-                    else:
-                        date_str = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
-                        dates.append((date_str, conf))
-                except:
-                    continue
-        return dates
-    
-    def _is_valid_birth_date(self, date_str):
-        """Check if date is a reasonable birth date (at least 10 years ago, not in future)"""
-        try:
-            birth_date = datetime.strptime(date_str, '%Y-%m-%d')
-            today = datetime.now()
-            
-            # Reject future dates
-            if birth_date > today:
-                print(f"[DOB] Rejected {date_str} (future date)")
-                return False
-            
-            age_years = (today - birth_date).days / 365.25
-            
-            # Birth date should be between 10 and 120 years ago
-            if 10 <= age_years <= 120:
-                return True
-            else:
-                print(f"[DOB] Rejected {date_str} (age would be {age_years:.1f} years)")
-                return False
-        except:
-            return False
+        ocr_cache.set(key, result)
+
+    if trace is not None:
+        # Sampled scan: keep what used to go to ocr_last_run.txt, in memory only
+        debug_buffer.add({
+            "expected_id_type": id_type,
+            "cached": cached,
+            "raw_front": front_text,
+            "raw_back": back_text,
+            "fields": result["fields"],
+            "confidence": result["confidence"],
+            "trace": trace,
+        })
+    return result
 
-    
-    def _extract_gender(self, text):
-        """Extract gender with improved label detection"""
-        upper_text = text.upper()
-        
-        # Strategy 1: Look for "Sex:" or "Gender:" labels with flexible spacing
-        # Handles: "Sex M", "Sex: M", "Sex    M" (multiple spaces/tabs)
-        sex_patterns = [
-            r'(?:SEX|GENDER|KASARIAN)[:\s]+([MF])(?:\s|$|\b)',  # "Sex: M" with word boundary
-            r'(?:SEX|GENDER|KASARIAN)[:\s]+(MALE|FEMALE)',  # "Sex: MALE"
-            r'\b(MALE|FEMALE)\s+(?:SEX|GENDER)',  # "MALE Sex" (reversed)
-        ]
-        
-        for pattern in sex_patterns:
-            match = re.search(pattern, upper_text)
-            if match:
-                value = match.group(1)
-                gender, conf = FieldValidator.validate_gender(value)
-                if gender:
-                    self.fields['gender'] = gender
-                    self.confidence['gender'] = conf
-                    print(f"[GENDER] Found via label: {gender}")
-                    return
-        
-        # Strategy 2: Table layout pattern (e.g. Sex indicator far from label)
-        table_pattern = r'(?:SEX|GENDER|KASARIAN)(?:[\s\S]{0,50})\b([MF])\b(?![A-RT-Z])'
-        match = re.search(table_pattern, upper_text)
-        if match:
-            gender, conf = FieldValidator.validate_gender(match.group(1))
-            if gender:
-                self.fields['gender'] = gender
-                self.confidence['gender'] = 0.85
-                print(f"[GENDER] Found in table layout: {gender}")
-                return
-        
-        # Strategy 3: Fallback - look for MALE/FEMALE anywhere in text
-        gender, conf = FieldValidator.validate_gender(text)
-        if gender:
-            self.fields['gender'] = gender
-            # If it's a PhilHealth ID and we found M/F without a label, it's very likely correct
-            if self.fields.get('id_type') == 'PhilHealth ID':
-                 self.confidence['gender'] = 0.90
-                 print(f"[GENDER] Found without label (PhilHealth Confident): {gender}")
-            else:
-                 self.confidence['gender'] = conf * 0.7  # Lower confidence without label
-                 print(f"[GENDER] Found without label: {gender}")
-    
-    def _extract_phone(self, text):
-        """Extract phone number (mobile or landline)"""
-        upper_text = text.upper()
-        
-        # Strategy 1: Look for labeled phone numbers (highest confidence)
-        # Patterns: "Tel. No.:", "Mobile:", "Contact No:", "Phone:"
-        phone_label_patterns = [
-            r'(?:TEL\.?\s*NO\.?|TELEPHONE|MOBILE|CONTACT\s*NO\.?|PHONE)[:\s]*(\+?63|0)?[\s-]?([0-9]{3})[\s-]?([0-9]{3,4})[\s-]?([0-9]{3,4})',
-            r'(?:TEL\.?\s*NO\.?|MOBILE)[:\s]*([0-9]{4})([0-9]{3})([0-9]{4})',  # 10-digit format
-        ]
-        
-        for pattern in phone_label_patterns:
-            match = re.search(pattern, upper_text)
-            if match:
-                # Reconstruct phone number from groups
-                if len(match.groups()) == 4:
-                    country = match.group(1) or ''
-                    part1 = match.group(2)
-                    part2 = match.group(3)
-                    part3 = match.group(4)
-                    phone = f"{country}{part1}{part2}{part3}".strip()
-                elif len(match.groups()) == 3:
-                    phone = f"{match.group(1)}{match.group(2)}{match.group(3)}"
-                else:
-                    phone = ''.join(g for g in match.groups() if g)
-                
-                # Clean and validate
-                phone = re.sub(r'[\s-]+', '', phone)
-                
-                if 10 <= len(phone) <= 13:
-                    self.fields['contact'] = phone
-                    self.confidence['phone'] = 0.95
-                    print(f"[PHONE] Found via label: {phone}")
-                    return
-        
-        # Strategy 2: Mobile patterns (Accounting for OCR errors 0/O, 1/I)
-        normalized_text_phone = upper_text.replace('O', '0').replace('I', '1').replace('L', '1')
-        mobile_patterns = [
-            r'\b(09[0-9]{2})[\s-]?([0-9]{3})[\s-]?([0-9]{4})\b',
-            r'\b(\+639[0-9]{2})[\s-]?([0-9]{3})[\s-]?([0-9]{4})\b',
-        ]
-        
-        for pattern in mobile_patterns:
-            match = re.search(pattern, normalized_text_phone)
-            if match:
-                phone = ''.join(match.groups()).replace(' ', '').replace('-', '')
-                self.fields['contact'] = phone
-                self.confidence['phone'] = 0.85
-                print(f"[PHONE] Found mobile: {phone}")
-                return
-        
-        # Strategy 3: Look for landline patterns (02 XXXX XXXX or similar)
-        landline_patterns = [
-            r'\b(02|032|033|034|035|036|038|042|043|044|045|046|047|048|049|052|053|054|055|056|062|063|064|065|072|074|075|077|078|082|083|084|085|086|088)[\s-]?([0-9]{3,4})[\s-]?([0-9]{4})\b',
-        ]
-        
-        for pattern in landline_patterns:
-            match = re.search(pattern, text)
-            if match:
-                phone = ''.join(match.groups()).replace(' ', '').replace('-', '')
-                self.fields['phone'] = phone
-                self.confidence['phone'] = 0.75
-                print(f"[PHONE] Found landline: {phone}")
-                return
-        
-        print("[PHONE] Not found")
-    
-    def _extract_address(self, lines, text):
-        """Extract address components with enhanced multi-line support and Caloocan detection"""
-        upper_text = text.upper()
-        
-        # PHILHEALTH SPECIFIC LOGIC
-        if self.fields.get('id_type') == 'PhilHealth ID':
-            # In PhilHealth, the address is typically 1-2 lines after the Date of Birth/Gender line.
-            addr_start_idx = -1
-            for i, line in enumerate(lines):
-                 ul = line.upper()
-                 dob_val = self.fields.get('dob')
-                 if dob_val and str(dob_val).split('-')[0] in ul: # The year is in the line
-                     addr_start_idx = i
-                 elif 'MALE' in ul or 'FEMALE' in ul:
-                     addr_start_idx = i
-            
-            if addr_start_idx != -1:
-                 candidates = []
-                 for j in range(1, 4):
-                     search_idx = (addr_start_idx or 0) + j
-                     if addr_start_idx is not None and search_idx < len(lines):
-                         l = lines[addr_start_idx + j].strip()
-                         # Stop if we hit a PhilHealth Number or noise
-                         if re.match(r'^[\d\s-]+$', l) and len(re.sub(r'[^\d]', '', l)) >= 10:
-                             break
-                         if len(l) < 4:
-                             break
-                         candidates.append(l)
-                 
-                 if candidates:
-                     full_addr = " ".join(candidates)
-                     self.fields['full_address'] = full_addr
-                     self.confidence['full_address'] = 0.90
-                     print(f"[ADDRESS] Extracted PhilHealth block: {full_addr}")
-                     self._parse_address_components(full_addr)
-                     return
-
-        # TIN ID SPECIFIC LOGIC
-        if self.fields.get('id_type') == 'TIN ID':
-            tin_idx = -1
-            # pyre-ignore[9]
-            for i, line in enumerate(lines):
-                if re.match(r'^TIN\s*:?\s*\d{3}', line.upper().strip()):
-                    tin_idx = int(i)
-                    break
-            
-            if tin_idx != -1:
-                candidates = []
-                for j in range(1, 4):
-                    # pyre-ignore[58]
-                    _idx = int(tin_idx) + j
-                    if _idx < len(lines):
-                        l = lines[_idx].strip()
-                        # Stop if we hit Date of Birth or Issue Date
-                        if 'DATE' in l.upper() or 'BIRTH' in l.upper() or 'ISSUE' in l.upper() or 'SIGNATURE' in l.upper():
-                            break
-                        if len(l) > 3:
-                            candidates.append(l)
-                
-                if candidates:
-                    full_addr = " ".join(candidates)
-                    self.fields['full_address'] = full_addr
-                    self.confidence['full_address'] = 0.90
-                    print(f"[ADDRESS] Extracted TIN ID block: {full_addr}")
-                    self._parse_address_components(full_addr)
-                    return
-
-        caloocan_indicators = ['CALOOCAN', 'KALOOKAN', 'KALOOCAN']
-        is_caloocan = any(indicator in upper_text for indicator in caloocan_indicators)
-        
-        if is_caloocan:
-            self.fields['city'] = 'Caloocan City'
-            self.confidence['city'] = 0.95
-            self.fields['region'] = '130000000'
-            self.fields['region_name'] = 'National Capital Region (NCR)'
-            self.fields['province'] = '133900000' 
-            self.fields['province_name'] = 'Metro Manila'
-            self.fields['city_code'] = '137404000'
-            self.confidence['region'] = 0.95
-            self.confidence['region_name'] = 0.95
-            self.confidence['province'] = 0.95
-            self.confidence['province_name'] = 0.95
-            self.confidence['city_code'] = 0.95
-        
-        # Barangay Extraction
-        barangay_patterns = [
-            r'BARANGAY\s+(\d+)',
-            r'BRGY\.?\s*(\d+)',
-            r'BRG?Y\s+(\d+)',
-            r'\bBRGY\s+NO\.?\s*(\d+)',
-        ]
-        
-        for pattern in barangay_patterns:
-            match = re.search(pattern, upper_text)
-            if match:
-                brgy_num = match.group(1)
-                self.fields['barangay'] = f'Barangay {brgy_num}'
-                self.confidence['barangay'] = 0.95
-                if brgy_num == '174':
-                    self.fields['barangay_code'] = '137404174'
-                break
-        
-        # Full Address Extraction (Multi-Line Focus)
-        address_keywords = ['ADDRESS', 'RESIDENCE', 'HOME', 'STREET', 'CITY', 'PROVINCE']
-        addr_line_idx = None
-        for i, line in enumerate(lines):
-            if any(kw in line.upper() for kw in address_keywords):
-                addr_line_idx = i
-                break
-        
-        if addr_line_idx is not None:
-            # Merge up to 3 lines after label
-            candidates = []
-            for j in range(1, 4):
-                search_idx = (addr_line_idx or 0) + j
-                if addr_line_idx is not None and search_idx < len(lines):
-                    l = lines[addr_line_idx + j].strip()
-                    # Stop merging if we hit these labels which indicate the end of the address block
-                    if any(k in l.upper() for k in ['ID NO', 'DATE OF', 'LICENSE NO', 'EXPIRATION', 'AGENCY CODE']):
-                        break
-                    if len(l) > 3:
-                        candidates.append(l)
-            
-            if candidates:
-                full_addr = " ".join(candidates)
-                self.fields['full_address'] = full_addr
-                self.confidence['full_address'] = 0.85
-                self._parse_address_components(full_addr)
-        
-        # Fallback Strategy for unlabeled address (e.g. National ID, Voter's ID)
-        if not self.fields.get('full_address'):
-             # Look for city/location keywords and grab preceding lines
-             for i, line in enumerate(lines):
-                 ul = line.upper()
-                 if any(ind in ul for ind in caloocan_indicators):
-                    candidates = []
-                    if i > 0: candidates.insert(0, lines[i-1])
-                    if i > 1 and len(candidates[0]) < 10: candidates.insert(0, lines[i-2])
-                    
-                    if len(ul) > 20: # Use same line if long (e.g. Street City)
-                        parts = re.split(r'\b(?:CALOOCAN|CITY|METRO|PHILS)\b', line, flags=re.I)
-                        if len(parts) > 0 and len(parts[0].strip()) > 5:
-                            candidates.append(parts[0].strip())
-                    
-                    candidate_text = " ".join(candidates).strip()
-                    if len(candidate_text) > 10:
-                        self.fields['full_address'] = candidate_text
-                        self.confidence['full_address'] = 0.75
-                        self._parse_address_components(candidate_text)
-                        break
-
-        # Always attempt parsing from full text if components still missing
-        if not any(self.fields.get(f) for f in ['house_number', 'street_name', 'subdivision']):
-             self._parse_address_components(text)
-             
-        # Post-process Caloocan ZIP Code
-        if self.fields.get('city') == 'Caloocan City':
-            ext_zip = str(self.fields.get('zip_code') or '')
-            if not ext_zip.isdigit() or not (1400 <= int(ext_zip) <= 1428):
-                if self.fields.get('barangay') == 'Barangay 174':
-                    self.fields['zip_code'] = '1423'
-                else:
-                    self.fields['zip_code'] = '1400'
-                self.confidence['zip_code'] = 0.95
-                print(f"[ADDRESS] Adjusted Caloocan ZIP: {self.fields['zip_code']}")
-    
-    def _parse_address_components(self, address_text):
-        """Parse detailed address components from full address string"""
-        upper_addr = address_text.upper()
-        
-        # Block Number
-        block_patterns = [r'BLK\.?\s*#?\s*(\d+)', r'BLOCK\s+#?\s*(\d+)', r'\bB\.?\s*-?\s*(\d+)']
-        for pattern in block_patterns:
-            match = re.search(pattern, upper_addr)
-            if match:
-                self.fields['block_number'] = f"Block {match.group(1)}"
-                self.confidence['block_number'] = 0.95
-                print(f"[ADDRESS] Block No: {self.fields['block_number']}")
-                break
-        
-        # Lot Number
-        lot_patterns = [r'\b(?:LOT|LT|L)[\.\s#\-]*([0-9]+[A-Z]?|[A-Z])\b', r'\bLOT\s+([0-9A-Z\-]+)\b']
-        for pattern in lot_patterns:
-            match = re.search(pattern, upper_addr)
-            if match:
-                val = match.group(1).replace('B', '8').replace('O', '0') if len(match.group(1)) == 1 else match.group(1)
-                self.fields['lot_number'] = f"Lot {val}"
-                self.confidence['lot_number'] = 0.95
-                print(f"[ADDRESS] Lot No: {self.fields['lot_number']}")
-                break
-        
-        # Street Name
-        street_pattern = r'([A-Z0-9\s#]{3,30}?)\s+(?:ST\b|STREET|RD\b|ROAD|AVE\b|AVENUE|BLVD|DRIVE|LANE)'
-        match = re.search(street_pattern, upper_addr)
-        if match:
-            raw_street = match.group(1).strip()
-            # Clean up
-            if 'BLK' not in raw_street and 'LOT' not in raw_street:
-                 clean = re.sub(r'\b(Lts?|No\.)\s*[\d\-A-Z]+', '', raw_street).strip()
-                 if len(clean) > 3:
-                    self.fields['street_name'] = clean.title()
-                    self.confidence['street_name'] = 0.95
-                    print(f"[ADDRESS] Street: {self.fields['street_name']}")
-
-        # Fallback Street (before Location)
-        if not self.fields.get('street_name'):
-             # More flexible pattern for area-based streets like "BAGUMBONG"
-             fallback = re.search(r'(?:\d+\b)?\s*([A-Z\s]{3,25})[,\s]+(?:BRGY|BARANGAY|CALOOCAN)', upper_addr)
-             if fallback:
-                 cand = fallback.group(1).strip()
-                 if not any(k in cand for k in ['LOT', 'BLK', 'BLOCK', 'NO.', 'ID ']):
-                     self.fields['street_name'] = cand.title()
-                     self.confidence['street_name'] = 0.85
-                     print(f"[ADDRESS] Street (Fallback): {self.fields['street_name']}")
-                     
-        # House Number
-        house_patterns = [
-            r'\b(?:HOUSE|HS)[\.\s]*NO\.?[\s#]*([0-9A-Z\-]+)\b',
-            r'\bNO\.?\s*([0-9]+[A-Z\-]*)\b', # Requires at least one digit
-            r'^#\s*([0-9A-Z\-]+)', # Starting with #
-            r'^\b([0-9]{1,4}[A-Z]?)\b\s+(?=[A-Z])' # Starting with a number
-        ]
-        for pattern in house_patterns:
-            match = re.search(pattern, upper_addr)
-            if match:
-                val = match.group(1).strip()
-                if len(val) <= 6: # sanity check
-                    self.fields['house_number'] = val
-                    self.confidence['house_number'] = 0.95
-                    print(f"[ADDRESS] House No: {self.fields['house_number']}")
-                    break
-
-        # Contextual House No (before Street)
-        if not self.fields.get('house_number') and self.fields.get('street_name'):
-             street_val = self.fields.get('street_name') or ""
-             street_upper = str(street_val).upper()
-             try:
-                 pre = upper_addr.split(street_upper)[0].strip().rstrip(',')
-                 num_match = re.search(r'#?(\d+[A-Z]?)\s*$', pre)
-                 if num_match:
-                     self.fields['house_number'] = num_match.group(1)
-                     self.confidence['house_number'] = 0.85
-                     print(f"[ADDRESS] Contextual House No: {self.fields['house_number']}")
-             except: pass
-
-        # Subdivision/Village
-        subdiv_patterns = [
-            r'([A-Z0-9][A-Z0-9\s]+?)\s+(HOMES|VILLAGE|VILL\.?|SUBDIVISION|SUBD\.?|VILLAS|HEIGHTS|ESTATES|RESIDENCES)',
-            r'(NORTHVILLE\s*[A-Z0-9\s]*)' # National ID specific
-        ]
-        for pattern in subdiv_patterns:
-            match = re.search(pattern, upper_addr)
-            if match:
-                val = match.group(1).split(',')[0].strip() # Stop at comma
-                if len(val) > 3:
-                    self.fields['subdivision'] = val.title()
-                    self.confidence['subdivision'] = 0.95
-                    print(f"[ADDRESS] Subdivision: {self.fields['subdivision']}")
-                    break
-        
-        # ZIP Code
-        zip_match = re.search(r'\b([0-9]{4})\b', upper_addr) # Philippine ZIP codes are 4 digits
-        if zip_match:
-            self.fields['zip_code'] = zip_match.group(1)
-            self.confidence['zip_code'] = 0.95
-            print(f"[ADDRESS] ZIP: {self.fields['zip_code']}")
-
-        # Heuristic City, Province, Barangay Extraction for Non-Caloocan
-        if not self.fields.get('city'):
-            # Pre-check for explicit NCR cities like Caloocan to avoid them being mapped as Province
-            if 'CALOOCAN' in upper_addr:
-                self.fields['city'] = 'Caloocan City'
-                self.confidence['city'] = 0.95
-                
-                # Assign NCR defaults
-                self.fields['region'] = '130000000'
-                self.fields['region_name'] = 'National Capital Region (NCR)'
-                self.fields['province'] = '133900000' 
-                self.fields['province_name'] = 'Metro Manila'
-                self.fields['city_code'] = '137404000'
-                
-                # Re-clean up any leftover heuristcs
-                cleaned_str = re.sub(r'CALOOCAN\s*CITY?|CALOOCAN\b', '', upper_addr).strip(' ,')
-                parts = [p.strip() for p in cleaned_str.split(',') if p.strip()]
-                if len(parts) >= 1:
-                    # Last remaining part is likely the Barangay
-                    brgy_str = parts[-1]
-                    if len(brgy_str) > 3 and not re.match(r'^\d+$', brgy_str):
-                        self.fields['barangay'] = brgy_str.title()
-                        self.confidence['barangay'] = 0.70
-                return
-            # Pre-process upper_addr to replace " - 1234" or " 1234" at the end with ", 1234"
-            # This handles cases where ZIP is separated by a dash (common in PhilHealth) or just space
-            normalized_addr = re.sub(r'[\s\-]+(\d{4})\b', r', \1', upper_addr)
-            parts = [p.strip() for p in normalized_addr.split(',') if p.strip()]
-            
-            if len(parts) >= 2:
-                # Find the index of the part containing the ZIP code or use the last part
-                zip_part_idx = len(parts) - 1
-                for i, p in enumerate(parts):
-                    if re.search(r'\b\d{4}\b', p):
-                        zip_part_idx = i
-                        break
-                
-                # Province is usually the part right before or containing the ZIP code
-                prov_str = ""
-                
-                # If ZIP is in its own part (like "BULACAN, 3023" -> parts: "BULACAN", "3023")
-                if re.match(r'^\d{4}$', parts[zip_part_idx].strip()):
-                    prov_idx = zip_part_idx - 1
-                else:
-                    prov_idx = zip_part_idx
-                
-                if prov_idx >= 0:
-                    prov_str = re.sub(r'\b\d{4}\b', '', parts[prov_idx]).strip()
-                    # Clean up random characters that might be left over
-                    prov_str = re.sub(r'[^A-Z\s]', '', prov_str).strip()
-                    if len(prov_str) > 3:
-                        self.fields['province'] = prov_str.title()
-                        self.confidence['province'] = 0.80
-                        print(f"[ADDRESS] Province (Heuristic): {self.fields['province']}")
-                    
-                    city_idx = prov_idx - 1
-                    if city_idx >= 0:
-                        city_str = parts[city_idx].strip()
-                        if len(city_str) > 3:
-                            self.fields['city'] = city_str.title()
-                            self.confidence['city'] = 0.80
-                            print(f"[ADDRESS] City/Muni (Heuristic): {self.fields['city']}")
-                        
-                        brgy_idx = city_idx - 1
-                        if brgy_idx >= 0 and not self.fields.get('barangay'):
-                            brgy_str = parts[brgy_idx].strip()
-                            if len(brgy_str) > 3:
-                                self.fields['barangay'] = brgy_str.title()
-                                self.confidence['barangay'] = 0.70
-                                print(f"[ADDRESS] Barangay (Heuristic): {self.fields['barangay']}")
 
+# Background OCR worker pool (OCR_BACKEND / OCR_WORKERS / OCR_MAX_PENDING_JOBS)
+ocr_jobs = OCRJobManager(preprocess=preprocess_image, parse=parse_id_text,
+                         backend=CachedOCRBackend(get_ocr_backend(), ocr_cache))
 
 
+def _submit_ocr_job(front, back, id_type):
+    try:
+        job = ocr_jobs.submit(front.read(), back.read() if back else None, id_type)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "poll_url": f"/api/ocr-jobs/{job.id}",
+        "stream_url": f"/api/ocr-jobs/{job.id}/stream"
+    }), 202
+
 
 # ============= DUAL OCR ENDPOINT =============
 @app.route("/api/ocr-dual", methods=["POST"])
 def ocr_dual():
-    """Process front and back of ID"""
+    """Process front and back of ID (?async=1 queues a background job instead)"""
     try:
         files = request.files
         front = files.get('front')
@@ -1260,104 +276,160 @@ def ocr_dual():
         if not front:
             return jsonify({"error": "Front image required"}), 400
         
-        # Process front
-        print("=== PROCESSING FRONT ID ===")
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            return _submit_ocr_job(front, back, id_type_from_request)
+        
         front_bytes = front.read()
-        processed_front = preprocess_image(front_bytes)
-        
-        payload = {
-            'apikey': OCR_API_KEY,
-            'language': 'eng',
-            'isOverlayRequired': 'false',
-            'scale': 'true',
-            'OCREngine': '1'
-        }
+        back_bytes = back.read() if back else None
         
+        # Both sides are preprocessed and sent at the same time
         start_time = time.time()
         try:
-            response = requests.post(
-                'https://api.ocr.space/parse/image',
-                files={'file': ('front.jpg', processed_front, 'image/jpeg')},
-                data=payload,
-                timeout=180
-            )
-            elapsed = time.time() - start_time
-            print(f"[OCR] API call took {elapsed:.2f} seconds")
-            
-            if response.status_code != 200:
-                print(f"[OCR] HTTP Error {response.status_code}: {response.text}")
-                return jsonify({"error": f"OCR API error: {response.status_code}"}), 500
-            
-            result = response.json()
-        except requests.exceptions.Timeout:
-            return jsonify({"error": "OCR API Request Timed Out. The service is unusually slow right now. Please try again or fill manually."}), 504
-        except Exception as e:
-            print(f"[OCR] Request Exception: {str(e)}")
-            return jsonify({"error": f"OCR Request Error: {str(e)}"}), 500
-            
-        print(f"[OCR] API Response: {result}")
-        if not result.get('ParsedResults') or len(result.get('ParsedResults')) == 0:
-            err_msg = result.get('ErrorMessage', 'No text detected')
-            print(f"[OCR] OCR Space Error/Empty: {err_msg}")
-            return jsonify({"error": f"No text detected. OCR Details: {err_msg}"}), 400
-        
-        front_text = result['ParsedResults'][0].get('ParsedText', '')
-        print(f"FRONT OCR:\n{front_text}\n")
-        
-        # Process back if provided
-        back_text = ""
-        if back:
-            print("=== PROCESSING BACK ID ===")
-            back_bytes = back.read()
-            processed_back = preprocess_image(back_bytes)
-            
-            try:
-                response = requests.post(
-                    'https://api.ocr.space/parse/image',
-                    files={'file': ('back.jpg', processed_back, 'image/jpeg')},
-                    data=payload,
-                    timeout=180
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('ParsedResults'):
-                        back_text = result['ParsedResults'][0].get('ParsedText', '')
-                        print(f"BACK OCR:\n{back_text}\n")
-            except Exception as e:
-                print(f"Back ID OCR Error (Non-Fatal): {e}")
-        
-        # Parse combined text
-        combined_text = front_text + "\n" + back_text # Combine and Parse
-        parser = PHIDParser(expected_id_type=id_type_from_request)
-        print(f"\n--- COMBINED OCR TEXT (Type: {id_type_from_request}) ---\n{combined_text}\n------------------------\n")
-        
-        # Write to file for easier debugging
-        try:
-            with open("ocr_last_run.txt", "w", encoding="utf-8") as f:
-                f.write(f"EXPECTED ID TYPE: {id_type_from_request}\n")
-                f.write(combined_text)
-        except Exception as e:
-            print(f"Failed to write OCR debug log: {e}")
-            
-        fields, confidence = parser.parse(combined_text)
+            front_text, back_text = recognize_sides(ocr_jobs.backend, preprocess_image, front_bytes, back_bytes)
+        except (OCRError, ImageTooLarge) as e:
+            event('scan_failed', logging.WARNING, side='front', status=e.status_code, error=str(e))
+            return jsonify({"error": str(e)}), e.status_code
+        ocr_ms = round((time.time() - start_time) * 1000)
+        ocr_log.debug("FRONT OCR:\n%s\nBACK OCR:\n%s", front_text, back_text)
         
-        print("=== EXTRACTED FIELDS ===")
-        for key, val in fields.items():
-            conf = confidence.get(key, 0.0)
-            print(f"{key}: {val} (confidence: {conf:.2f})")
+        result = parse_id_text(front_text, back_text, id_type_from_request)
+        fields = result["fields"]
         
-        return jsonify({
-            "fields": fields,
-            "confidence": confidence,
-            "raw_front": front_text,
-            "raw_back": back_text
-        }), 200
+        event('scan', ocr_ms=ocr_ms, total_ms=round((time.time() - start_time) * 1000),
+              id_type=fields.get('id_type'), fields_found=sum(1 for v in fields.values() if v),
+              has_back=back_bytes is not None)
+        return jsonify(result), 200
         
     except Exception as e:
-        print(f"OCR Error: {str(e)}")
+        ocr_log.exception("OCR Error: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# ============= ASYNC OCR JOBS =============
+@app.route("/api/ocr-jobs", methods=["POST"])
+def create_ocr_job():
+    """Queue front/back ID images for OCR; returns 202 with a job id"""
+    try:
+        front = request.files.get('front')
+        if not front:
+            return jsonify({"error": "Front image required"}), 400
+        return _submit_ocr_job(front, request.files.get('back'), request.form.get('id_type'))
+    except Exception as e:
+        print(f"OCR Job Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/ocr-jobs/<job_id>", methods=["GET"])
+def get_ocr_job(job_id):
+    """Poll an OCR job; ?wait=N long-polls up to N seconds for it to finish"""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "OCR job not found or expired"}), 404
+    wait = min(request.args.get('wait', 0, type=float), 30.0)
+    if wait > 0:
+        job.finished.wait(wait)
+    return jsonify(job.to_dict()), 200
+
+
+@app.route("/api/ocr-jobs/<job_id>/stream", methods=["GET"])
+def stream_ocr_job(job_id):
+    """Server-Sent Events: status updates until the job is done or failed"""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "OCR job not found or expired"}), 404
+
+    def events():
+        last = None
+        while True:
+            finished = job.finished.wait(1.0)
+            snapshot = job.to_dict()
+            if finished:
+                yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+                return
+            summary = (snapshot['status'], tuple(snapshot['sides'].values()))
+            if summary != last:
+                last = summary
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route("/api/ocr-jobs/stats", methods=["GET"])
+def get_ocr_job_stats():
+    stats = ocr_jobs.stats()
+    stats["cache"] = ocr_cache.stats()
+    stats["debug"] = debug_buffer.stats()
+    return jsonify(stats), 200
+
+
+@app.route("/api/admin/ocr-debug", methods=["GET"])
+def get_ocr_debug():
+    """
+    Sampled OCR scans (OCR_LOG_SAMPLE_RATE), newest first. ?format=text returns the
+    latest one in the ocr_last_run.txt layout, ready to drop into the parser fixtures.
+    """
+    dumps = debug_buffer.recent(request.args.get('limit', type=int))
+    if request.args.get('format') == 'text':
+        if not dumps:
+            return jsonify({"error": "No OCR scans captured yet"}), 404
+        latest = dumps[0]
+        dump = format_ocr_dump(latest["expected_id_type"], latest["raw_front"] + "\n" + latest["raw_back"])
+        return Response(dump, mimetype='text/plain')
+    return jsonify({"stats": debug_buffer.stats(), "dumps": dumps}), 200
+
+
+@app.route("/api/admin/ocr-debug", methods=["DELETE"])
+def clear_ocr_debug():
+    debug_buffer.clear()
+    return jsonify({"message": "OCR debug buffer cleared"}), 200
+
+# ============= BATCH RE-PARSE (offline, no OCR.space) =============
+OCR_BATCH_MAX_ITEMS = int(os.getenv('OCR_BATCH_MAX_ITEMS', '5000'))
+# Batches parse in the request thread. Forking a pool from this process would copy
+# the locks and pooled DB sockets of its background threads; large backfills belong
+# in reparse_ocr.py, which runs the process pool.
+
+
+@app.route("/api/ocr/parse-batch", methods=["POST"])
+def ocr_parse_batch():
+    """
+    Re-parse stored OCR text with the current parser. Body is JSON
+    {"items": [{"id", "id_type", "text"}, ...], "id_type": default} or NDJSON
+    (one item per line). Streams NDJSON results; the last line is {"stats": {...}}.
+    """
+    try:
+        default_id_type = request.args.get('id_type')
+        if request.mimetype == 'application/x-ndjson':
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            body = request.get_json(silent=True) or {}
+            items = body.get('items')
+            default_id_type = body.get('id_type') or default_id_type
+    except ValueError as e:
+        return jsonify({"error": f"Invalid NDJSON: {e}"}), 400
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide a non-empty 'items' list"}), 400
+    if len(items) > OCR_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {OCR_BATCH_MAX_ITEMS} items per batch"}), 413
+
+    records = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+            return jsonify({"error": f"items[{i}] needs a 'text' string"}), 400
+        records.append({'id': item.get('id', i), 'id_type': item.get('id_type') or default_id_type, 'text': item['text']})
+
+    def generate():
+        stats = BatchStats()
+        for result in parse_batch(records, workers=0, stats=stats):
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'stats': stats.to_dict()}) + '\n'
+        event('batch_parse', **stats.to_dict())
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 # ============= LEGACY SINGLE OCR (keep for compatibility) =============
 @app.route("/ocr", methods=["POST"])
 def ocr():
@@ -1368,35 +440,21 @@ def ocr():
             return jsonify({"error": "No image"}), 400
         
         img_bytes = file.read()
-        processed = preprocess_image(img_bytes)
-        
-        payload = {
-            'apikey': OCR_API_KEY,
-            'language': 'eng',
-            'isOverlayRequired': 'false',
-            'scale': 'true',
-            'OCREngine': '1'
-        }
+        try:
+            processed = preprocess_image(img_bytes)
+        except ImageTooLarge as e:
+            return jsonify({"error": str(e)}), e.status_code
         
         try:
-            response = requests.post(
-                'https://api.ocr.space/parse/image',
-                files={'file': ('id.jpg', processed, 'image/jpeg')},
-                data=payload,
-                timeout=180
-            )
-            
-            if response.status_code != 200:
-                return jsonify({"error": "OCR failed"}), 500
-            
-            result = response.json()
-        except requests.exceptions.Timeout:
+            text = ocr_jobs.backend.recognize(processed, filename='id.jpg')
+        except OCRTimeout:
             return jsonify({"error": "OCR API Timeout"}), 504
-        if not result.get('ParsedResults'):
+        except OCRNoText:
             return jsonify({"error": "No text"}), 400
+        except OCRError:
+            return jsonify({"error": "OCR failed"}), 500
         
-        text = result['ParsedResults'][0].get('ParsedText', '')
-        print(f"OCR Text:\n{text}\n")
+        ocr_log.debug("OCR Text:\n%s", text)
         
         return jsonify({"text": text}), 200
         
@@ -1591,9 +649,9 @@ def register():
         cur.close()
         conn.close()
         
-        # Fire off the Welcome Email asynchronously or inline
+        # Queue the Welcome Email (delivered by the outbox workers)
         try:
-            send_registration_success_email(mail, email, first_name)
+            send_registration_success_email(email_outbox, email, first_name)
         except Exception as e:
             print(f"Failed to send welcome email to {email}: {e}")
         
@@ -1775,53 +833,188 @@ def update_user(user_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Columns /api/admin/users can return (?fields=...), in response order
+ADMIN_USER_FIELDS = {
+    'id': 'u.id', 'patient_number': 'u.patient_number', 'first_name': 'u.first_name',
+    'last_name': 'u.last_name', 'email': 'u.email', 'contact_number': 'u.contact_number',
+    'gender': 'u.gender', 'date_of_birth': 'u.date_of_birth', 'full_address': 'u.full_address',
+    'barangay': 'u.barangay', 'city': 'u.city', 'role': 'u.role', 'created_at': 'u.created_at',
+    'status': 'u.status', 'suffix': 'u.suffix',
+    'prc_license_number': 'd.prc_license_number', 'specialization': 'd.specialization',
+    'schedule': 'd.schedule', 'clinic_room': 'd.clinic_room',
+}
+ADMIN_USERS_PAGE_MAX = int(os.getenv('ADMIN_USERS_PAGE_MAX', '500'))
+ADMIN_USERS_STREAM_BATCH = 500
+
+
+def _encode_cursor(values):
+    """Opaque keyset cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, size):
+    """Values from _encode_cursor; raises ValueError if malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _like_prefix(text):
+    """LIKE pattern matching strings that start with `text` literally."""
+    return re.sub(r'([\\%_])', r'\\\1', text) + '%'
+
+
+def _name_prefix_filter(text):
+    """WHERE clause and params matching users whose name starts with `text` (case-insensitive)."""
+    words = text.lower().split()
+    if len(words) == 1:
+        return "(LOWER(u.first_name) LIKE %s OR LOWER(u.last_name) LIKE %s)", [_like_prefix(words[0])] * 2
+    # "juan dela" -> full name starts with it; the first-name test lets an index narrow it
+    return ("LOWER(u.first_name) LIKE %s AND LOWER(u.first_name || ' ' || u.last_name) LIKE %s",
+            [_like_prefix(words[0]), _like_prefix(' '.join(words))])
+
+
+def _admin_users_query(args):
+    """Build the SELECT for /api/admin/users from the query args; raises ValueError on bad input."""
+    fields = list(ADMIN_USER_FIELDS)
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in ADMIN_USER_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested")
+
+    # created_at and id are always read: they order the rows and make up the cursor
+    columns = [ADMIN_USER_FIELDS[f] for f in fields]
+    columns += [ADMIN_USER_FIELDS[f] for f in ('created_at', 'id') if f not in fields]
+    query = f"SELECT {', '.join(columns)} FROM users u"
+    if any(ADMIN_USER_FIELDS[f].startswith('d.') for f in fields):
+        query += " LEFT JOIN medical_staff_details d ON u.id = d.user_id"
+
+    where, params = [], []
+    for name in ('role', 'status'):
+        if args.get(name):
+            where.append(f"LOWER(u.{name}) = ANY(%s)")
+            params.append([v.strip().lower() for v in args[name].split(',') if v.strip()])
+    if args.get('barangay'):
+        where.append("LOWER(u.barangay) = LOWER(%s)")
+        params.append(args['barangay'].strip())
+    if args.get('name', '').strip():
+        clause, name_params = _name_prefix_filter(args['name'])
+        where.append(clause)
+        params += name_params
+    if args.get('cursor'):
+        created_at, user_id = _decode_cursor(args['cursor'], 2)
+        try:
+            created_at = datetime.fromisoformat(created_at) if created_at else None
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor") from None
+        # Rows come newest first with NULL created_at leading (DESC NULLS FIRST)
+        if created_at is None:
+            where.append("(u.created_at IS NOT NULL OR u.id < %s)")
+            params.append(user_id)
+        else:
+            where.append("(u.created_at, u.id) < (%s, %s)")
+            params += [created_at, user_id]
+
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY u.created_at DESC, u.id DESC"
+    return query, params, fields
+
+
+def _format_admin_user(row, fields):
+    user_dict = {f: row[f] for f in fields}
+    if user_dict.get('date_of_birth'):
+        user_dict['date_of_birth'] = user_dict['date_of_birth'].strftime('%Y-%m-%d')
+    if user_dict.get('created_at'):
+        user_dict['created_at'] = user_dict['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    if 'role' in user_dict:
+        user_dict['role'] = user_dict.get('role', 'Patient')
+    return json.dumps(user_dict, default=str)
+
+
 @app.route("/api/admin/users", methods=["GET"])
 def get_all_users():
-    """Get all users for admin dashboard"""
+    """
+    Users for the admin dashboard, newest first, streamed as a JSON array.
+
+    Optional query args: role, status (comma lists), barangay, name (prefix of
+    first/last name), fields (comma list of columns) and limit. With limit the
+    response is one page and X-Next-Cursor holds the value to pass back as
+    ?cursor= for the next one; without it every matching user is streamed.
+    """
+    try:
+        query, params, fields = _admin_users_query(request.args)
+        limit = request.args.get('limit')
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= ADMIN_USERS_PAGE_MAX:
+                raise ValueError(f"limit must be between 1 and {ADMIN_USERS_PAGE_MAX}")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+
     try:
         conn = get_db()
-        # Use RealDictCursor to get dictionary-like objects
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Select relevant fields, excluding sensitive auth data
-        query = """
-            SELECT 
-                u.id, u.patient_number, u.first_name, u.last_name, u.email, 
-                u.contact_number, u.gender, u.date_of_birth, u.full_address,
-                u.barangay, u.city, u.role, u.created_at, u.status, u.suffix,
-                d.prc_license_number, d.specialization, d.schedule, d.clinic_room
-            FROM users u
-            LEFT JOIN medical_staff_details d ON u.id = d.user_id
-            ORDER BY u.created_at DESC
-        """
-        
-        cur.execute(query)
-        users = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        # Format dates and handle None values
-        user_list = []
-        for user in users:
-            user_dict = dict(user)
-            if user_dict.get('date_of_birth'):
-                user_dict['date_of_birth'] = user_dict['date_of_birth'].strftime('%Y-%m-%d')
-            if user_dict.get('created_at'):
-                user_dict['created_at'] = user_dict['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Role is now direct from DB
-            user_dict['role'] = user_dict.get('role', 'Patient')
-                
-            user_list.append(user_dict)
-                
-        return jsonify(user_list), 200
-        
+        if limit is not None:
+            # One bounded page; the extra row says whether there is a next one
+            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cur.execute(query + " LIMIT %s", params + [limit + 1])
+            rows = cur.fetchall()
+            cur.close()
+            conn.close()
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = _encode_cursor([last['created_at'] and last['created_at'].isoformat(), last['id']])
+            body = [[_format_admin_user(row, fields) for row in rows[:limit]]]
+            response = Response(_stream_json_array(body), mimetype='application/json')
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+                response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+            return response
+
+        # Whole list: a server-side cursor feeds the response batch by batch
+        cur = conn.cursor(name='admin_users_stream', cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(query, params)
+        first = cur.fetchmany(ADMIN_USERS_STREAM_BATCH)
+
+        def batches():
+            batch = first
+            try:
+                while batch:
+                    yield [_format_admin_user(row, fields) for row in batch]
+                    batch = cur.fetchmany(ADMIN_USERS_STREAM_BATCH)
+            except Exception as e:
+                print(f"Error streaming users: {e}")
+                raise
+            finally:
+                cur.close()
+                conn.rollback()
+                conn.close()
+
+        return Response(stream_with_context(_stream_json_array(batches())), mimetype='application/json')
+
     except Exception as e:
         print(f"Error fetching all users: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def _stream_json_array(batches):
+    """Yield a JSON array one chunk per batch of already-encoded items."""
+    yield '['
+    separator = ''
+    for batch in batches:
+        if batch:
+            yield separator + ','.join(batch)
+            separator = ','
+    yield ']'
+
+
 @app.route("/chat", methods=["POST"])
 def chat():
     """AI Chatbot endpoint for medical queries and health center information"""
@@ -1986,9 +1179,8 @@ def forgot_password():
         print(f"[FORGOT DEBUG] Token generated: {code} for {email}")
 
         # Send email
-        print(f"[FORGOT DEBUG] Attempting to send email...")
-        send_password_reset_email(mail, email, code)
-        print(f"[FORGOT DEBUG] Email sent successfully to {email}")
+        send_password_reset_email(email_outbox, email, code)
+        print(f"[FORGOT DEBUG] Reset email queued for {email}")
 
         # Always return the same generic success message
         return jsonify(GENERIC_SUCCESS), 200
@@ -2151,7 +1343,7 @@ def register_walkin():
         if send_email:
             try:
                 # Dispatch credentials
-                send_walkin_patient_credentials_email(mail, registration_email, first_name, random_password)
+                send_walkin_patient_credentials_email(email_outbox, registration_email, first_name, random_password)
             except Exception as e:
                 print(f"Warning: Registration succeeded, but email failed: {e}")
         
@@ -2272,7 +1464,7 @@ def create_medical_staff():
         
         # Send the auto-generated password via email
         try:
-            send_staff_creation_email(mail, email, first_name, role, password)
+            send_staff_creation_email(email_outbox, email, first_name, role, password)
         except Exception as e:
             print(f"Failed to send staff creation email to {email}: {e}")
         
@@ -2358,9 +1550,9 @@ def create_admin():
         conn.commit()
         
         # Send welcome email using the new function
-        email_status = "sent"
+        email_status = "queued"
         try:
-            send_admin_creation_email(mail, email, first_name, temporary_password)
+            send_admin_creation_email(email_outbox, email, first_name, temporary_password)
         except Exception as e:
             print(f"Failed to send admin welcome email to {email}: {e}")
             email_status = "failed"
@@ -2378,79 +1570,81 @@ def create_admin():
         return jsonify({"error": str(e)}), 500
 
 
+PATIENTS_PAGE_MAX = int(os.getenv('PATIENTS_PAGE_MAX', '200'))
+
+
 @app.route("/api/doctor/patients", methods=["GET"])
 def get_doctor_patients():
-    """Get all patients for doctor dashboard with computed fields"""
+    """
+    Patients for the doctor dashboard, by last name, with last visit, age and P-ID.
+
+    ?q= matches the start of a name or patient number. With ?limit= one page is
+    returned and X-Next-Cursor holds the ?cursor= for the next one.
+    """
+    where, params = ["(u.role = 'Patient' OR u.role IS NULL)"], []
+    limit = request.args.get('limit')
+    try:
+        search = request.args.get('q', '').strip()
+        if search:
+            clause, name_params = _name_prefix_filter(search)
+            where.append(f"({clause} OR LOWER(u.patient_number) LIKE %s)")
+            params += name_params + [_like_prefix(search.lower())]
+        if request.args.get('cursor'):
+            last_name, user_id = _decode_cursor(request.args['cursor'], 2)
+            if not isinstance(last_name, str) or not isinstance(user_id, int):
+                raise ValueError("Invalid cursor")
+            where.append("(u.last_name, u.id) > (%s, %s)")
+            params += [last_name, user_id]
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= PATIENTS_PAGE_MAX:
+                raise ValueError(f"limit must be between 1 and {PATIENTS_PAGE_MAX}")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+
     try:
         conn = get_db()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # 1. Get all patients
-        query = """
-            SELECT 
-                id, first_name, last_name, email, 
-                contact_number, gender, date_of_birth,
-                role
-            FROM users 
-            WHERE role = 'Patient' OR role IS NULL
-            ORDER BY last_name ASC
-        """
-        cur.execute(query)
-        patients = cur.fetchall()
-        
-        # 2. Get last visit for each patient (max completed appointment)
-        # We'll do this in a separate query or join. A subquery is cleaner here.
-        # But for simplicity in this codebase, let's just fetch all completed appointments and map them in python
-        # or use a LEFT JOIN if possible.
-        
-        # Let's try an enhanced query with LEFT JOIN to get last visit
-        query_enhanced = """
-            SELECT 
-                u.id, u.patient_number, u.first_name, u.last_name, u.contact_number, 
+
+        # Last visit is looked up per returned row through the completed-appointments index
+        query = f"""
+            SELECT
+                u.id, u.patient_number, u.first_name, u.last_name, u.contact_number,
                 u.gender, u.date_of_birth,
-                MAX(a.appointment_date) as last_visit
+                COALESCE(to_char(lv.appointment_date, 'Mon DD, YYYY'), 'No visits yet') AS last_visit,
+                COALESCE(date_part('year', age(CURRENT_DATE, u.date_of_birth))::int::text, 'N/A') AS age,
+                COALESCE(NULLIF(u.patient_number, ''),
+                         'PTNT-2026-' || lpad(u.id::text, GREATEST(4, length(u.id::text)), '0')) AS p_id
             FROM users u
-            LEFT JOIN appointments a ON u.id = a.user_id AND a.status = 'completed'
-            WHERE u.role = 'Patient' OR u.role IS NULL
-            GROUP BY u.id
-            ORDER BY u.last_name ASC
+            LEFT JOIN LATERAL (
+                SELECT a.appointment_date FROM appointments a
+                WHERE a.user_id = u.id AND a.status = 'completed'
+                ORDER BY a.appointment_date DESC
+                LIMIT 1
+            ) lv ON TRUE
+            WHERE {' AND '.join(where)}
+            ORDER BY u.last_name ASC, u.id ASC
         """
-        
-        cur.execute(query_enhanced)
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit + 1)
+        cur.execute(query, params)
         patients = cur.fetchall()
-        
+
         cur.close()
         conn.close()
-        
-        patient_list = []
-        for p in patients:
-            pat = dict(p)
-            
-            # Format Last Visit
-            if pat.get('last_visit'):
-                pat['last_visit'] = pat['last_visit'].strftime('%b %d, %Y')
-            else:
-                pat['last_visit'] = 'No visits yet'
-                
-            # Compute Age
-            if pat.get('date_of_birth'):
-                dob = pat['date_of_birth']
-                today = date.today()
-                age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-                pat['age'] = str(age)
-            else:
-                pat['age'] = 'N/A'
-                
-            # P-ID format (Use actual patient_number from database if available)
-            if pat.get('patient_number'):
-                pat['p_id'] = pat['patient_number']
-            else:
-                pat['p_id'] = f"PTNT-2026-{str(pat['id']).zfill(4)}"
-            
-            patient_list.append(pat)
-            
-        return jsonify(patient_list), 200
-        
+
+        next_cursor = None
+        if limit is not None and len(patients) > limit:
+            patients = patients[:limit]
+            next_cursor = _encode_cursor([patients[-1]['last_name'], patients[-1]['id']])
+
+        response = jsonify([dict(p) for p in patients])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+        return response, 200
+
     except Exception as e:
         print(f"Error fetching doctor patients: {e}")
         return jsonify({"error": str(e)}), 500
@@ -2721,8 +1915,12 @@ def delete_user(user_id):
 
         # Delete related records first to avoid FK constraint errors
         cur.execute("DELETE FROM appointments WHERE user_id = %s", (user_id,))
+        # No single appointment id: live readers rebuild today's queue
+        change = notify_appointment_change(cur, None, event='deleted') if cur.rowcount else None
         cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         cur.close()
         conn.close()
 
@@ -2734,6 +1932,7 @@ def delete_user(user_id):
 
 
 @app.route("/api/admin/stats", methods=["GET"])
+@response_cache.cached(ttl=15, stale=60)
 def get_admin_stats():
     """Get statistics for the admin dashboard"""
     try:
@@ -2769,6 +1968,7 @@ def get_admin_stats():
 
 
 @app.route("/api/admin/activities", methods=["GET"])
+@response_cache.cached(ttl=10, stale=30)
 def get_admin_activities():
     """Get recent system activities (simulated from appointments and users)"""
     try:
@@ -2844,6 +2044,71 @@ def get_admin_activities():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/admin/email-outbox", methods=["GET"])
+def get_email_outbox():
+    """Outbound mail queue depth, worker counters and recent dead letters"""
+    try:
+        stats = email_outbox.stats()
+        stats["dead_letters"] = email_outbox.dead_letters(request.args.get('limit', 50, type=int))
+        return jsonify(stats), 200
+    except Exception as e:
+        print(f"Error fetching email outbox stats: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/admin/email-outbox/<int:outbox_id>/retry", methods=["POST"])
+def retry_outbox_email(outbox_id):
+    """Re-queue a dead-lettered email"""
+    try:
+        if not email_outbox.retry(outbox_id):
+            return jsonify({"error": "Email not found, already sent, or past its retention"}), 404
+        return jsonify({"message": "Email re-queued"}), 200
+    except Exception as e:
+        print(f"Error retrying outbox email {outbox_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/admin/reminder-service", methods=["GET"])
+def get_reminder_service_status():
+    """Reminder scheduler: last/next run across all processes, plus this process's counters"""
+    try:
+        scheduler = app.extensions.get('reminder_scheduler')
+        if scheduler is None:
+            return jsonify({"error": "Reminder service is not running"}), 503
+        status = scheduler.status()
+        status["totals"] = reminder_stats()
+        return jsonify(status), 200
+    except Exception as e:
+        print(f"Error fetching reminder service status: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/admin/reminder-service/run", methods=["POST"])
+def run_reminder_service():
+    """Make the reminder job due now instead of waiting for the next interval"""
+    try:
+        scheduler = app.extensions.get('reminder_scheduler')
+        if scheduler is None:
+            return jsonify({"error": "Reminder service is not running"}), 503
+        scheduler.run_now()
+        return jsonify({"message": "Reminder run scheduled"}), 202
+    except Exception as e:
+        print(f"Error scheduling reminder run: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/admin/response-cache", methods=["DELETE"])
+def clear_response_cache():
+    """Drop cached dashboard responses (all, or ?endpoint=<view name>) so the next poll recomputes"""
+    try:
+        cleared = response_cache.invalidate(request.args.get('endpoint'))
+        return jsonify({"message": f"Cleared {cleared} cached responses"}), 200
+    except Exception as e:
+        print(f"Error clearing response cache: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# Not response-cached: the counters below must be current when someone is debugging
 @app.route("/api/admin/system-stats", methods=["GET"])
 def get_system_stats():
     """Get system health statistics"""
@@ -2867,6 +2132,20 @@ def get_system_stats():
             stats["database_connection"] = "Critical"
             print(f"DB Check Failed: {e}")
 
+        # Connection pool utilisation and checkout wait times
+        stats["db_pool"] = pool_stats()
+
+        # Reminder blast totals and the last run's throughput
+        stats["reminders"] = reminder_stats()
+
+        # Dashboard response cache hit/stale/304 counters
+        stats["response_cache"] = response_cache.stats()
+
+        # Open queue/center-status streams and the changes pushed to them
+        stats["live_events"] = live_hub.stats()
+        stats["live_queue"] = live_queue.stats()
+        stats["wait_estimator"] = wait_estimator.stats()
+
         # 2. Server Uptime
         uptime = datetime.now() - START_TIME
         days = uptime.days
@@ -2907,305 +2186,21 @@ def get_system_stats():
 
 
 @app.route("/api/admin/analytics", methods=["GET"])
+@response_cache.cached(ttl=60, stale=300)
 def get_admin_analytics():
     """
     FHSIS Analytics: real data derived from appointments & users tables.
     Returns prenatal visits, immunization counts, TB success rate,
     top morbidity diagnoses, and dengue hotspots.
+    ?as_of=YYYY-MM-DD counts appointments up to that date and compares its
+    month with the one before; ?source=live skips the daily rollups.
     """
     try:
-        conn = get_db()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        # ── Helpers ────────────────────────────────────────────────────
-        from datetime import date as _date, timedelta as _td
-        import calendar as _cal
-        today = _date.today()
-        this_month_start = today.replace(day=1)
-        # Last month: subtract one day from this_month_start to get last day of prev month
-        _last_day_prev = this_month_start - _td(days=1)
-        last_month_start = _last_day_prev.replace(day=1)
-        last_month_end   = this_month_start
-
-
-        # ── 1. Prenatal visits ─────────────────────────────────────────
-        prenatal_filter = """(
-            service_type ILIKE '%prenatal%'
-            OR service_type ILIKE '%maternal%'
-            OR service_type ILIKE '%antenatal%'
-            OR service_type ILIKE '%obstetric%'
-        )"""
-
-        cur.execute(f"SELECT COUNT(*) as n FROM appointments WHERE {prenatal_filter}")
-        prenatal_count = cur.fetchone()['n']
-
-        cur.execute(f"""
-            SELECT COUNT(*) as n FROM appointments
-            WHERE {prenatal_filter}
-              AND appointment_date >= %s AND appointment_date < %s
-        """, (last_month_start, last_month_end))
-        prenatal_prev = cur.fetchone()['n']
-
-        # Prenatal modal patients
-        cur.execute(f"""
-            SELECT
-                u.first_name || ' ' || u.last_name AS patient_name,
-                a.appointment_date,
-                a.service_type
-            FROM appointments a
-            JOIN users u ON a.user_id = u.id
-            WHERE {prenatal_filter}
-              AND a.status NOT IN ('cancelled')
-            ORDER BY a.appointment_date DESC
-        """)
-        prenatal_patients_raw = cur.fetchall()
-        prenatal_patients = []
-        for p in prenatal_patients_raw:
-            row = dict(p)
-            if row.get('appointment_date'):
-                row['appointment_date'] = row['appointment_date'].strftime('%b %d, %Y')
-            prenatal_patients.append(row)
-
-        # ── 2. Immunization ────────────────────────────────────────────
-        immunization_filter = """(
-            service_type ILIKE '%immuniz%'
-            OR service_type ILIKE '%vaccin%'
-            OR service_type ILIKE '%bcg%'
-            OR service_type ILIKE '%hepatitis%'
-            OR service_type ILIKE '%polio%'
-            OR service_type ILIKE '%measles%'
-            OR service_type ILIKE '%pentavalent%'
-        )"""
-
-        cur.execute(f"SELECT COUNT(*) as n FROM appointments WHERE {immunization_filter}")
-        immunization_count = cur.fetchone()['n']
-
-        cur.execute(f"""
-            SELECT COUNT(*) as n FROM appointments
-            WHERE {immunization_filter}
-              AND appointment_date >= %s AND appointment_date < %s
-        """, (last_month_start, last_month_end))
-        immunization_prev = cur.fetchone()['n']
-
-        # Breakdown by vaccine type (simple keyword match)
-        vaccine_types = {
-            'BCG':        "service_type ILIKE '%bcg%'",
-            'Hepatitis B':"service_type ILIKE '%hepatitis%'",
-            'Oral Polio': "service_type ILIKE '%polio%'",
-            'Measles':    "service_type ILIKE '%measles%'",
-            'Pentavalent':"service_type ILIKE '%pentavalent%'",
-        }
-        breakdown = {}
-        for vaccine, cond in vaccine_types.items():
-            cur.execute(f"SELECT COUNT(*) as n FROM appointments WHERE {cond}")
-            breakdown[vaccine] = cur.fetchone()['n']
-
-        # Also grab the generic immunization bucket
-        cur.execute("""
-            SELECT COUNT(*) as n FROM appointments
-            WHERE (service_type ILIKE '%immuniz%' OR service_type ILIKE '%vaccin%')
-              AND service_type NOT ILIKE '%bcg%'
-              AND service_type NOT ILIKE '%hepatitis%'
-              AND service_type NOT ILIKE '%polio%'
-              AND service_type NOT ILIKE '%measles%'
-              AND service_type NOT ILIKE '%pentavalent%'
-        """)
-        breakdown['Other'] = cur.fetchone()['n']
-
-        # Immunization patients
-        cur.execute(f"""
-            SELECT
-                u.first_name || ' ' || u.last_name AS patient_name,
-                a.appointment_date,
-                a.service_type,
-                a.status
-            FROM appointments a
-            JOIN users u ON a.user_id = u.id
-            WHERE {immunization_filter}
-              AND a.status NOT IN ('cancelled')
-            ORDER BY a.appointment_date DESC
-        """)
-        immunization_patients_raw = cur.fetchall()
-        immunization_patients = []
-        for p in immunization_patients_raw:
-            row = dict(p)
-            if row.get('appointment_date'):
-                row['appointment_date'] = row['appointment_date'].strftime('%b %d, %Y')
-            immunization_patients.append(row)
-
-        # ── 3. TB / DOTS Treatment Success ────────────────────────────
-        tb_filter = """(
-            service_type ILIKE '%dots%'
-            OR service_type ILIKE '%tuberculosis%'
-            OR service_type ILIKE '% tb %'
-            OR service_type ILIKE '%tb-%'
-            OR service_type ILIKE '%-tb%'
-            OR diagnosis ILIKE '%tuberculosis%'
-            OR diagnosis ILIKE '%tb%'
-        )"""
-
-        cur.execute(f"""
-            SELECT status, COUNT(*) as n
-            FROM appointments
-            WHERE {tb_filter}
-            GROUP BY status
-        """)
-        tb_rows = cur.fetchall()
-        tb_total     = sum(r['n'] for r in tb_rows)
-        tb_completed = sum(r['n'] for r in tb_rows if r['status'] == 'completed')
-        tb_pct = float(round((tb_completed / tb_total * 100), 1)) if tb_total > 0 else 0.0  # type: ignore
-
-        # TB patients
-        cur.execute(f"""
-            SELECT
-                u.first_name || ' ' || u.last_name AS patient_name,
-                a.appointment_date,
-                a.service_type,
-                a.status
-            FROM appointments a
-            JOIN users u ON a.user_id = u.id
-            WHERE {tb_filter}
-            ORDER BY a.appointment_date DESC
-        """)
-        tb_patients_raw = cur.fetchall()
-        tb_patients = []
-        for p in tb_patients_raw:
-            row = dict(p)
-            if row.get('appointment_date'):
-                row['appointment_date'] = row['appointment_date'].strftime('%b %d, %Y')
-            tb_patients.append(row)
-
-        # ── 4. Top Morbidity (by diagnosis) ───────────────────────────
-        cur.execute("""
-            SELECT diagnosis, COUNT(*) as cases
-            FROM appointments
-            WHERE status = 'completed'
-              AND diagnosis IS NOT NULL
-              AND diagnosis != ''
-            GROUP BY diagnosis
-            ORDER BY cases DESC
-            LIMIT 10
-        """)
-        morbidity_rows = cur.fetchall()
-
-        # Compute trend: compare this month vs last month for each diagnosis
-        morbidity = []
-        for row in morbidity_rows:
-            diag = row['diagnosis']
-            cur.execute("""
-                SELECT COUNT(*) as n FROM appointments
-                WHERE status='completed' AND diagnosis=%s
-                  AND appointment_date >= %s AND appointment_date < %s
-            """, (diag, this_month_start, today))
-            this_m = cur.fetchone()['n']
-
-            cur.execute("""
-                SELECT COUNT(*) as n FROM appointments
-                WHERE status='completed' AND diagnosis=%s
-                  AND appointment_date >= %s AND appointment_date < %s
-            """, (diag, last_month_start, last_month_end))
-            last_m = cur.fetchone()['n']
-
-            if last_m == 0:
-                trend = 'stable'
-            elif this_m > last_m:
-                trend = 'up'
-            elif this_m < last_m:
-                trend = 'down'
-            else:
-                trend = 'stable'
-
-            morbidity.append({
-                'name':  diag,
-                'cases': row['cases'],
-                'trend': trend
-            })
-
-        # Also include service_type as fallback if no diagnoses recorded
-        if not morbidity:
-            cur.execute("""
-                SELECT service_type as name, COUNT(*) as cases
-                FROM appointments
-                WHERE service_type IS NOT NULL AND service_type != ''
-                GROUP BY service_type
-                ORDER BY cases DESC
-                LIMIT 10
-            """)
-            for row in cur.fetchall():
-                morbidity.append({
-                    'name':  row['name'],
-                    'cases': row['cases'],
-                    'trend': 'stable'
-                })
-
-        # ── 5. Dengue Hotspots ─────────────────────────────────────────
-        cur.execute("""
-            SELECT
-                COALESCE(u.subdivision, u.barangay, u.address, 'Unknown Area') as area,
-                COUNT(*) as case_count
-            FROM appointments a
-            JOIN users u ON a.user_id = u.id
-            WHERE (
-                a.diagnosis ILIKE '%dengue%'
-                OR a.service_type ILIKE '%dengue%'
-            )
-              AND a.status = 'completed'
-            GROUP BY area
-            ORDER BY case_count DESC
-            LIMIT 5
-        """)
-        hotspot_rows = cur.fetchall()
-
-        dengue_hotspots = []
-        for i, r in enumerate(hotspot_rows):
-            if i == 0:
-                level = 'High'
-            elif i <= 2:
-                level = 'Medium'
-            else:
-                level = 'Low'
-            dengue_hotspots.append({
-                'area':  r['area'],
-                'count': r['case_count'],
-                'level': level
-            })
-
-        # Total dengue count for the card
-        cur.execute("""
-            SELECT COUNT(*) as n FROM appointments
-            WHERE (diagnosis ILIKE '%dengue%' OR service_type ILIKE '%dengue%')
-              AND status = 'completed'
-        """)
-        dengue_total = cur.fetchone()['n']
-
-        cur.close()
-        conn.close()
-
-        # ── Response ──────────────────────────────────────────────────
-        return jsonify({
-            "prenatal": {
-                "count":      prenatal_count,
-                "prev_month": prenatal_prev,
-                "target":     1600,
-                "patients":   prenatal_patients
-            },
-            "immunization": {
-                "count":      immunization_count,
-                "prev_month": immunization_prev,
-                "target_pct": 95,
-                "breakdown":  breakdown,
-                "patients":   immunization_patients
-            },
-            "tb_treatment": {
-                "completed":   tb_completed,
-                "total":       tb_total,
-                "success_pct": tb_pct,
-                "patients":    tb_patients
-            },
-            "morbidity": morbidity,
-            "dengue_hotspots": dengue_hotspots,
-            "dengue_total": dengue_total
-        }), 200
+        try:
+            as_of = parse_as_of(request.args.get('as_of'))
+        except ValueError:
+            return jsonify({"error": "as_of must be a YYYY-MM-DD date"}), 400
+        return jsonify(get_analytics(as_of, request.args.get('source', 'rollup'))), 200
 
     except Exception as e:
         import traceback
@@ -3520,8 +2515,7 @@ def complete_document_request(doc_id):
         # 4. Attempt to send Email (fail silently if email fails so the DB transaction still succeeds)
         if user and user.get('email'):
             try:
-                from flask import current_app  # type: ignore
-                send_document_ready_email(mail, user['email'], user['first_name'], document_type)
+                send_document_ready_email(email_outbox, user['email'], user['first_name'], document_type)
             except Exception as email_err:
                 print(f"Non-fatal error: Failed to send document ready email: {email_err}")
         
@@ -3563,7 +2557,7 @@ def resend_staff_password(staff_id):
         conn.close()
         
         try:
-            send_staff_creation_email(mail, email, first_name, role, password)
+            send_staff_creation_email(email_outbox, email, first_name, role, password)
             # pyre-ignore[9]
             resend_cooldowns[staff_id] = current_time
             return jsonify({"message": "Credentials resent successfully"}), 200
@@ -3614,6 +2608,7 @@ def change_password():
 # ─────────────────────────────────────────────────────────────────────────────
 
 @app.route("/api/admin/predictive-insights", methods=["GET"])
+@response_cache.cached(ttl=120, stale=600)
 def predictive_insights():
     """
     Analyzes appointment patterns and cross-references actual inventory to surface
@@ -3843,7 +2838,7 @@ def submit_contact_form():
 
         # Send confirmation email to submitter (fail silently)
         try:
-            send_ticket_confirmation_email(mail, email, name or 'there', subject or 'General Inquiry', ticket_id)
+            send_ticket_confirmation_email(email_outbox, email, name or 'there', subject or 'General Inquiry', ticket_id)
         except Exception as email_err:
             print(f"Non-fatal: Failed to send ticket confirmation email: {email_err}")
 
@@ -3905,7 +2900,7 @@ def update_contact_ticket(ticket_id):
                     cur2.close()
                     if ticket and ticket.get('email'):
                         send_ticket_resolved_email(
-                            mail,
+                            email_outbox,
                             ticket['email'],
                             ticket.get('name') or 'there',
                             ticket.get('subject') or 'General Inquiry',
@@ -3935,6 +2930,8 @@ def superadmin_delete_user(user_id):
         
         # Delete dependent records first to avoid foreign key violations
         cur.execute("DELETE FROM appointments WHERE user_id = %s", (user_id,))
+        # No single appointment id: live readers rebuild today's queue
+        change = notify_appointment_change(cur, None, event='deleted') if cur.rowcount else None
         cur.execute("DELETE FROM health_records WHERE user_id = %s", (user_id,))
         cur.execute("DELETE FROM audit_log WHERE user_id = %s", (user_id,))
         cur.execute("DELETE FROM medical_records WHERE user_id = %s OR doctor_id = %s", (user_id, user_id))
@@ -3955,6 +2952,8 @@ def superadmin_delete_user(user_id):
             return jsonify({"error": "User not found"}), 404
             
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         return jsonify({"message": "User deleted successfully"}), 200
     except Exception as e:
         conn.rollback()
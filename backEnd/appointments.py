@@ -1,8 +1,12 @@
 # pyre-ignore-all-errors
 from flask import Blueprint, jsonify, request
 from database import get_db_connection  # pyre-ignore[21]
+from ttl_cache import TTLCache  # pyre-ignore[21]
+from live_events import live_hub, notify_appointment_change, queue_delta  # pyre-ignore[21]
+from live_queue import QUEUE_SELECT, QUEUE_STATUSES, format_time, live_queue, service_key  # pyre-ignore[21]
 from datetime import datetime, date, time, timedelta
 import psycopg2.extras  # pyre-ignore[21]
+import os
 
 appointments_bp = Blueprint('appointments', __name__)
 
@@ -43,110 +47,196 @@ def get_services():
         return jsonify({"error": str(e)}), 500
 
 
+# Open ticks per (date, service time rule). Entries are dropped whenever an
+# appointment on that date is created, cancelled, rescheduled or changes
+# status; the TTL bounds staleness from writes made by other worker processes.
+# Booking always re-checks the slot in the database, so a stale hit can at
+# worst show a slot that then answers 409.
+availability_cache = TTLCache(
+    maxsize=int(os.getenv('AVAILABILITY_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('AVAILABILITY_CACHE_TTL', '60')),
+)
+
+# Longest window the multi-day (?from=&to=) variant will compute in one call
+MAX_AVAILABILITY_RANGE_DAYS = 62
+
+# Expands every active schedule slot into 30-minute ticks for each date in the
+# range and joins them against booked counts grouped by appointment_time, so a
+# whole day (or month) of availability costs a single round-trip.
+AVAILABLE_SLOTS_QUERY = """
+    WITH days AS (
+        SELECT d::date AS day
+        FROM generate_series(%(start)s::date, %(end)s::date, INTERVAL '1 day') AS d
+    ),
+    booked AS (
+        SELECT appointment_date, appointment_time, COUNT(*) AS booked_count
+        FROM appointments
+        WHERE appointment_date BETWEEN %(start)s AND %(end)s
+          AND status NOT IN ('cancelled', 'completed')
+        GROUP BY appointment_date, appointment_time
+    ),
+    slots AS (
+        SELECT days.day, s.id, s.start_time, s.end_time, s.max_appointments,
+               COALESCE(SUM(b.booked_count), 0) AS slot_booked
+        FROM days
+        JOIN schedule_slots s
+          ON s.day_of_week = EXTRACT(ISODOW FROM days.day)::int - 1
+         AND s.is_active = true
+        LEFT JOIN booked b
+          ON b.appointment_date = days.day
+         AND b.appointment_time >= s.start_time
+         AND b.appointment_time < s.end_time
+        GROUP BY days.day, s.id, s.start_time, s.end_time, s.max_appointments
+    )
+    SELECT slots.day, tick::time AS slot_time
+    FROM slots
+    CROSS JOIN LATERAL generate_series(
+        slots.day + slots.start_time,
+        slots.day + slots.end_time - INTERVAL '1 microsecond',
+        INTERVAL '30 minutes'
+    ) AS tick
+    LEFT JOIN booked b
+      ON b.appointment_date = slots.day
+     AND b.appointment_time = tick::time
+    WHERE slots.max_appointments - slots.slot_booked > 0
+      AND b.booked_count IS NULL
+      AND (%(only_time)s::time IS NULL OR tick::time = %(only_time)s::time)
+    ORDER BY slots.day, slots.start_time, tick
+"""
+
+
+def _service_time_rule(service_type):
+    """Some services only run at a fixed time of day; None means any slot."""
+    st = (service_type or '').lower()
+    if 'family planning' in st or 'dots' in st:
+        return time(13, 0)  # Only 1:00 PM
+    if 'cervical' in st:
+        return time(8, 0)  # Only 8:00 AM
+    return None
+
+
+def _fetch_open_ticks(cursor, start_date, end_date, only_time=None):
+    """Return {date: [time, ...]} of unbooked 30-minute ticks for start_date..end_date."""
+    cursor.execute(AVAILABLE_SLOTS_QUERY, {
+        'start': start_date,
+        'end': end_date,
+        'only_time': only_time,
+    })
+
+    days = (end_date - start_date).days + 1
+    ticks_by_date = {start_date + timedelta(days=i): [] for i in range(days)}
+    for row in cursor.fetchall():
+        ticks_by_date[row['day']].append(row['slot_time'])
+    return ticks_by_date
+
+
+def _format_slots(day, ticks, now):
+    slots = []
+    for tick in ticks:
+        slot_datetime = datetime.combine(day, tick)
+        # Skip past time slots when the date is today
+        if day == now.date() and slot_datetime <= now:
+            continue
+        slots.append({
+            'time': slot_datetime.strftime('%H:%M'),
+            'display': slot_datetime.strftime('%I:%M %p'),
+            'available': True
+        })
+    return slots
+
+
+def _fetch_available_slots(start_date, end_date, service_type=None):
+    """
+    Return {date: [slot, ...]} of open 30-minute slots for start_date..end_date.
+    Cached days are served from memory; only the span of missing days is queried.
+    """
+    only_time = _service_time_rule(service_type)
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    ticks_by_date = {}
+    for day in days:
+        ticks = availability_cache.get((day, only_time))
+        if ticks is not None:
+            ticks_by_date[day] = ticks
+    missing = [day for day in days if day not in ticks_by_date]
+
+    if missing:
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            fetched = _fetch_open_ticks(cursor, missing[0], missing[-1], only_time)
+        finally:
+            cursor.close()
+            conn.close()
+        for day in missing:
+            ticks_by_date[day] = fetched[day]
+            availability_cache.set((day, only_time), fetched[day])
+
+    # The past-slot filter depends on the clock, so it runs on every read
+    now = datetime.now()
+    return {day: _format_slots(day, ticks_by_date[day], now) for day in days}
+
+
+def invalidate_availability(*dates):
+    """Drop cached availability for the given dates (date objects or 'YYYY-MM-DD')."""
+    targets = set()
+    for value in dates:
+        if isinstance(value, datetime):
+            value = value.date()
+        elif isinstance(value, str):
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                # Unparseable input: be safe and forget everything
+                availability_cache.clear()
+                return
+        if isinstance(value, date):
+            targets.add(value)
+    if targets:
+        availability_cache.invalidate_where(lambda key: key[0] in targets)
+
+
 @appointments_bp.route('/api/available-slots', methods=['GET'])
 def get_available_slots():
-    """Get available time slots for a specific date"""
+    """
+    Get available time slots for a specific date (?date=YYYY-MM-DD), or for a
+    whole range (?from=YYYY-MM-DD&to=YYYY-MM-DD) keyed by date.
+    """
     try:
         date_str = request.args.get('date')
-        if not date_str:
+        from_str = request.args.get('from')
+        to_str = request.args.get('to')
+        service_type = request.args.get('service_type')
+
+        if date_str:
+            start_date = end_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        elif from_str and to_str:
+            start_date = datetime.strptime(from_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(to_str, '%Y-%m-%d').date()
+            if end_date < start_date:
+                return jsonify({"error": "'to' must not be before 'from'"}), 400
+            if (end_date - start_date).days + 1 > MAX_AVAILABILITY_RANGE_DAYS:
+                return jsonify({"error": f"Date range cannot exceed {MAX_AVAILABILITY_RANGE_DAYS} days"}), 400
+        else:
             return jsonify({"error": "Date parameter is required"}), 400
-        
-        appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        day_of_week = appointment_date.weekday()  # 0=Monday, 6=Sunday
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Get schedule slots for this day
-        cursor.execute("""
-            SELECT id, start_time, end_time, max_appointments
-            FROM schedule_slots
-            WHERE day_of_week = %s AND is_active = true
-            ORDER BY start_time
-        """, (day_of_week,))
-        
-        slots = cursor.fetchall()
-        
-        # For each slot, check how many appointments are already booked
-        available_slots = []
-        for slot in slots:
-            cursor.execute("""
-                SELECT COUNT(*) as booked_count
-                FROM appointments
-                WHERE appointment_date = %s
-                  AND appointment_time >= %s
-                  AND appointment_time < %s
-                  AND status NOT IN ('cancelled', 'completed')
-            """, (appointment_date, slot['start_time'], slot['end_time']))
-            
-            booked = cursor.fetchone()['booked_count']
-            available = slot['max_appointments'] - booked
-            
-            if available > 0:
-                # Generate specific time slots (every 30 minutes)
-                start_time = datetime.combine(appointment_date, slot['start_time'])
-                end_time = datetime.combine(appointment_date, slot['end_time'])
-                current_time = start_time
-                
-                while current_time < end_time:
-                    # Skip past time slots when the date is today
-                    if appointment_date == date.today() and current_time <= datetime.now():
-                        current_time += timedelta(minutes=30)
-                        continue
-
-                    # Check if this specific time is available
-                    cursor.execute("""
-                        SELECT COUNT(*) as count
-                        FROM appointments
-                        WHERE appointment_date = %s
-                          AND appointment_time = %s
-                          AND status NOT IN ('cancelled', 'completed')
-                    """, (appointment_date, current_time.time()))
-                    
-                    if cursor.fetchone()['count'] == 0:
-                        available_slots.append({
-                            'time': current_time.strftime('%H:%M'),
-                            'display': current_time.strftime('%I:%M %p'),
-                            'available': True
-                        })
-                    
-                    current_time += timedelta(minutes=30)
-        
-        cursor.close()
-        conn.close()
 
-        # Filter based on service type
-        service_type = request.args.get('service_type')
-        if service_type:
-            # Decode if needed, though Flask handles it
-            filtered_slots = []
-            for slot in available_slots:
-                # slot['time'] is "HH:MM" string
-                time_str = str(slot.get('time', '00:00'))
-                h = int(time_str.split(':')[0])
-                m = int(time_str.split(':')[1])
-                
-                st = service_type.lower()
-                
-                if 'family planning' in st or 'dots' in st:
-                    # Only 1:00 PM
-                    if h == 13 and m == 0:
-                        filtered_slots.append(slot)
-                elif 'cervical' in st:
-                    # Only 8:00 AM
-                    if h == 8 and m == 0:
-                        filtered_slots.append(slot)
-                else:
-                    filtered_slots.append(slot)
-            
-            available_slots = filtered_slots
-        
-        return jsonify(available_slots), 200
-        
+        slots_by_date = _fetch_available_slots(start_date, end_date, service_type)
+
+        if date_str:
+            return jsonify(slots_by_date[start_date]), 200
+
+        return jsonify({d.isoformat(): slots for d, slots in slots_by_date.items()}), 200
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@appointments_bp.route('/api/available-slots/cache-stats', methods=['GET'])
+def get_availability_cache_stats():
+    """Hit/miss counters for the in-process availability cache"""
+    return jsonify(availability_cache.stats()), 200
+
+
 @appointments_bp.route('/api/appointments', methods=['GET'])
 def get_appointments():
     """Get all appointments with optional filters"""
@@ -266,9 +356,12 @@ def create_appointment():
               doctor_preference, reason, is_pregnant, pregnancy_weeks))
         
         appointment = cursor.fetchone()
+        change = notify_appointment_change(cursor, appointment['id'], appointment['appointment_date'], event='created')
         conn.commit()
+        live_hub.dispatch(change)
         cursor.close()
         conn.close()
+        invalidate_availability(appointment['appointment_date'])
         
         appointment = dict(appointment)
         
@@ -285,7 +378,8 @@ def create_appointment():
             if user_info and user_info.get('email'):
                 from flask import current_app # type: ignore
                 from email_config import send_appointment_confirmation_email # type: ignore
-                mail = current_app.extensions.get('mail')
+                # Queued for the outbox workers; plain Flask-Mail if the app has no outbox
+                mail = current_app.extensions.get('email_outbox') or current_app.extensions.get('mail')
                 if mail:
                     # format time if needed
                     display_time = appointment_time
@@ -433,20 +527,28 @@ def cancel_appointment(appointment_id):
                 cancellation_reason = %s,
                 updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
-            RETURNING id, status, cancelled_at
+            RETURNING id, status, cancelled_at, appointment_date
         """, (cancellation_reason, appointment_id))
         
         appointment = cursor.fetchone()
+        change = None
+        if appointment:
+            change = notify_appointment_change(cursor, appointment_id, appointment['appointment_date'], event='cancelled')
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         cursor.close()
         conn.close()
         
         if not appointment:
             return jsonify({"error": "Appointment not found"}), 404
         
+        appointment = dict(appointment)
+        invalidate_availability(appointment.pop('appointment_date'))
+        
         return jsonify({
             "message": "Appointment cancelled successfully",
-            "appointment": dict(appointment)
+            "appointment": appointment
         }), 200
         
     except Exception as e:
@@ -483,27 +585,44 @@ def reschedule_appointment(appointment_id):
             conn.close()
             return jsonify({"error": "This time slot is not available"}), 409
         
-        # Update appointment
+        # Update appointment, remembering the old date so both days get refreshed
         cursor.execute("""
-            UPDATE appointments
+            UPDATE appointments a
             SET appointment_date = %s,
                 appointment_time = %s,
                 updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-            RETURNING id, appointment_date, appointment_time, status
+            FROM appointments previous
+            WHERE a.id = %s
+              AND previous.id = a.id
+            RETURNING a.id, a.appointment_date, a.appointment_time, a.status,
+                      previous.appointment_date AS previous_date
         """, (new_date, new_time, appointment_id))
         
         appointment = cursor.fetchone()
+        change = None
+        if appointment:
+            change = notify_appointment_change(cursor, appointment_id, appointment['previous_date'],
+                                               appointment['appointment_date'], event='rescheduled')
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         cursor.close()
         conn.close()
         
         if not appointment:
             return jsonify({"error": "Appointment not found"}), 404
         
+        appointment = dict(appointment)
+        invalidate_availability(appointment.pop('previous_date'), appointment['appointment_date'])
+
+        if appointment.get('appointment_date'):
+            appointment['appointment_date'] = appointment['appointment_date'].isoformat()
+        if appointment.get('appointment_time'):
+            appointment['appointment_time'] = appointment['appointment_time'].strftime('%H:%M')
+
         return jsonify({
             "message": "Appointment rescheduled successfully",
-            "appointment": dict(appointment)
+            "appointment": appointment
         }), 200
         
     except Exception as e:
@@ -511,68 +630,74 @@ def reschedule_appointment(appointment_id):
         return jsonify({"error": str(e)}), 500
 
 
+def fetch_queue(cursor, day, service=None, limit=None):
+    """Queue rows for `day` in serving order (priority first) straight from the database, times as HH:MM."""
+    where, params = ["a.appointment_date = %s", "a.status = ANY(%s)"], [day, list(QUEUE_STATUSES)]
+    if service:
+        where.append("LOWER(TRIM(a.service_type)) = %s")
+        params.append(service_key(service))
+    query = QUEUE_SELECT + f"""
+        WHERE {' AND '.join(where)}
+        ORDER BY 
+            COALESCE(a.staff_verified_pregnant, false) DESC,
+            COALESCE(a.staff_verified_pwd, false) DESC,
+            a.is_pregnant DESC NULLS LAST,
+            a.appointment_time ASC,
+            a.id ASC
+    """
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(query, params)
+    queue = cursor.fetchall()
+
+    for item in queue:
+        item.pop('appointment_date', None)
+        item['appointment_time'] = format_time(item['appointment_time'])
+    return queue
+
+
+live_hub.topic('queue', live_queue.load, diff=queue_delta)
+
+
 @appointments_bp.route('/api/queue', methods=['GET'])
 def get_queue():
-    """Get today's appointment queue"""
+    """Get today's appointment queue; ?service= keeps one service type, ?limit= the first k patients"""
+    service = request.args.get('service', '').strip() or None
+    limit = request.args.get('limit')
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        today = date.today()
-        
-        query = """
-            SELECT 
-                a.id, 
-                a.appointment_time, 
-                a.service_type, 
-                a.status,
-                a.is_pregnant,
-                a.pregnancy_weeks,
-                COALESCE(a.staff_verified_pregnant, false) as staff_verified_pregnant,
-                COALESCE(a.staff_verified_pwd, false) as staff_verified_pwd,
-                u.first_name, 
-                u.last_name,
-                u.gender,
-                COALESCE(u.is_pwd, false) as is_pwd
-            FROM appointments a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.appointment_date = %s
-              AND a.status IN ('pending', 'confirmed', 'serving')
-            ORDER BY 
-                COALESCE(a.staff_verified_pregnant, false) DESC,
-                COALESCE(a.staff_verified_pwd, false) DESC,
-                a.is_pregnant DESC NULLS LAST,
-                a.appointment_time ASC
-        """
-        
-        cursor.execute(query, (today,))
-        queue = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        filtered_queue = []
-        
-        # Format time objects to string
-        for item in queue:
-            if isinstance(item['appointment_time'], (datetime, time)):
-                item['appointment_time'] = item['appointment_time'].strftime('%H:%M')
-            elif isinstance(item['appointment_time'], str):
-                 try:
-                     # ensure format is HH:MM
-                     parsed = datetime.strptime(item['appointment_time'], '%H:%M:%S').time()
-                     item['appointment_time'] = parsed.strftime('%H:%M')
-                 except Exception:
-                     pass
+        if limit is not None:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    try:
+        queue = live_queue.top(limit, service)
+        if queue is None:
+            # Not listening for changes (yet), so the in-memory queue can't be trusted
+            conn = get_db_connection()
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
             
-            filtered_queue.append(item)
+            queue = fetch_queue(cursor, date.today(), service, limit)
+            
+            cursor.close()
+            conn.close()
                 
-        return jsonify(filtered_queue), 200
+        return jsonify(queue), 200
         
     except Exception as e:
         print(f"Error fetching queue: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@appointments_bp.route('/api/queue/stream', methods=['GET'])
+def stream_queue():
+    """Today's queue as Server-Sent Events: a snapshot, then deltas as it changes"""
+    return live_hub.stream('queue')
+
+
 @appointments_bp.route('/api/appointments/<int:appointment_id>/status', methods=['PUT'])
 def update_appointment_status(appointment_id):
     """Update appointment status (e.g. to 'serving' or 'completed')"""
@@ -590,12 +715,22 @@ def update_appointment_status(appointment_id):
             UPDATE appointments 
             SET status = %s 
             WHERE id = %s
+            RETURNING appointment_date
         """, (new_status, appointment_id))
         
+        updated = cursor.fetchone()
+        change = None
+        if updated:
+            change = notify_appointment_change(cursor, appointment_id, updated[0], event='status')
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         cursor.close()
         conn.close()
         
+        if updated:
+            invalidate_availability(updated[0])
+        
         return jsonify({"message": f"Appointment status updated to {new_status}"}), 200
         
     except Exception as e:
@@ -628,10 +763,16 @@ def mark_priority(appointment_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            f"UPDATE appointments SET {', '.join(fields)}, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            f"UPDATE appointments SET {', '.join(fields)}, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING appointment_date",
             values
         )
+        updated = cursor.fetchone()
+        change = None
+        if updated:
+            change = notify_appointment_change(cursor, appointment_id, updated[0], event='priority')
         conn.commit()
+        if change:
+            live_hub.dispatch(change)
         cursor.close()
         conn.close()
 
@@ -0,0 +1,87 @@
+# pyre-ignore-all-errors
+"""
+/api/admin/analytics latency vs. appointments table size: direct queries
+(analytics.live_analytics) against the daily rollups (analytics.get_analytics).
+
+Needs the DB from .env with migrations applied. Appointments are added with
+benchmarks/seed_data.py up to each size and removed afterwards (--keep to
+leave them).
+
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --sizes 10000,100000,300000 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics import get_analytics, refresh_dirty  # type: ignore
+from database import db_connection  # type: ignore
+import seed_data  # type: ignore
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def comparable(payload):
+    return {k: v for k, v in payload.items() if k != 'source'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,50000,100000', help='seeded appointment counts to test')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='leave the seeded rows in place')
+    args = parser.parse_args()
+
+    with db_connection() as (conn, cur):
+        seed_data.seed_users(cur, 2000)
+        cur.execute("SELECT COUNT(*) FROM appointments")
+        base = cur.fetchone()[0]
+    refresh_dirty()
+
+    print(f"{'appointments':>12}{'live ms':>10}{'rollup ms':>11}{'speedup':>9}{'refresh ms':>12}{'1-day refresh ms':>18}  same")
+    try:
+        for size in sorted(int(s) for s in args.sizes.split(',')):
+            with db_connection() as (conn, cur):
+                missing = size - seed_data.seeded_appointment_count(cur)
+                if missing > 0:
+                    seed_data.seed_appointments(cur, missing)
+                cur.execute("ANALYZE appointments")
+            # Seeding dirtied nearly every day: this is close to a full rebuild
+            refresh_ms = refresh_dirty()['elapsed_s'] * 1000
+
+            live_ms, live = timed(lambda: get_analytics(source='live'), args.repeat)
+            rollup_ms, rollup = timed(lambda: get_analytics(), args.repeat)
+            same = comparable(live) == comparable(rollup)
+
+            # Typical write: one appointment completed, one day to recompute
+            with db_connection() as (conn, cur):
+                cur.execute("""
+                    UPDATE appointments SET status = 'completed'
+                    WHERE id = (SELECT id FROM appointments WHERE reason = %s AND status = 'pending' LIMIT 1)
+                """, (seed_data.SEED_REASON,))
+            day_ms = refresh_dirty()['elapsed_s'] * 1000
+
+            print(f"{base + size:>12}{live_ms:>10.1f}{rollup_ms:>11.1f}{live_ms / rollup_ms:>8.1f}x"
+                  f"{refresh_ms:>12.0f}{day_ms:>18.1f}  {'yes' if same else 'NO'}")
+    finally:
+        if not args.keep:
+            with db_connection() as (conn, cur):
+                seed_data.clean(cur)
+            refresh_dirty()
+
+
+if __name__ == '__main__':
+    main()
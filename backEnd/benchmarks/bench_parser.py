@@ -0,0 +1,109 @@
+# pyre-ignore-all-errors
+"""
+Parser throughput (IDs/sec) over a corpus of recorded OCR texts.
+
+    python benchmarks/bench_parser.py                          # benchmarks/fixtures/ocr_texts
+    python benchmarks/bench_parser.py --corpus path/to/dumps --repeat 200
+    python benchmarks/bench_parser.py --baseline old_parser.py  # compare speed and output
+
+Corpus files use the ocr_last_run.txt layout: an "EXPECTED ID TYPE: <type>"
+header followed by the raw front/back OCR text. --baseline takes any Python
+file defining PHIDParser (e.g. an older copy of the parser) and also reports
+IDs whose parsed fields differ.
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from ocr_parser import PHIDParser, split_ocr_dump  # type: ignore
+
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'ocr_texts')
+
+
+def load_corpus(path):
+    samples = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.txt'):
+            with open(os.path.join(path, name), encoding='utf-8') as f:
+                id_type, text = split_ocr_dump(f.read())
+            samples.append((name, id_type, text))
+    return samples
+
+
+def load_parser(path):
+    spec = importlib.util.spec_from_file_location('baseline_parser', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.PHIDParser
+
+
+def run(parser_cls, samples, repeat):
+    """Parse every sample `repeat` times; returns (per-ID ms timings, last results by name)."""
+    devnull = open(os.devnull, 'w')
+    timings = []
+    results = {}
+    stdout, sys.stdout = sys.stdout, devnull  # older parsers print every decision
+    try:
+        for _ in range(repeat):
+            for name, id_type, text in samples:
+                started = time.perf_counter()
+                results[name] = parser_cls(expected_id_type=id_type).parse(text)
+                timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        sys.stdout = stdout
+    return timings, results
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    total_s = sum(timings) / 1000
+    return {
+        'parser': label,
+        'ids': len(timings),
+        'ids_per_sec': len(timings) / total_s,
+        'mean_ms': statistics.mean(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='directory of OCR text dumps')
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--baseline', help='Python file with a PHIDParser to compare against')
+    args = parser.parse_args()
+
+    samples = load_corpus(args.corpus)
+    if not samples:
+        sys.exit(f"No .txt dumps in {args.corpus}")
+
+    contenders = [('current', PHIDParser)]
+    if args.baseline:
+        contenders.insert(0, ('baseline', load_parser(args.baseline)))
+
+    rows, outputs = [], {}
+    for label, parser_cls in contenders:
+        run(parser_cls, samples, 1)  # warm-up
+        timings, outputs[label] = run(parser_cls, samples, args.repeat)
+        rows.append(summarize(label, timings))
+
+    print(f"{len(samples)} OCR texts x {args.repeat} repeats\n")
+    print(f"{'parser':<10}{'IDs':>8}{'IDs/sec':>11}{'mean ms':>10}{'p95 ms':>10}")
+    for r in rows:
+        print(f"{r['parser']:<10}{r['ids']:>8}{r['ids_per_sec']:>11.0f}{r['mean_ms']:>10.3f}{r['p95_ms']:>10.3f}")
+
+    if args.baseline:
+        baseline, current = rows
+        print(f"\nSpeedup (IDs/sec): {current['ids_per_sec'] / baseline['ids_per_sec']:.2f}x")
+        differing = [name for name in outputs['current'] if outputs['current'][name] != outputs['baseline'][name]]
+        print(f"Outputs differing from baseline: {len(differing)}" + (f" ({', '.join(differing)})" if differing else ''))
+
+
+if __name__ == '__main__':
+    main()
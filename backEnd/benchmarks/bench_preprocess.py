@@ -0,0 +1,166 @@
+# pyre-ignore-all-errors
+"""
+Compare preprocess_image against the previous full-decode pipeline.
+
+    python benchmarks/bench_preprocess.py                    # synthetic 12 MP phone-style IDs
+    python benchmarks/bench_preprocess.py --corpus path/to/ids --repeat 5
+
+Each pipeline runs in its own subprocess so peak RSS is measured per pipeline
+rather than shared. Peak memory is reported as n/a on Windows.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageOps  # type: ignore
+
+
+def legacy_preprocess(image_bytes):
+    """The pipeline preprocess_image used before draft-mode decoding."""
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    target_width = 1200
+    if img.width != target_width:
+        ratio = target_width / img.width
+        img = img.resize((target_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
+    img = ImageOps.autocontrast(img, cutoff=1)
+    img = ImageEnhance.Contrast(img).enhance(1.5)
+    img = ImageEnhance.Sharpness(img).enhance(1.8)
+    img = img.convert('L')
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+
+def synthetic_id(seed, size=(4032, 3024)):
+    """A phone-camera-sized JPEG of a card with text-like strokes on a noisy background."""
+    rnd = random.Random(seed)
+    img = Image.effect_noise(size, 40).convert('RGB')
+    img = Image.blend(img, Image.new('RGB', size, (rnd.randint(90, 160), 120, 100)), 0.6)
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    card = (w // 8, h // 5, w * 7 // 8, h * 4 // 5)
+    draw.rounded_rectangle(card, radius=60, fill=(235, 232, 225))
+    y = card[1] + 120
+    while y < card[3] - 120:
+        x = card[0] + 120
+        while x < card[2] - 200:
+            word = rnd.randint(60, 260)
+            draw.rectangle((x, y, x + word, y + 44), fill=(rnd.randint(10, 60),) * 3)
+            x += word + rnd.randint(30, 60)
+        y += rnd.randint(110, 160)
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+
+def load_corpus(path):
+    images = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            with open(os.path.join(path, name), 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+def peak_rss_mb():
+    # VmHWM belongs to this process image; ru_maxrss can carry the parent's peak across exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_pipeline(pipeline, corpus_dir, repeat):
+    """Child-process entry point: time one pipeline over the corpus, print JSON."""
+    if pipeline == 'legacy':
+        fn = legacy_preprocess
+    else:
+        from image_preprocess import preprocess_image  # type: ignore
+        fn = preprocess_image
+
+    images = load_corpus(corpus_dir)
+    devnull = open(os.devnull, 'w')
+    timings = []
+    out_bytes = 0
+    for _ in range(repeat):
+        for image_bytes in images:
+            stdout, sys.stdout = sys.stdout, devnull  # silence per-image prints
+            started = time.perf_counter()
+            out = fn(image_bytes)
+            timings.append((time.perf_counter() - started) * 1000)
+            sys.stdout = stdout
+            out_bytes += len(out)
+
+    timings.sort()
+    print(json.dumps({
+        'pipeline': pipeline,
+        'images': len(timings),
+        'mean_ms': statistics.mean(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'peak_rss_mb': peak_rss_mb(),
+        'avg_output_kb': out_bytes / len(timings) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of sample ID photos (default: generate synthetic ones)')
+    parser.add_argument('--synthetic', type=int, default=6, help='number of synthetic images to generate')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--pipeline', choices=['legacy', 'fast'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pipeline:
+        run_pipeline(args.pipeline, args.corpus, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if not corpus:
+            corpus = tmp
+            print(f"Generating {args.synthetic} synthetic 12 MP ID photos...")
+            for i in range(args.synthetic):
+                with open(os.path.join(tmp, f'id_{i}.jpg'), 'wb') as f:
+                    f.write(synthetic_id(i))
+
+        results = []
+        for pipeline in ('legacy', 'fast'):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--pipeline', pipeline,
+                 '--corpus', corpus, '--repeat', str(args.repeat)],
+                capture_output=True, text=True, check=True
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'pipeline':<10}{'images':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak RSS MB':>13}{'out KB':>9}")
+    for r in results:
+        peak = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else 'n/a'
+        print(f"{r['pipeline']:<10}{r['images']:>8}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}"
+              f"{r['p95_ms']:>10.1f}{peak:>13}{r['avg_output_kb']:>9.1f}")
+    legacy, fast = results
+    print(f"\nSpeedup (mean): {legacy['mean_ms'] / fast['mean_ms']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
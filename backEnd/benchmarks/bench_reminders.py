@@ -0,0 +1,79 @@
+# pyre-ignore-all-errors
+"""
+Reminder blast throughput: one mail.send (one SMTP connection) per message,
+as the reminder service used to do, vs. rendering everything up front and
+sending over one reused connection in chunks (reminder_service.send_due_reminders).
+
+Runs entirely offline against benchmarks/smtp_sink.py; no database needed.
+
+    python benchmarks/bench_reminders.py
+    python benchmarks/bench_reminders.py --count 1000 --delay 5   # 5 ms per SMTP reply
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask  # type: ignore
+from flask_mail import Mail  # type: ignore
+
+from email_config import build_appointment_reminder_email  # type: ignore
+from email_outbox import SMTPSession  # type: ignore
+from smtp_sink import start_sink  # type: ignore
+
+
+def make_mail(port):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                      MAIL_USERNAME=None, MAIL_DEFAULT_SENDER='bhcarehealthcenter@gmail.com')
+    return app, Mail(app)
+
+
+def render(count):
+    day = date.today().strftime('%B %d, %Y')
+    return [build_appointment_reminder_email(f'patient{i}@example.com', f'Patient{i}', day, '09:00 AM', 'General Checkup')
+            for i in range(count)]
+
+
+def per_message(mail, messages, chunk_size):
+    for msg in messages:
+        mail.send(msg)
+
+
+def batched(mail, messages, chunk_size):
+    with SMTPSession(mail) as smtp:
+        for start in range(0, len(messages), chunk_size):
+            for msg in messages[start:start + chunk_size]:
+                smtp.send(msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300, help='reminders per run')
+    parser.add_argument('--chunk-size', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0, help='sink latency per SMTP reply (ms)')
+    args = parser.parse_args()
+
+    print(f"{args.count} reminders, chunk size {args.chunk_size}, {args.delay:g} ms per SMTP reply\n")
+    print(f"{'strategy':<14}{'seconds':>9}{'msgs/sec':>10}{'connections':>13}")
+    for label, strategy in (('per-message', per_message), ('batched', batched)):
+        sink = start_sink(delay_ms=args.delay)
+        app, mail = make_mail(sink.port)
+        with app.app_context():
+            messages = render(args.count)
+            started = time.perf_counter()
+            strategy(mail, messages, args.chunk_size)
+            elapsed = time.perf_counter() - started
+        sink.shutdown()
+        stats = sink.stats.to_dict()
+        assert stats['messages'] == args.count, stats
+        print(f"{label:<14}{elapsed:>9.2f}{args.count / elapsed:>10.0f}{stats['connections']:>13}")
+
+
+if __name__ == '__main__':
+    main()
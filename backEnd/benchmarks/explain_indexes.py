@@ -0,0 +1,187 @@
+# pyre-ignore-all-errors
+"""
+EXPLAIN ANALYZE of the hot endpoint queries with and without the indexes
+from migration a4e7c2d9b813 and later (idx_notifications_user_id_id from
+c8e1a3f5b702 for the notification feed). Indexes of the baseline schema are
+kept in both runs, so the comparison is against the plans the endpoints had
+before.
+
+Seeds synthetic users, appointments, notifications and visit logs with
+benchmarks/seed_data.py, then runs each query with its indexes in place and
+again inside a transaction that drops them and rolls back. DROP INDEX locks
+the table until the rollback, so point .env at a development database.
+
+    python benchmarks/explain_indexes.py
+    python benchmarks/explain_indexes.py --appointments 500000 --repeat 7 --plans
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import db_connection  # type: ignore
+import seed_data  # type: ignore
+
+STAFF_ROLES = ['Doctor', 'Nurse', 'Midwife', 'Health Worker']
+
+# (endpoint, query, indexes it can use, the new one first); %(name)s params come from sample_params().
+# Only indexes from a4e7c2d9b813 and later are listed (and dropped): the baseline schema's own
+# (idx_appointments_date, idx_appointments_user_id, ...) stay, so "no index" is what ran before.
+CASES = [
+    ('POST /api/login', """
+        SELECT id, password_hash, role FROM users WHERE LOWER(email) = LOWER(%(email)s)
+     """, ['idx_users_lower_email']),
+    ('GET /api/admin/stats (doctors)', """
+        SELECT COUNT(*) FROM users WHERE role = 'Doctor'
+     """, ['idx_users_staff_role']),
+    ('GET /api/admin/medical-staff', """
+        SELECT u.id, u.last_name, d.specialization FROM users u
+        LEFT JOIN medical_staff_details d ON u.id = d.user_id
+        WHERE u.role IN ('Doctor', 'Nurse', 'Midwife', 'Health Worker')
+        ORDER BY u.last_name ASC
+     """, ['idx_users_staff_role']),
+    ('GET /api/admin/stats (today)', """
+        SELECT COUNT(*) FROM appointments WHERE appointment_date = %(today)s
+     """, ['idx_appointments_date_status']),
+    ('GET /api/queue', """
+        SELECT a.id, a.appointment_time, u.first_name, u.last_name
+        FROM appointments a JOIN users u ON a.user_id = u.id
+        WHERE a.appointment_date = %(today)s AND a.status IN ('pending', 'confirmed', 'serving')
+        ORDER BY a.appointment_time ASC
+     """, ['idx_appointments_date_status', 'idx_appointments_open_slots']),
+    ('POST /api/appointments (slot check)', """
+        SELECT COUNT(*) FROM appointments
+        WHERE appointment_date = %(today)s AND appointment_time = '09:00'
+          AND status NOT IN ('cancelled', 'completed')
+     """, ['idx_appointments_open_slots', 'idx_appointments_date_status']),
+    ('GET /api/patients/<id>/history', """
+        SELECT id, appointment_date, appointment_time, service_type, diagnosis
+        FROM appointments WHERE user_id = %(user_id)s AND status = 'completed'
+        ORDER BY appointment_date DESC, appointment_time DESC
+     """, ['idx_appointments_user_status', 'idx_appointments_completed_user_date']),
+    ('GET /api/notifications', """
+        SELECT * FROM notifications WHERE user_id = %(user_id)s ORDER BY id DESC LIMIT 50
+     """, ['idx_notifications_user_id_id', 'idx_notifications_user_created', 'idx_notifications_user_unread']),
+    ('GET /api/notifications?since_id', """
+        SELECT * FROM notifications WHERE user_id = %(user_id)s AND id > %(since_id)s ORDER BY id ASC LIMIT 51
+     """, ['idx_notifications_user_id_id', 'idx_notifications_user_created', 'idx_notifications_user_unread']),
+    ('PUT /api/notifications/read', """
+        SELECT id FROM notifications WHERE user_id = %(user_id)s AND is_read = false
+     """, ['idx_notifications_user_unread', 'idx_notifications_user_created']),
+    ('GET /api/visits/daily-stats', """
+        SELECT (SELECT COUNT(*) FROM visit_logs WHERE type = 'entry' AND timestamp::date = %(today)s) -
+               (SELECT COUNT(*) FROM visit_logs WHERE type = 'exit' AND timestamp::date = %(today)s)
+     """, ['idx_visit_logs_type_day']),
+]
+
+
+def seed(cur, args):
+    seed_data.seed_users(cur, args.users)
+    missing = args.appointments - seed_data.seeded_appointment_count(cur)
+    if missing > 0:
+        seed_data.seed_appointments(cur, missing)
+    cur.execute("SELECT COUNT(*) FROM notifications WHERE type = %s", (seed_data.SEED_REASON,))
+    if cur.fetchone()[0] == 0:
+        seed_data.seed_notifications(cur, args.notifications)
+    cur.execute("SELECT COUNT(*) FROM visit_logs WHERE purpose = %s", (seed_data.SEED_REASON,))
+    if cur.fetchone()[0] == 0:
+        seed_data.seed_visit_logs(cur, args.visits)
+    # About 1% of the seeded users become staff
+    cur.execute("""
+        UPDATE users SET role = (%s::text[])[1 + id %% 4]
+        WHERE email LIKE %s AND id %% 100 = 0 AND role = 'Patient'
+    """, (STAFF_ROLES, seed_data.SEED_EMAIL % '%'))
+    for table in ('users', 'appointments', 'notifications', 'visit_logs'):
+        cur.execute(f"ANALYZE {table}")
+
+
+def sample_params(cur):
+    """
+    A busy seeded patient, their email in a different case (as a login would
+    send it) and a since_id a poll would send: the id 20 notifications back.
+    """
+    cur.execute("""
+        SELECT u.id, UPPER(u.email) FROM users u JOIN appointments a ON a.user_id = u.id
+        WHERE u.email LIKE %s GROUP BY u.id ORDER BY COUNT(*) DESC LIMIT 1
+    """, (seed_data.SEED_EMAIL % '%',))
+    user_id, email = cur.fetchone()
+    cur.execute("""
+        SELECT COALESCE(MIN(id), 0) FROM (
+            SELECT id FROM notifications WHERE user_id = %s ORDER BY id DESC LIMIT 20
+        ) recent
+    """, (user_id,))
+    since_id = cur.fetchone()[0]
+    return {'user_id': user_id, 'email': email, 'today': date.today(), 'since_id': since_id}
+
+
+def index_names(plan):
+    names = {plan['Index Name']} if 'Index Name' in plan else set()
+    for child in plan.get('Plans', []):
+        names |= index_names(child)
+    return names
+
+
+def explain(cur, query, params, repeat):
+    """Median execution time in ms, indexes used and the text plan."""
+    timings, plan = [], None
+    for _ in range(repeat):
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+        result = cur.fetchone()[0]
+        result = json.loads(result) if isinstance(result, str) else result
+        timings.append(result[0]['Execution Time'])
+        plan = result[0]['Plan']
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+    text = '\n'.join(row[0] for row in cur.fetchall())
+    return statistics.median(timings), sorted(index_names(plan)), text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--notifications', type=int, default=200000)
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--plans', action='store_true', help='print both plans for every query')
+    parser.add_argument('--keep', action='store_true', help='leave the seeded rows in place')
+    args = parser.parse_args()
+
+    with db_connection() as (conn, cur):
+        seed(cur, args)
+    try:
+        with db_connection() as (conn, cur):
+            params = sample_params(cur)
+            cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+            existing = {row[0] for row in cur.fetchall()}
+
+        print(f"{'endpoint':<38}{'no index ms':>12}{'indexed ms':>12}{'speedup':>9}  index used")
+        for endpoint, query, indexes in CASES:
+            if indexes[0] not in existing:
+                print(f"{endpoint:<38}  skipped, {indexes[0]} not found (run alembic upgrade head)")
+                continue
+            with db_connection() as (conn, cur):
+                after_ms, used, after_plan = explain(cur, query, params, args.repeat)
+            with db_connection() as (conn, cur):
+                for name in indexes:
+                    if name in existing:
+                        cur.execute(f"DROP INDEX {name}")
+                before_ms, _, before_plan = explain(cur, query, params, args.repeat)
+                conn.rollback()
+
+            print(f"{endpoint:<38}{before_ms:>12.2f}{after_ms:>12.2f}{before_ms / after_ms:>8.1f}x  {', '.join(used) or '-'}")
+            if args.plans:
+                print(f"\n-- without indexes\n{before_plan}\n-- with indexes\n{after_plan}\n")
+    finally:
+        if not args.keep:
+            with db_connection() as (conn, cur):
+                seed_data.clean(cur)
+
+
+if __name__ == '__main__':
+    main()
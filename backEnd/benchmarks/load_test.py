@@ -0,0 +1,288 @@
+# pyre-ignore-all-errors
+"""
+Concurrent load against the Flask API: p50/p95/p99 latency and throughput
+per endpoint, saved as JSON so runs can be compared across commits.
+
+Tops the database from .env up to the requested volumes with
+benchmarks/seed_data.py (seeded rows stay; `seed_data.py --clean` removes
+them), then drives each scenario with --concurrency threads for --duration
+seconds after a short warm-up.
+
+    python app.py                                   # in another terminal
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenarios queue,history --concurrency 32 --duration 60
+    python benchmarks/load_test.py --compare benchmarks/results/load-20261017-120000-1a2b3c4.json
+    python benchmarks/load_test.py --serve --users 2000 --appointments 20000   # quick in-process run
+
+--serve runs the app in this process; client and server then share one
+interpreter, so use a separate server for numbers worth keeping.
+
+Scenarios:
+    login       POST /api/login as a random seeded patient (bcrypt-bound)
+    slots       GET /api/available-slots for a random day in the next two weeks
+    queue       GET /api/queue
+    analytics   GET /api/admin/analytics
+    history     GET /api/patients/<id>/history for a random seeded patient
+    mixed       all of the above, weighted like dashboard traffic
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import requests  # type: ignore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import db_connection  # type: ignore
+import seed_data  # type: ignore
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def login(session, base_url, ctx):
+    user_id = random.choice(ctx['user_ids'])
+    return session.post(f"{base_url}/api/login", timeout=ctx['timeout'], json={
+        'email': ctx['emails'][user_id], 'password': seed_data.SEED_PASSWORD, 'expected_type': 'patient'})
+
+
+def slots(session, base_url, ctx):
+    day = date.today() + timedelta(days=random.randint(0, 13))
+    return session.get(f"{base_url}/api/available-slots", params={'date': day.isoformat()}, timeout=ctx['timeout'])
+
+
+def queue(session, base_url, ctx):
+    return session.get(f"{base_url}/api/queue", timeout=ctx['timeout'])
+
+
+def analytics(session, base_url, ctx):
+    return session.get(f"{base_url}/api/admin/analytics", timeout=ctx['timeout'])
+
+
+def history(session, base_url, ctx):
+    return session.get(f"{base_url}/api/patients/{random.choice(ctx['user_ids'])}/history", timeout=ctx['timeout'])
+
+
+SCENARIOS = {'login': login, 'slots': slots, 'queue': queue, 'analytics': analytics, 'history': history}
+MIXED_WEIGHTS = {'login': 1, 'slots': 3, 'queue': 3, 'analytics': 1, 'history': 2}
+
+
+def mixed(session, base_url, ctx):
+    name = random.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+    return SCENARIOS[name](session, base_url, ctx)
+
+
+SCENARIOS['mixed'] = mixed
+
+
+def seed(args):
+    started = time.perf_counter()
+    with db_connection() as (conn, cur):
+        seed_data.seed_users(cur, args.users)
+        missing = args.appointments - seed_data.seeded_appointment_count(cur)
+        if missing > 0:
+            seed_data.seed_appointments(cur, missing)
+        cur.execute("SELECT COUNT(*) FROM soap_notes WHERE plan = %s", (seed_data.SEED_REASON,))
+        missing = args.soap_notes - cur.fetchone()[0]
+        if missing > 0:
+            seed_data.seed_soap_notes(cur, missing)
+        cur.execute("SELECT COUNT(*) FROM inventory WHERE item_name LIKE %s", (seed_data.SEED_REASON + ' %',))
+        missing = args.inventory - cur.fetchone()[0]
+        if missing > 0:
+            seed_data.seed_inventory(cur, missing)
+        for table in ('users', 'appointments', 'soap_notes', 'inventory'):
+            cur.execute(f"ANALYZE {table}")
+    print(f"Seeded data ready in {time.perf_counter() - started:.1f}s")
+
+
+def context():
+    """Seeded patients to log in as / look up, and the table sizes the run saw."""
+    with db_connection() as (conn, cur):
+        cur.execute("SELECT id, email FROM users WHERE email LIKE %s", (seed_data.SEED_EMAIL % '%',))
+        emails = dict(cur.fetchall())
+        volumes = {}
+        for table in ('users', 'appointments', 'soap_notes', 'inventory'):
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            volumes[table] = cur.fetchone()[0]
+    if not emails:
+        raise SystemExit("No seeded users found; run without --no-seed first")
+    return {'emails': emails, 'user_ids': list(emails)}, volumes
+
+
+def percentile(sorted_ms, pct):
+    """Nearest-rank percentile."""
+    if not sorted_ms:
+        return None
+    return sorted_ms[max(0, math.ceil(pct / 100 * len(sorted_ms)) - 1)]
+
+
+def run_scenario(name, base_url, ctx, concurrency, duration, warmup, timeout):
+    """Hammer one scenario; returns latency percentiles (ms), throughput and errors."""
+    request_fn = SCENARIOS[name]
+    latencies, statuses, failures = [], Counter(), Counter()
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        session = requests.Session()
+        local_ms, local_status, local_fail = [], Counter(), Counter()
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            try:
+                status = request_fn(session, base_url, ctx).status_code  # body is read in full
+            except requests.RequestException as e:
+                status, error = None, type(e).__name__
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if started < measure_from:
+                continue
+            if status is None:
+                local_fail[error] += 1
+            else:
+                local_status[status] += 1
+                if status < 400:
+                    local_ms.append(elapsed_ms)
+        with lock:
+            latencies.extend(local_ms)
+            statuses.update(local_status)
+            failures.update(local_fail)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + warmup + timeout + 5)
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400) + sum(failures.values())
+    return {
+        'requests': len(latencies) + errors,
+        'ok': len(latencies),
+        'errors': errors,
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'failures': dict(failures),
+        'throughput_rps': round(len(latencies) / duration, 2),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.fmean(latencies) if latencies else None,
+        'max_ms': latencies[-1] if latencies else None,
+    }
+
+
+def git_revision():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {'commit': git('rev-parse', '--short', 'HEAD') or 'unknown',
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def serve_in_process():
+    """Start the app on a free local port in a background thread; returns its base URL."""
+    from werkzeug.serving import make_server  # type: ignore
+    import app as backend  # type: ignore
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def fmt(value, spec='.1f'):
+    return '-' if value is None else format(value, spec)
+
+
+def print_results(results, baseline=None):
+    header = f"{'scenario':<11}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    print(header + ('   vs baseline (req/s, p95)' if baseline else ''))
+    for name, r in results['scenarios'].items():
+        line = (f"{name:<11}{r['throughput_rps']:>9.1f}{fmt(r['p50_ms']):>9}{fmt(r['p95_ms']):>9}"
+                f"{fmt(r['p99_ms']):>9}{r['errors']:>8}")
+        before = (baseline or {}).get('scenarios', {}).get(name)
+        if before:
+            rps = r['throughput_rps'] / before['throughput_rps'] if before['throughput_rps'] else None
+            p95 = r['p95_ms'] / before['p95_ms'] if r['p95_ms'] and before['p95_ms'] else None
+            line += f"   {fmt(rps, '.2f')}x, {fmt(p95, '.2f')}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--serve', action='store_true', help='run the app in this process instead')
+    parser.add_argument('--scenarios', default='login,slots,queue,analytics,history,mixed')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds per scenario')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--soap-notes', type=int, default=200000)
+    parser.add_argument('--inventory', type=int, default=2000)
+    parser.add_argument('--no-seed', action='store_true', help='use whatever is in the database')
+    parser.add_argument('--output', help=f'results file (default: {RESULTS_DIR}/load-<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    if not args.no_seed:
+        seed(args)
+    ctx, volumes = context()
+    base_url = serve_in_process() if args.serve else args.base_url.rstrip('/')
+
+    ctx['timeout'] = args.timeout
+    revision = git_revision()
+    results = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git': revision,
+        'base_url': base_url,
+        'config': {'concurrency': args.concurrency, 'duration_s': args.duration, 'warmup_s': args.warmup,
+                   'in_process': args.serve},
+        'volumes': volumes,
+        'scenarios': {},
+    }
+    print(f"{base_url}, {args.concurrency} workers, {args.duration:.0f}s per scenario, volumes {volumes}")
+    for name in names:
+        results['scenarios'][name] = run_scenario(name, base_url, ctx, args.concurrency,
+                                                  args.duration, args.warmup, args.timeout)
+        r = results['scenarios'][name]
+        print(f"  {name}: {r['throughput_rps']:.1f} req/s, p95 {fmt(r['p95_ms'])} ms, {r['errors']} errors")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nBaseline: {args.compare} (commit {baseline.get('git', {}).get('commit')})")
+    print()
+    print_results(results, baseline)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"load-{stamp}-{revision['commit']}{'-dirty' if revision['dirty'] else ''}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == '__main__':
+    main()
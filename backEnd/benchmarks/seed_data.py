@@ -0,0 +1,196 @@
+# pyre-ignore-all-errors
+"""
+Synthetic patients and appointments for benchmarking against the DB in .env.
+
+    python benchmarks/seed_data.py --appointments 100000        # add 100k appointments
+    python benchmarks/seed_data.py --appointments 5000 --users 200 --days 365
+    python benchmarks/seed_data.py --users 100000 --appointments 1000000 --soap-notes 200000 --inventory 2000
+    python benchmarks/seed_data.py --clean                       # remove everything seeded
+
+Seeded users have emails like seed-42@bench.local and can log in with the
+password 'bench-seed' (development databases only). Seeded appointments have
+reason 'bench-seed', seeded notifications type 'bench-seed', seeded visit logs
+purpose 'bench-seed', seeded SOAP notes plan 'bench-seed' and seeded inventory
+items names starting 'bench-seed', so --clean never touches real records. Service
+types and diagnoses are drawn from the keywords the FHSIS analytics filter on.
+"""
+import argparse
+import os
+import sys
+import time
+
+import bcrypt  # type: ignore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from database import db_connection  # type: ignore
+
+SEED_EMAIL = 'seed-%s@bench.local'
+SEED_REASON = 'bench-seed'
+SEED_PASSWORD = 'bench-seed'
+
+SERVICE_TYPES = [
+    'General Checkup', 'General Checkup', 'General Checkup', 'Dental Services', 'Family Planning',
+    'Prenatal Care', 'Maternal Health', 'Immunization', 'BCG Vaccination', 'Hepatitis B Vaccine',
+    'Oral Polio Vaccine', 'Measles Vaccine', 'Pentavalent Vaccine', 'TB-DOTS', 'Dengue Consultation',
+]
+DIAGNOSES = [
+    'Hypertension', 'Acute Respiratory Infection', 'Dengue Fever', 'Pulmonary Tuberculosis', 'Diarrhea',
+    'Urinary Tract Infection', 'Diabetes Mellitus', 'Influenza', 'Pneumonia', 'Animal Bite',
+    'Skin Infection', 'Bronchial Asthma',
+]
+STATUSES = ['completed', 'completed', 'completed', 'completed', 'confirmed', 'pending', 'cancelled']
+BARANGAYS = ['Bagong Silang', 'Camarin', 'Deparo', 'Bagumbong', 'Tala', 'Novaliches Proper', 'Llano', 'Kaybiga']
+INVENTORY_ITEMS = ['Paracetamol 500mg', 'Amoxicillin 500mg', 'Losartan 50mg', 'Metformin 500mg',
+                   'ORS Sachet', 'Syringe 3ml', 'Cotton Balls', 'Surgical Gloves', 'BCG Vaccine', 'Measles Vaccine']
+INVENTORY_CATEGORIES = ['Medicine', 'Medical Supplies', 'Vaccines']
+SUBDIVISIONS = ['Phase 1', 'Phase 2', 'Phase 3', 'Villa Verde', 'Maligaya Park', 'North Olympus']
+
+
+def seed_users(cur, count):
+    """Top the seeded patients up to `count`; returns how many exist."""
+    cur.execute("SELECT COUNT(*) FROM users WHERE email LIKE %s", (SEED_EMAIL % '%',))
+    existing = cur.fetchone()[0]
+    if count > existing:
+        # One hash for everyone: hashing 100k passwords would take hours
+        password_hash = bcrypt.hashpw(SEED_PASSWORD.encode(), bcrypt.gensalt()).decode()
+        cur.execute("""
+            INSERT INTO users (email, password_hash, first_name, last_name, date_of_birth, gender,
+                               contact_number, barangay, city, province, subdivision)
+            SELECT format(%(email)s, n), %(password_hash)s, 'Seed' || n, 'Patient',
+                   DATE '1960-01-01' + (random() * 20000)::int,
+                   CASE WHEN random() < 0.5 THEN 'Female' ELSE 'Male' END,
+                   '09' || lpad((random() * 999999999)::bigint::text, 9, '0'),
+                   (%(barangays)s::text[])[1 + floor(random() * %(n_barangays)s)::int],
+                   'Caloocan City', 'Metro Manila',
+                   CASE WHEN random() < 0.6 THEN (%(subdivisions)s::text[])[1 + floor(random() * %(n_subdivisions)s)::int] END
+            FROM generate_series(%(first)s, %(last)s) AS n
+        """, {'email': SEED_EMAIL, 'password_hash': password_hash, 'barangays': BARANGAYS, 'n_barangays': len(BARANGAYS),
+              'subdivisions': SUBDIVISIONS, 'n_subdivisions': len(SUBDIVISIONS),
+              'first': existing + 1, 'last': count})
+    return max(count, existing)
+
+
+def seed_appointments(cur, count, days=730):
+    """Add `count` appointments for seeded users spread over the last `days` days (and a few weeks ahead)."""
+    cur.execute("""
+        INSERT INTO appointments (user_id, appointment_date, appointment_time, service_type, status, diagnosis, reason)
+        SELECT ids[1 + floor(random() * array_length(ids, 1))::int],
+               CURRENT_DATE - (random() * %(days)s)::int + 21,
+               TIME '08:00' + (floor(random() * 18) * INTERVAL '30 minutes'),
+               t.service_type, t.status,
+               CASE WHEN t.status = 'completed' AND random() < 0.7
+                    THEN (%(diagnoses)s::text[])[1 + floor(random() * %(n_diagnoses)s)::int] END,
+               %(reason)s
+        FROM (SELECT array_agg(id) AS ids FROM users WHERE email LIKE %(email)s) u,
+             LATERAL (
+                 SELECT n,
+                        (%(services)s::text[])[1 + floor(random() * %(n_services)s)::int] AS service_type,
+                        (%(statuses)s::text[])[1 + floor(random() * %(n_statuses)s)::int] AS status
+                 FROM generate_series(1, %(count)s) AS n
+             ) t
+    """, {'days': days, 'diagnoses': DIAGNOSES, 'n_diagnoses': len(DIAGNOSES), 'reason': SEED_REASON,
+          'email': SEED_EMAIL % '%', 'services': SERVICE_TYPES, 'n_services': len(SERVICE_TYPES),
+          'statuses': STATUSES, 'n_statuses': len(STATUSES), 'count': count})
+
+
+def seed_notifications(cur, count):
+    """Add `count` notifications spread over seeded users, most of them read."""
+    cur.execute("""
+        INSERT INTO notifications (user_id, type, message, is_read, created_at)
+        SELECT ids[1 + floor(random() * array_length(ids, 1))::int], %(reason)s,
+               'Your appointment has been confirmed.', random() < 0.8,
+               now() - random() * INTERVAL '365 days'
+        FROM (SELECT array_agg(id) AS ids FROM users WHERE email LIKE %(email)s) u,
+             generate_series(1, %(count)s)
+    """, {'reason': SEED_REASON, 'email': SEED_EMAIL % '%', 'count': count})
+
+
+def seed_visit_logs(cur, count, days=365):
+    """Add `count` entry/exit gate logs over the last `days` days."""
+    cur.execute("""
+        INSERT INTO visit_logs (visitor_name, purpose, type, timestamp)
+        SELECT 'Seed Visitor ' || n, %(reason)s,
+               CASE WHEN n %% 2 = 0 THEN 'entry' ELSE 'exit' END,
+               now() - random() * %(days)s * INTERVAL '1 day'
+        FROM generate_series(1, %(count)s) AS n
+    """, {'reason': SEED_REASON, 'days': days, 'count': count})
+
+
+def seed_soap_notes(cur, count):
+    """Add `count` SOAP notes for seeded patients over the last two years."""
+    cur.execute("""
+        INSERT INTO soap_notes (patient_id, subjective, objective, assessment, plan, created_at, updated_at)
+        SELECT ids[1 + floor(random() * array_length(ids, 1))::int],
+               'Patient reports on-and-off symptoms for ' || (1 + floor(random() * 14))::int || ' days.',
+               'BP ' || (100 + floor(random() * 60))::int || '/' || (60 + floor(random() * 30))::int
+                   || ', temp ' || round((36 + random() * 3)::numeric, 1) || ' C',
+               (%(diagnoses)s::text[])[1 + floor(random() * %(n_diagnoses)s)::int],
+               %(reason)s, t.at, t.at
+        FROM (SELECT array_agg(id) AS ids FROM users WHERE email LIKE %(email)s) u,
+             LATERAL (SELECT n, now() - random() * INTERVAL '730 days' AS at
+                      FROM generate_series(1, %(count)s) AS n) t
+    """, {'diagnoses': DIAGNOSES, 'n_diagnoses': len(DIAGNOSES), 'reason': SEED_REASON,
+          'email': SEED_EMAIL % '%', 'count': count})
+
+
+def seed_inventory(cur, count):
+    """Add `count` medicine and supply items."""
+    cur.execute("""
+        INSERT INTO inventory (item_name, category, stock_quantity, unit, status, expiry_date)
+        SELECT %(reason)s || ' ' || (%(items)s::text[])[1 + n %% %(n_items)s] || ' #' || n,
+               (%(categories)s::text[])[1 + n %% %(n_categories)s],
+               qty, 'pcs',
+               CASE WHEN qty = 0 THEN 'Out of Stock' WHEN qty < 50 THEN 'Low Stock' ELSE 'Good' END,
+               CURRENT_DATE + (random() * 900)::int - 60
+        FROM (SELECT n, (random() * 500)::int AS qty FROM generate_series(1, %(count)s) AS n) items
+    """, {'reason': SEED_REASON, 'items': INVENTORY_ITEMS, 'n_items': len(INVENTORY_ITEMS),
+          'categories': INVENTORY_CATEGORIES, 'n_categories': len(INVENTORY_CATEGORIES), 'count': count})
+
+
+def seeded_appointment_count(cur):
+    cur.execute("SELECT COUNT(*) FROM appointments WHERE reason = %s", (SEED_REASON,))
+    return cur.fetchone()[0]
+
+
+def clean(cur):
+    cur.execute("DELETE FROM inventory WHERE item_name LIKE %s", (SEED_REASON + ' %',))
+    cur.execute("DELETE FROM soap_notes WHERE plan = %s", (SEED_REASON,))
+    cur.execute("DELETE FROM visit_logs WHERE purpose = %s", (SEED_REASON,))
+    cur.execute("DELETE FROM notifications WHERE type = %s", (SEED_REASON,))
+    cur.execute("DELETE FROM appointments WHERE reason = %s", (SEED_REASON,))
+    appointments = cur.rowcount
+    cur.execute("DELETE FROM users WHERE email LIKE %s", (SEED_EMAIL % '%',))
+    return appointments, cur.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=10000, help='appointments to add')
+    parser.add_argument('--users', type=int, default=2000, help='seeded patients to keep on hand')
+    parser.add_argument('--days', type=int, default=730, help='history spread')
+    parser.add_argument('--soap-notes', type=int, default=0, help='SOAP notes to add')
+    parser.add_argument('--inventory', type=int, default=0, help='inventory items to add')
+    parser.add_argument('--clean', action='store_true', help='delete all seeded rows and exit')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with db_connection() as (conn, cur):
+        if args.clean:
+            appointments, users = clean(cur)
+            print(f"Removed {appointments} seeded appointments and {users} seeded users")
+            return
+        users = seed_users(cur, args.users)
+        seed_appointments(cur, args.appointments, args.days)
+        if args.soap_notes:
+            seed_soap_notes(cur, args.soap_notes)
+        if args.inventory:
+            seed_inventory(cur, args.inventory)
+        total = seeded_appointment_count(cur)
+    print(f"Added {args.appointments} appointments in {time.perf_counter() - started:.1f}s "
+          f"({total} seeded appointments, {users} seeded users)")
+
+
+if __name__ == '__main__':
+    main()
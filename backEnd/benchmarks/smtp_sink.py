@@ -0,0 +1,118 @@
+# pyre-ignore-all-errors
+"""
+Local SMTP stand-in that accepts and discards mail, counting messages and
+connections. Point the backend at it to exercise reminders/outbox without
+sending real email:
+
+    python benchmarks/smtp_sink.py --port 1025
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=1025 MAIL_USE_TLS=0 MAIL_USERNAME= python app.py
+
+--delay adds per-reply latency (ms) to mimic a remote server. Benchmarks
+import start_sink() to run it in-process.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SinkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+
+    def to_dict(self):
+        with self.lock:
+            return {'connections': self.connections, 'messages': self.messages, 'recipients': self.recipients}
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.wfile.write(line.encode() + b'\r\n')
+        self.wfile.flush()
+
+    def handle(self):
+        stats = self.server.stats
+        with stats.lock:
+            stats.connections += 1
+        self.reply('220 smtp-sink ready')
+        recipients = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-smtp-sink\r\n')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                recipients = 0
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients += 1
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                with stats.lock:
+                    stats.messages += 1
+                    stats.recipients += recipients
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                recipients = 0
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=1025, delay_ms=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.delay = delay_ms / 1000
+        self.stats = SinkStats()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def start_sink(port=0, delay_ms=0):
+    """Run a sink on a background thread (port=0 picks a free port); call .shutdown() when done."""
+    sink = SMTPSink(port=port, delay_ms=delay_ms)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    return sink
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--delay', type=float, default=0, help='milliseconds to wait before each reply')
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.delay)
+    print(f"SMTP sink listening on {args.host}:{sink.port} (Ctrl+C prints totals)")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{sink.stats.to_dict()}")
+
+
+if __name__ == '__main__':
+    main()
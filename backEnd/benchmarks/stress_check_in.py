@@ -0,0 +1,180 @@
+# pyre-ignore-all-errors
+"""
+Many kiosks checking patients in at once: every check-in must get its own
+queue number.
+
+Creates --checkins appointments for today (reason 'bench-seed') for seeded
+patients, releases --concurrency threads together against
+POST /api/appointments/<id>/check-in, then checks that every call succeeded
+and that the numbers handed out are unique and match what was stored.
+The appointments are deleted afterwards (--keep leaves them); today's
+counter stays advanced, which only means later numbers start higher.
+
+    python app.py                                  # in another terminal
+    python benchmarks/stress_check_in.py
+    python benchmarks/stress_check_in.py --checkins 2000 --concurrency 100
+    python benchmarks/stress_check_in.py --serve --legacy
+
+--legacy also replays the old MAX(queue_number) + 1 allocation directly
+against the database with the same concurrency, to show the duplicates it
+produced. Point .env at a development database.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+import requests  # type: ignore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import create_connection, db_connection  # type: ignore
+from load_test import percentile, serve_in_process  # type: ignore
+import seed_data  # type: ignore
+
+# The old allocator keyed numbers on this day; far away from any real queue
+LEGACY_DAY = date.today() + timedelta(days=3650)
+
+
+def create_appointments(count, day):
+    with db_connection() as (conn, cur):
+        seed_data.seed_users(cur, min(count, 1000))
+        cur.execute("""
+            INSERT INTO appointments (user_id, appointment_date, appointment_time, service_type, status, reason)
+            SELECT ids[1 + (n %% array_length(ids, 1))], %s, '08:00', 'General Checkup', 'confirmed', %s
+            FROM (SELECT array_agg(id) AS ids FROM users WHERE email LIKE %s) u,
+                 generate_series(1, %s) AS n
+            RETURNING id
+        """, (day, seed_data.SEED_REASON, seed_data.SEED_EMAIL % '%', count))
+        return [row[0] for row in cur.fetchall()]
+
+
+def delete_appointments(ids):
+    with db_connection() as (conn, cur):
+        cur.execute("DELETE FROM appointments WHERE id = ANY(%s)", (ids,))
+
+
+def run_concurrently(ids, concurrency, check_in):
+    """Split `ids` over threads that start together; returns {id: (number or error, ms)}."""
+    results, lock = {}, threading.Lock()
+    barrier = threading.Barrier(concurrency)
+    shares = [ids[i::concurrency] for i in range(concurrency)]
+
+    def worker(share):
+        state, local = {}, {}
+        barrier.wait()
+        for appointment_id in share:
+            started = time.perf_counter()
+            try:
+                outcome = check_in(state, appointment_id)
+            except Exception as e:
+                outcome = f"{type(e).__name__}: {e}"
+            local[appointment_id] = (outcome, (time.perf_counter() - started) * 1000)
+        for resource in state.values():  # the thread's session or connection
+            resource.close()
+        with lock:
+            results.update(local)
+
+    threads = [threading.Thread(target=worker, args=(share,), daemon=True) for share in shares]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def api_check_in(base_url, timeout):
+    def check_in(state, appointment_id):
+        session = state.setdefault('session', requests.Session())
+        response = session.post(f"{base_url}/api/appointments/{appointment_id}/check-in", timeout=timeout)
+        if response.status_code != 200:
+            return f"HTTP {response.status_code}: {response.text[:100]}"
+        return response.json()['queue_number']
+    return check_in
+
+
+def legacy_check_in(state, appointment_id):
+    """The allocation check_in_appointment used before the queue_counters table."""
+    conn = state.get('conn')
+    if conn is None:
+        conn = state['conn'] = create_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(queue_number), 0) + 1 FROM appointments WHERE appointment_date = %s",
+                    (LEGACY_DAY,))
+        number = cur.fetchone()[0]
+        cur.execute("UPDATE appointments SET status = 'waiting', queue_number = %s WHERE id = %s",
+                    (number, appointment_id))
+    conn.commit()
+    return number
+
+
+def report(label, results, elapsed):
+    numbers = [outcome for outcome, _ in results.values() if isinstance(outcome, int)]
+    errors = Counter(outcome for outcome, _ in results.values() if not isinstance(outcome, int))
+    duplicated = {n: c for n, c in Counter(numbers).items() if c > 1}
+    latencies = sorted(ms for _, ms in results.values())
+    span = (max(numbers) - min(numbers) + 1) if numbers else 0
+    print(f"{label}: {len(results)} check-ins in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), "
+          f"p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms")
+    print(f"  {len(set(numbers))} distinct numbers, {sum(duplicated.values())} check-ins on "
+          f"{len(duplicated)} duplicated numbers, {span - len(set(numbers))} gaps, {sum(errors.values())} errors")
+    for error, count in errors.most_common(3):
+        print(f"  {count} x {error}")
+    return not errors and not duplicated
+
+
+def stored_mismatches(results):
+    """Check-ins whose response differs from the queue_number actually stored."""
+    with db_connection() as (conn, cur):
+        cur.execute("SELECT id, queue_number FROM appointments WHERE id = ANY(%s)", (list(results),))
+        stored = dict(cur.fetchall())
+    return sum(1 for appointment_id, (outcome, _) in results.items()
+               if isinstance(outcome, int) and stored.get(appointment_id) != outcome)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--serve', action='store_true', help='run the app in this process instead')
+    parser.add_argument('--checkins', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout')
+    parser.add_argument('--legacy', action='store_true', help='also run the old MAX + 1 allocation')
+    parser.add_argument('--keep', action='store_true', help='leave the created appointments in place')
+    args = parser.parse_args()
+
+    base_url = serve_in_process() if args.serve else args.base_url.rstrip('/')
+    ok = True
+
+    if args.legacy:
+        ids = create_appointments(args.checkins, LEGACY_DAY)
+        try:
+            results, elapsed = run_concurrently(ids, args.concurrency, legacy_check_in)
+            report(f"legacy MAX + 1 ({LEGACY_DAY})", results, elapsed)
+        finally:
+            if not args.keep:
+                delete_appointments(ids)
+
+    ids = create_appointments(args.checkins, date.today())
+    try:
+        results, elapsed = run_concurrently(ids, args.concurrency, api_check_in(base_url, args.timeout))
+        ok = report(f"POST {base_url}/api/appointments/<id>/check-in", results, elapsed)
+        mismatches = stored_mismatches(results)
+        print(f"  {mismatches} responses differ from the stored queue_number")
+        ok = ok and not mismatches
+    finally:
+        if not args.keep:
+            delete_appointments(ids)
+
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,269 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions, pool as pg_pool
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db_connection():
-    conn = psycopg2.connect(
+# Connection pool sizing. Every request checks a connection out of the pool
+# instead of paying a fresh TCP + auth handshake against Postgres.
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+# Seconds a request may wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', '30'))
+
+
+def _connect_kwargs():
+    return dict(
         host=os.getenv('DB_HOST', 'localhost'),
         port=os.getenv('DB_PORT', '5432'),
         database=os.getenv('DB_NAME', 'bhcare'),
         user=os.getenv('DB_USER', 'postgres'),
         password=os.getenv('DB_PASSWORD')
     )
+
+
+def create_connection():
+    """Open a dedicated, unpooled connection (scripts, LISTEN sessions, locks)."""
+    return psycopg2.connect(**_connect_kwargs())
+
+
+class PoolTimeout(pg_pool.PoolError):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT."""
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled psycopg2 connection.
+    Behaves like a normal connection, but close() hands it back to the pool
+    instead of tearing down the session, so existing handlers stay unchanged.
+    """
+
+    def __init__(self, db_pool, raw_conn):
+        self._pool = db_pool
+        self._conn = raw_conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    @property
+    def closed(self):
+        return 1 if self._released else self._conn.closed
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.putconn(self._conn)
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with bounded waiting and checkout metrics."""
+
+    def __init__(self, minconn, maxconn, timeout=DB_POOL_TIMEOUT, ping_after=DB_POOL_PING_AFTER):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **_connect_kwargs())
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+        }
+
+    def getconn(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(f"No database connection available after {self.timeout:.0f}s")
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        try:
+            raw = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['total_wait_ms'] += waited_ms
+            if waited_ms >= 1:
+                self._stats['waits'] += 1
+            if waited_ms > self._stats['max_wait_ms']:
+                self._stats['max_wait_ms'] = waited_ms
+        return raw
+
+    def _checkout_healthy(self):
+        """Hand out a live connection, replacing ones the server has dropped."""
+        for _ in range(self.maxconn + 1):
+            raw = self._pool.getconn()
+            if self._is_healthy(raw):
+                return raw
+            with self._lock:
+                self._stats['discarded'] += 1
+                self._last_used.pop(id(raw), None)
+            self._pool.putconn(raw, close=True)
+        return self._pool.getconn()
+
+    def _is_healthy(self, raw):
+        if raw.closed:
+            return False
+        if raw.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        last_used = self._last_used.get(id(raw))
+        if last_used is None or time.monotonic() - last_used > self.ping_after:
+            try:
+                cur = raw.cursor()
+                cur.execute('SELECT 1')
+                cur.close()
+                raw.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def putconn(self, raw):
+        try:
+            broken = bool(raw.closed)
+            if not broken and raw.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                # Never leak an open (or aborted) transaction into the next request
+                try:
+                    raw.rollback()
+                except psycopg2.Error:
+                    broken = True
+            if not broken and raw.autocommit:
+                raw.autocommit = False
+            with self._lock:
+                if broken:
+                    self._stats['discarded'] += 1
+                    self._last_used.pop(id(raw), None)
+                else:
+                    self._last_used[id(raw)] = time.monotonic()
+            self._pool.putconn(raw, close=broken)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        in_use = len(self._pool._used)
+        stats.update({
+            'min_size': self.minconn,
+            'max_size': self.maxconn,
+            'in_use': in_use,
+            'idle': len(self._pool._pool),
+            'size': in_use + len(self._pool._pool),
+            'avg_wait_ms': round(stats['total_wait_ms'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0,
+        })
+        stats['total_wait_ms'] = round(stats['total_wait_ms'], 3)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 3)
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Create the process-wide pool on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX)
+    return _pool
+
+
+def _track_in_request(conn):
+    """Remember connections checked out during a request so teardown can return leaks."""
+    try:
+        from flask import g, has_request_context  # type: ignore
+    except ImportError:
+        return
+    if has_request_context():
+        g.setdefault('_db_checkouts', []).append(conn)
+
+
+def get_db_connection():
+    db_pool = get_pool()
+    conn = PooledConnection(db_pool, db_pool.getconn())
+    _track_in_request(conn)
     return conn
 
 
+@contextmanager
+def db_connection(cursor_factory=None):
+    """
+    Context-managed checkout: commits on success, rolls back on error and
+    always returns the connection to the pool.
+
+        with db_connection(RealDictCursor) as (conn, cur):
+            cur.execute(...)
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=cursor_factory) if cursor_factory else conn.cursor()
+    try:
+        yield conn, cur
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_request_connection():
+    """One shared pooled connection per Flask request, released on teardown."""
+    from flask import g  # type: ignore
+    conn = g.get('_db_request_conn')
+    if conn is None or conn.closed:
+        conn = get_db_connection()
+        g._db_request_conn = conn
+    return conn
+
+
+def pool_stats():
+    """Pool size and checkout-wait metrics (empty until the pool is first used)."""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
+
+def init_app(app):
+    """Return every connection a request checked out, even on early-return paths."""
+    @app.teardown_request
+    def _release_db_connections(exc=None):
+        from flask import g  # type: ignore
+        for conn in g.pop('_db_checkouts', []):
+            conn.close()
+        g.pop('_db_request_conn', None)
+
+
 # NOTE: Table creation is now handled by Alembic migrations
 # Run: python -m alembic upgrade head
 # See MIGRATIONS.md for more information
@@ -31,7 +279,7 @@ if __name__ == '__main__':
         print(f"PostgreSQL version: {db_version[0]}")
         cursor.close()
         conn.close()
+        print(f"Connection pool: {pool_stats()}")
         print("\nTo create/update tables, run: python -m alembic upgrade head")
     except Exception as e:
         print(f"Database connection failed: {e}")
-
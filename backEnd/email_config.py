@@ -3,16 +3,18 @@
 Email configuration and utility functions for sending emails via Gmail SMTP
 """
 from flask_mail import Mail, Message  # type: ignore
+import os
 import secrets
 from datetime import datetime, timedelta
 
-# Email configuration
+# Email configuration (MAIL_SERVER/MAIL_PORT/MAIL_USE_TLS env vars point it elsewhere,
+# e.g. the local stand-in: python benchmarks/smtp_sink.py)
 MAIL_CONFIG = {
-    'MAIL_SERVER': 'smtp.gmail.com',
-    'MAIL_PORT': 587,
-    'MAIL_USE_TLS': True,
-    'MAIL_USERNAME': 'bhcarehealthcenter@gmail.com',
-    'MAIL_PASSWORD': 'omeo hvvj lykd buxc',  # App password
+    'MAIL_SERVER': os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
+    'MAIL_PORT': int(os.getenv('MAIL_PORT', '587')),
+    'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', '1').lower() in ('1', 'true', 'yes'),
+    'MAIL_USERNAME': os.getenv('MAIL_USERNAME', 'bhcarehealthcenter@gmail.com'),
+    'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD', 'omeo hvvj lykd buxc'),  # App password
     'MAIL_DEFAULT_SENDER': 'bhcarehealthcenter@gmail.com'
 }
 
@@ -467,10 +469,10 @@ def send_appointment_confirmation_email(mail, recipient_email, first_name, date,
     
     mail.send(msg)
 
-def send_appointment_reminder_email(mail, recipient_email, first_name, date, time, service):
-    """Send an appointment reminder email"""
+def build_appointment_reminder_email(recipient_email, first_name, date, time, service):
+    """Render an appointment reminder (reminder_service sends these in batches)"""
     
-    msg = Message(
+    return Message(
         subject="Reminder: Upcoming Appointment - BHCare Health Center",
         recipients=[recipient_email],
         html=f"""
@@ -509,8 +511,10 @@ def send_appointment_reminder_email(mail, recipient_email, first_name, date, tim
         </html>
         """
     )
-    
-    mail.send(msg)
+
+def send_appointment_reminder_email(mail, recipient_email, first_name, date, time, service):
+    """Send an appointment reminder email"""
+    mail.send(build_appointment_reminder_email(recipient_email, first_name, date, time, service))
 
 def send_admin_creation_email(mail, email, first_name, temp_password):
     """Send welcome email with temporary credentials to a new Admin."""
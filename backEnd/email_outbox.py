@@ -0,0 +1,313 @@
+# pyre-ignore-all-errors
+"""
+Durable outbound email queue.
+
+Handlers keep building their flask_mail Message through email_config.send_*,
+but pass the outbox instead of `mail`: outbox.send(msg) only INSERTs the
+rendered message into email_outbox and returns, so request latency no longer
+depends on the SMTP server.
+
+Worker threads claim due rows with FOR UPDATE SKIP LOCKED (safe across
+processes), deliver each batch over one reused SMTP connection and retry
+failures with exponential backoff. After EMAIL_MAX_ATTEMPTS, or on a
+permanent SMTP rejection, a row is dead-lettered (status 'dead') and kept for
+inspection/retry via /api/admin/email-outbox.
+
+Messages carry temporary passwords and reset codes, so the html/body are
+cleared as soon as a row is sent, and for dead rows once they are older than
+EMAIL_DEAD_RETENTION; a dead row can only be retried while it still has them.
+"""
+import os
+import random
+import smtplib
+import threading
+
+import psycopg2.extras  # type: ignore
+from flask_mail import Message  # type: ignore
+
+from database import db_connection  # type: ignore
+
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', '2'))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+# Idle workers re-check the table this often (enqueues in this process wake them immediately)
+EMAIL_POLL_INTERVAL = float(os.getenv('EMAIL_POLL_INTERVAL', '5'))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE = float(os.getenv('EMAIL_RETRY_BASE', '30'))
+EMAIL_RETRY_MAX = float(os.getenv('EMAIL_RETRY_MAX', '3600'))
+# A claimed row whose worker died becomes due again after this many seconds
+EMAIL_LOCK_TIMEOUT = float(os.getenv('EMAIL_LOCK_TIMEOUT', '300'))
+# Seconds after queueing that a dead message keeps its content for a retry
+EMAIL_DEAD_RETENTION = float(os.getenv('EMAIL_DEAD_RETENTION', '86400'))
+
+
+def is_permanent(error):
+    """5xx rejections of the message itself (not of our login/connection) will fail again on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPDataError, smtplib.SMTPSenderRefused)):
+        return 500 <= error.smtp_code < 600
+    return isinstance(error, smtplib.SMTPNotSupportedError)
+
+
+class SMTPSession:
+    """
+    One SMTP connection reused across many sends (Flask-Mail opens a new one per
+    mail.send). Opened lazily, and reopened only after a non-permanent failure.
+    Needs an app context, like Flask-Mail itself.
+    """
+
+    def __init__(self, mail):
+        self.mail = mail
+        self.connection = None
+        self.connections = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        if self.connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self.connection = connection
+            self.connections += 1
+        return self.connection
+
+    def send(self, msg):
+        connection = self.open()
+        try:
+            connection.send(msg)
+        except Exception as e:
+            if not is_permanent(e):
+                self.close()
+            raise
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+def retry_delay(attempts, base=EMAIL_RETRY_BASE, cap=EMAIL_RETRY_MAX):
+    """Seconds to wait after the given number of failed attempts (exponential, +-20% jitter)."""
+    return min(cap, base * 2 ** max(0, attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+class EmailOutbox:
+    def __init__(self, app, mail, workers=EMAIL_WORKERS, batch_size=EMAIL_BATCH_SIZE,
+                 poll_interval=EMAIL_POLL_INTERVAL, max_attempts=EMAIL_MAX_ATTEMPTS,
+                 lock_timeout=EMAIL_LOCK_TIMEOUT, dead_retention=EMAIL_DEAD_RETENTION):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lock_timeout = lock_timeout
+        self.dead_retention = dead_retention
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'inline_fallbacks': 0,
+                       'batches': 0, 'smtp_connections': 0, 'purged': 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    # ---- producer side ----
+    def send(self, msg):
+        """Queue a flask_mail Message; drop-in replacement for mail.send(msg)."""
+        try:
+            with db_connection() as (conn, cur):
+                cur.execute("""
+                    INSERT INTO email_outbox (sender, recipients, subject, html, body, max_attempts)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (msg.sender, [str(r) for r in msg.recipients], msg.subject, msg.html, msg.body,
+                      self.max_attempts))
+                outbox_id = cur.fetchone()[0]
+        except Exception as e:
+            # No outbox table (migration not applied) or DB down: keep the old inline behaviour
+            print(f"[EmailOutbox] Could not queue '{msg.subject}', sending inline: {e}")
+            self._count('inline_fallbacks')
+            self.mail.send(msg)
+            return None
+
+        self._count('queued')
+        self._wake.set()
+        return outbox_id
+
+    # ---- worker side ----
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'email-outbox-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        # Message/Connection need the app for the default sender and Flask-Mail signals
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    claimed = self.drain_once()
+                except Exception as e:
+                    print(f"[EmailOutbox] Worker error: {e}")
+                    claimed = 0
+                if claimed < self.batch_size:
+                    try:
+                        self.purge_dead()
+                    except Exception as e:
+                        print(f"[EmailOutbox] Purge error: {e}")
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+
+    def drain_once(self):
+        """Claim and deliver one batch; returns how many rows were claimed."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        sent, failed = self._deliver(rows)
+        self._record(sent, failed)
+        self._count('batches')
+        return len(rows)
+
+    def _claim(self):
+        with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+            # Claiming pushes next_attempt_at out by the lock timeout, so rows held by a
+            # crashed worker simply become due again
+            cur.execute("""
+                UPDATE email_outbox
+                SET status = 'sending',
+                    attempts = attempts + 1,
+                    next_attempt_at = NOW() + %s * INTERVAL '1 second'
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= NOW()
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, sender, recipients, subject, html, body, attempts, max_attempts
+            """, (self.lock_timeout, self.batch_size))
+            return cur.fetchall()
+
+    def _deliver(self, rows):
+        """Send a claimed batch over one SMTP connection."""
+        sent, failed = [], []
+        with SMTPSession(self.mail) as smtp:
+            for i, row in enumerate(rows):
+                try:
+                    smtp.open()
+                except Exception as e:
+                    # Server unreachable: the rest of the batch would fail the same way
+                    failed.extend((r, e) for r in rows[i:])
+                    break
+                msg = Message(subject=row['subject'], recipients=list(row['recipients']),
+                              html=row['html'], body=row['body'], sender=row['sender'])
+                try:
+                    smtp.send(msg)
+                    sent.append(row['id'])
+                except Exception as e:
+                    failed.append((row, e))
+        self._count('smtp_connections', smtp.connections)
+        return sent, failed
+
+    def _record(self, sent, failed):
+        with db_connection() as (conn, cur):
+            if sent:
+                cur.execute("""
+                    UPDATE email_outbox
+                    SET status = 'sent', sent_at = NOW(), last_error = NULL, html = NULL, body = NULL
+                    WHERE id = ANY(%s)
+                """, (sent,))
+            for row, error in failed:
+                if row['attempts'] >= row['max_attempts'] or is_permanent(error):
+                    cur.execute("UPDATE email_outbox SET status = 'dead', last_error = %s WHERE id = %s",
+                                (str(error), row['id']))
+                    print(f"[EmailOutbox] Dead-lettered #{row['id']} to {row['recipients']} after {row['attempts']} attempts: {error}")
+                    self._count('dead')
+                else:
+                    cur.execute("""
+                        UPDATE email_outbox
+                        SET status = 'pending', last_error = %s,
+                            next_attempt_at = NOW() + %s * INTERVAL '1 second'
+                        WHERE id = %s
+                    """, (str(error), retry_delay(row['attempts']), row['id']))
+                    self._count('retried')
+        self._count('sent', len(sent))
+
+    def purge_dead(self):
+        """Clear the content of dead messages past EMAIL_DEAD_RETENTION; returns how many."""
+        with db_connection() as (conn, cur):
+            cur.execute("""
+                UPDATE email_outbox SET html = NULL, body = NULL
+                WHERE status = 'dead' AND (html IS NOT NULL OR body IS NOT NULL)
+                  AND created_at < NOW() - %s * INTERVAL '1 second'
+            """, (self.dead_retention,))
+            purged = cur.rowcount
+        if purged:
+            self._count('purged', purged)
+        return purged
+
+    # ---- admin ----
+    def retry(self, outbox_id):
+        """Re-queue a dead (or stuck) message now with a fresh attempt budget, while it is within retention."""
+        with db_connection() as (conn, cur):
+            cur.execute("""
+                UPDATE email_outbox
+                SET status = 'pending', attempts = 0, next_attempt_at = NOW()
+                WHERE id = %s AND status <> 'sent' AND (html IS NOT NULL OR body IS NOT NULL)
+                  AND created_at >= NOW() - %s * INTERVAL '1 second'
+                RETURNING id
+            """, (outbox_id, self.dead_retention))
+            found = cur.fetchone() is not None
+        if found:
+            self._wake.set()
+        return found
+
+    def stats(self):
+        with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+            cur.execute("SELECT status, COUNT(*) AS count FROM email_outbox GROUP BY status")
+            by_status = {row['status']: row['count'] for row in cur.fetchall()}
+            cur.execute("""
+                SELECT EXTRACT(EPOCH FROM NOW() - MIN(created_at)) AS oldest_pending_seconds
+                FROM email_outbox WHERE status IN ('pending', 'sending')
+            """)
+            oldest = cur.fetchone()['oldest_pending_seconds']
+        with self._lock:
+            worker = dict(self._stats)
+        return {
+            'by_status': by_status,
+            'oldest_pending_seconds': float(oldest) if oldest is not None else None,
+            'workers': len([t for t in self._threads if t.is_alive()]),
+            'worker': worker,
+        }
+
+    def dead_letters(self, limit=50):
+        with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+            cur.execute("""
+                SELECT id, recipients, subject, attempts, last_error, created_at,
+                       (html IS NOT NULL OR body IS NOT NULL)
+                       AND created_at >= NOW() - %s * INTERVAL '1 second' AS retryable
+                FROM email_outbox WHERE status = 'dead'
+                ORDER BY id DESC LIMIT %s
+            """, (self.dead_retention, limit))
+            rows = cur.fetchall()
+        for row in rows:
+            row['created_at'] = row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+        return rows
@@ -0,0 +1,315 @@
+# pyre-ignore-all-errors
+"""
+Server-Sent Events for screens that used to poll (queue, center status).
+
+Handlers that change appointments call notify_appointment_change() inside
+their transaction; Postgres delivers the NOTIFY on commit to every backend
+process. Each process keeps one LISTEN connection (started by the first
+subscriber) and, per change touching today, reloads each topic once and
+pushes the difference to all of its subscribers. Query load therefore
+follows the rate of changes, not the number of open screens.
+
+    GET /api/queue/stream            (appointments blueprint)
+    GET /api/center-status/stream    (security blueprint)
+
+Each stream starts with an `event: snapshot` carrying the full state,
+followed by `event: delta` messages (see queue_delta / dict_delta). Event
+ids let a reconnecting EventSource skip the snapshot if nothing changed.
+
+    LIVE_EVENTS_ENABLED=1       0 makes the streams answer 503 (clients poll)
+    LIVE_RESYNC_INTERVAL=60     seconds between reloads without notifications
+    LIVE_HEARTBEAT=15           seconds between keep-alive comments
+    LIVE_DEBOUNCE_MS=200        wait to coalesce bursts of notifications
+    LIVE_MAX_SUBSCRIBERS=200    open streams per process
+"""
+import json
+import os
+import queue
+import select
+import threading
+import time
+from datetime import date
+
+import psycopg2.extras  # type: ignore
+from flask import Response, jsonify, request  # type: ignore
+
+from database import create_connection  # type: ignore
+
+LIVE_EVENTS_ENABLED = os.getenv('LIVE_EVENTS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+LIVE_RESYNC_INTERVAL = float(os.getenv('LIVE_RESYNC_INTERVAL', '60'))
+LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))
+LIVE_DEBOUNCE_MS = float(os.getenv('LIVE_DEBOUNCE_MS', '200'))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv('LIVE_MAX_SUBSCRIBERS', '200'))
+
+APPOINTMENTS_CHANNEL = 'appointments_changed'
+SUBSCRIBER_BUFFER = 100
+READY_TIMEOUT = 10
+
+
+def notify_appointment_change(cursor, appointment_id, *days, event='updated'):
+    """
+    Announce a change to appointments on `days`; other processes get it when
+    the transaction commits. Returns the change: pass it to live_hub.dispatch()
+    after conn.commit() so this process's readers see it without waiting for
+    the NOTIFY (dispatching earlier would let them re-read the old row).
+    """
+    payload = {
+        'id': appointment_id,
+        'days': sorted({d.isoformat() if isinstance(d, date) else str(d) for d in days if d}),
+        'event': event,
+    }
+    cursor.execute("SELECT pg_notify(%s, %s)", (APPOINTMENTS_CHANNEL, json.dumps(payload)))
+    return payload
+
+
+def touches_today(change):
+    """Topic filter: the change involves today's appointments (or its days are unknown)."""
+    days = change.get('days')
+    return not days or date.today().isoformat() in days
+
+
+def dict_delta(old, new):
+    """Keys of `new` whose values differ from `old`; None when nothing changed."""
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    return changed or None
+
+
+def queue_delta(old, new):
+    """
+    Difference between two lists of rows keyed by 'id':
+    {"upsert": [new or changed rows], "remove": [ids], "order": [ids in display order]}
+    """
+    old_rows = {row['id']: row for row in old}
+    new_rows = {row['id']: row for row in new}
+    upsert = [row for row in new if old_rows.get(row['id']) != row]
+    remove = [row_id for row_id in old_rows if row_id not in new_rows]
+    order = [row['id'] for row in new]
+    if not upsert and not remove and order == [row['id'] for row in old]:
+        return None
+    return {'upsert': upsert, 'remove': remove, 'order': order}
+
+
+class LiveTopic:
+    def __init__(self, name, load, diff, wants):
+        self.name = name
+        self.load = load          # load(cursor, day) -> JSON-serializable state
+        self.diff = diff          # diff(old, new) -> delta or None
+        self.wants = wants        # wants(change payload) -> bool
+        self.state = None
+        self.version = None
+
+
+class Subscriber:
+    def __init__(self):
+        self.events = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.overflowed = False
+
+
+class LiveHub:
+    def __init__(self, channel=APPOINTMENTS_CHANNEL, enabled=LIVE_EVENTS_ENABLED,
+                 resync_interval=LIVE_RESYNC_INTERVAL, heartbeat=LIVE_HEARTBEAT,
+                 debounce=LIVE_DEBOUNCE_MS / 1000, max_subscribers=LIVE_MAX_SUBSCRIBERS):
+        self.channel = channel
+        self.enabled = enabled
+        self.resync_interval = resync_interval
+        self.heartbeat = heartbeat
+        self.debounce = debounce
+        self.max_subscribers = max_subscribers
+        self.topics = {}
+        self._subscribers = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._connected = False
+        self._stop = threading.Event()
+        self._thread = None
+        # Versions from another process (or an earlier run) never match ours
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._seq = 0
+        self._stats = {'notifications': 0, 'reloads': 0, 'deltas': 0, 'events_sent': 0,
+                       'overflows': 0, 'rejected': 0, 'errors': 0, 'connects': 0}
+
+    def topic(self, name, load, diff=dict_delta, wants=touches_today):
+        self.topics[name] = LiveTopic(name, load, diff, wants)
+        self._subscribers[name] = set()
+
+    def on_change(self, callback):
+        """Call callback(change) for every notification; change is None after a reconnect (anything may have changed)."""
+        self._callbacks.append(callback)
+
+    def dispatch(self, change):
+        for callback in self._callbacks:
+            try:
+                callback(change)
+            except Exception as e:
+                self._count('errors')
+                print(f"[LiveEvents] Change callback failed: {e}")
+
+    @property
+    def connected(self):
+        """Listening right now, so every committed change will be seen."""
+        return self._connected
+
+    # Listener thread
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='live-events', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = create_connection()
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                self._count('connects')
+                # Anything may have changed while we were not listening
+                self.dispatch(None)
+                self._reload(conn, self.topics.values())
+                self._connected = True
+                self._ready.set()
+                backoff = 1
+                self._listen(conn)
+            except Exception as e:
+                self._count('errors')
+                print(f"[LiveEvents] Listener error: {e}; reconnecting in {backoff}s")
+            finally:
+                self._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _listen(self, conn):
+        day, last_sync = date.today(), time.monotonic()
+        while not self._stop.is_set():
+            wait = max(0.0, min(1.0, last_sync + self.resync_interval - time.monotonic()))
+            due = set()
+            if select.select([conn], [], [], wait)[0]:
+                if self.debounce:
+                    time.sleep(self.debounce)
+                conn.poll()
+                while conn.notifies:
+                    notice = conn.notifies.pop(0)
+                    self._count('notifications')
+                    try:
+                        change = json.loads(notice.payload)
+                    except ValueError:
+                        change = {}
+                    self.dispatch(change)
+                    due.update(name for name, topic in self.topics.items() if topic.wants(change))
+            if date.today() != day or time.monotonic() >= last_sync + self.resync_interval:
+                day, last_sync = date.today(), time.monotonic()
+                due = set(self.topics)
+            if due:
+                self._reload(conn, [self.topics[name] for name in due])
+
+    def _reload(self, conn, topics):
+        today = date.today()
+        for topic in topics:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                state = topic.load(cur, today)
+            self._count('reloads')
+            # Round-trip through JSON so comparisons see what clients see
+            state = json.loads(json.dumps(state, default=str))
+            self._publish(topic, state)
+
+    def _publish(self, topic, state):
+        with self._lock:
+            delta = topic.diff(topic.state, state) if topic.state is not None else None
+            if topic.state is not None and delta is None:
+                return
+            self._seq += 1
+            topic.state, topic.version = state, f"{self._epoch}-{self._seq}"
+            if delta is None:
+                return
+            self._stats['deltas'] += 1
+            for subscriber in self._subscribers[topic.name]:
+                try:
+                    subscriber.events.put_nowait((topic.version, 'delta', delta))
+                except queue.Full:
+                    # Too far behind for deltas; it gets a fresh snapshot instead
+                    subscriber.overflowed = True
+                    self._stats['overflows'] += 1
+
+    # Streams
+
+    def stream(self, name):
+        """Flask response streaming topic `name` to one client."""
+        if not self.enabled:
+            return jsonify({"error": "Live updates are disabled"}), 503
+        topic = self.topics[name]
+        self.start()
+        if not self._ready.wait(READY_TIMEOUT):
+            return jsonify({"error": "Live updates are not available right now"}), 503
+
+        with self._lock:
+            if sum(len(subs) for subs in self._subscribers.values()) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                return jsonify({"error": "Too many live connections"}), 503
+            subscriber = Subscriber()
+            self._subscribers[name].add(subscriber)
+            version, state = topic.version, topic.state
+        last_event_id = request.headers.get('Last-Event-ID')
+
+        def events():
+            try:
+                yield "retry: 3000\n\n"
+                if last_event_id != version:
+                    yield self._event(version, 'snapshot', state)
+                while not self._stop.is_set():
+                    if subscriber.overflowed:
+                        with self._lock:
+                            subscriber.overflowed = False
+                            subscriber.events = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+                            current_version, current_state = topic.version, topic.state
+                        yield self._event(current_version, 'snapshot', current_state)
+                    try:
+                        event_id, event, data = subscriber.events.get(timeout=self.heartbeat)
+                    except queue.Empty:
+                        # Keeps proxies from timing out and notices closed clients
+                        yield ": keepalive\n\n"
+                        continue
+                    yield self._event(event_id, event, data)
+            finally:
+                with self._lock:
+                    self._subscribers[name].discard(subscriber)
+
+        response = Response(events(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _event(self, event_id, event, data):
+        self._count('events_sent')
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = {name: len(subs) for name, subs in self._subscribers.items()}
+        stats['enabled'] = self.enabled
+        stats['listening'] = self._connected
+        return stats
+
+
+# Shared by the blueprints that register topics and stream them
+live_hub = LiveHub()
@@ -0,0 +1,222 @@
+# pyre-ignore-all-errors
+"""
+Today's appointment queue kept in memory, in serving order.
+
+Order: staff-verified pregnant, staff-verified PWD, self-declared pregnant
+(then not pregnant, then unknown), then appointment time. The queue is
+built from the database when the live events listener connects (at
+startup) and after a day change, reconnect or LIVE_RESYNC_INTERVAL.
+Between rebuilds, every appointment change (check-in, status, priority,
+booking, cancel, reschedule) re-reads just that appointment and moves it
+to its place. Reading the first k patients is a slice, with one sorted
+index for the whole day and one per service type.
+
+Changes reach it through live_events: from the handlers in this process
+once they commit (live_hub.dispatch), and over LISTEN/NOTIFY from the
+others. While the listener is not connected, top() returns None and
+callers query the database instead.
+"""
+import bisect
+import threading
+import time as _time
+from datetime import date, datetime, time
+
+from psycopg2.extras import RealDictCursor  # type: ignore
+
+from database import db_connection  # type: ignore
+from live_events import LIVE_RESYNC_INTERVAL, live_hub, touches_today  # type: ignore
+
+QUEUE_STATUSES = ('pending', 'confirmed', 'serving')
+
+QUEUE_SELECT = """
+    SELECT
+        a.id,
+        a.appointment_date,
+        a.appointment_time,
+        a.service_type,
+        a.status,
+        a.is_pregnant,
+        a.pregnancy_weeks,
+        COALESCE(a.staff_verified_pregnant, false) as staff_verified_pregnant,
+        COALESCE(a.staff_verified_pwd, false) as staff_verified_pwd,
+        u.first_name,
+        u.last_name,
+        u.gender,
+        COALESCE(u.is_pwd, false) as is_pwd
+    FROM appointments a
+    JOIN users u ON a.user_id = u.id
+"""
+
+
+def format_time(value):
+    """Appointment time as HH:MM (time columns, or 'HH:MM:SS' strings)."""
+    if isinstance(value, (datetime, time)):
+        return value.strftime('%H:%M')
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%H:%M:%S').time().strftime('%H:%M')
+        except ValueError:
+            pass
+    return value
+
+
+def queue_key(row):
+    """Sort key matching the ORDER BY the queue endpoint used to run; id breaks ties."""
+    pregnant = {True: 0, False: 1}.get(row['is_pregnant'], 2)
+    appointment_time = row['appointment_time']
+    return (not row['staff_verified_pregnant'], not row['staff_verified_pwd'], pregnant,
+            appointment_time is None, str(appointment_time or ''), row['id'])
+
+
+def service_key(service_type):
+    return (service_type or '').strip().lower()
+
+
+class LiveQueue:
+    def __init__(self, resync_interval=LIVE_RESYNC_INTERVAL):
+        self.resync_interval = resync_interval
+        self.day = None
+        self.rows = {}           # id -> row as served
+        self.keys = {}           # id -> queue_key(row)
+        self.order = []          # sorted keys for the whole day
+        self.by_service = {}     # service_key -> sorted keys
+        self._pending = set()    # ids to re-read before the next read
+        self._stale = True       # rebuild everything before the next read
+        self._built_at = 0.0
+        # _lock guards the in-memory state and is never held across I/O, so writers
+        # calling on_change() never wait on a query; _sync_lock lets one sync run at a time
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._stats = {'rebuilds': 0, 'row_refreshes': 0, 'reads': 0, 'fallbacks': 0}
+
+    # Invalidation
+
+    def on_change(self, change):
+        """live_events callback: re-read the changed appointment, or everything after a reconnect."""
+        with self._lock:
+            if change is None or change.get('id') is None:
+                self._stale = True
+            elif touches_today(change):
+                self._pending.add(change['id'])
+
+    def _needs_sync(self):
+        with self._lock:
+            return (self._stale or self._pending or self.day != date.today()
+                    or _time.monotonic() - self._built_at >= self.resync_interval)
+
+    def sync(self, cursor):
+        """Bring the queue up to date using `cursor` (a RealDictCursor)."""
+        with self._sync_lock:
+            self._sync(cursor)
+
+    def _sync(self, cursor):
+        # Claim the work under the lock; changes arriving during the query are re-read next time
+        with self._lock:
+            today = date.today()
+            rebuild = self._stale or self.day != today or _time.monotonic() - self._built_at >= self.resync_interval
+            ids, self._pending, self._stale = list(self._pending), set(), False
+        try:
+            if rebuild:
+                cursor.execute(QUEUE_SELECT + " WHERE a.appointment_date = %s AND a.status = ANY(%s)",
+                               (today, list(QUEUE_STATUSES)))
+                rows = cursor.fetchall()
+            elif ids:
+                cursor.execute(QUEUE_SELECT + " WHERE a.id = ANY(%s)", (ids,))
+                found = {row['id']: row for row in cursor.fetchall()}
+        except Exception:
+            with self._lock:
+                self._stale = self._stale or rebuild
+                self._pending.update(ids)
+            raise
+        with self._lock:
+            if rebuild:
+                self._rebuild(rows, today)
+            elif ids:
+                for appointment_id in ids:
+                    self._remove(appointment_id)
+                    row = found.get(appointment_id)
+                    if row is not None and row['appointment_date'] == today and row['status'] in QUEUE_STATUSES:
+                        self._insert(row)
+                self._stats['row_refreshes'] += len(ids)
+
+    def _rebuild(self, rows, day):
+        self.rows, self.keys, self.order, self.by_service = {}, {}, [], {}
+        for row in rows:
+            self._insert(row, sort=False)
+        self.order.sort()
+        for keys in self.by_service.values():
+            keys.sort()
+        self.day, self._built_at = day, _time.monotonic()
+        self._stats['rebuilds'] += 1
+
+    def _insert(self, row, sort=True):
+        row = dict(row)
+        row.pop('appointment_date', None)
+        row['appointment_time'] = format_time(row['appointment_time'])
+        key = queue_key(row)
+        self.rows[row['id']], self.keys[row['id']] = row, key
+        service = self.by_service.setdefault(service_key(row['service_type']), [])
+        if sort:
+            bisect.insort(self.order, key)
+            bisect.insort(service, key)
+        else:
+            self.order.append(key)
+            service.append(key)
+
+    def _remove(self, appointment_id):
+        key = self.keys.pop(appointment_id, None)
+        if key is None:
+            return
+        row = self.rows.pop(appointment_id)
+        for keys in (self.order, self.by_service.get(service_key(row['service_type']), [])):
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    # Reads
+
+    def load(self, cursor, day):
+        """live_events topic loader: the whole queue, synced through the listener's connection."""
+        self.sync(cursor)
+        return self._slice(None, None)
+
+    def top(self, limit=None, service=None):
+        """
+        First `limit` patients in serving order (all if None), optionally for one
+        service type. None when the listener is not connected and the caller
+        should read the database.
+        """
+        if not live_hub.connected:
+            if live_hub.enabled:
+                live_hub.start()
+            with self._lock:
+                self._stats['fallbacks'] += 1
+            return None
+        if self._needs_sync():
+            # One reader checks out a connection and syncs (without _lock); the rest wait for it
+            with self._sync_lock:
+                if self._needs_sync():
+                    with db_connection(RealDictCursor) as (conn, cur):
+                        self._sync(cur)
+        with self._lock:
+            self._stats['reads'] += 1
+            return self._slice(limit, service)
+
+    def _slice(self, limit, service):
+        with self._lock:
+            keys = self.order if service is None else self.by_service.get(service_key(service), [])
+            keys = keys if limit is None else keys[:limit]
+            return [dict(self.rows[key[-1]]) for key in keys]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['day'] = self.day.isoformat() if self.day else None
+            stats['size'] = len(self.rows)
+            stats['pending'] = len(self._pending)
+            stats['services'] = {name: len(keys) for name, keys in self.by_service.items() if keys}
+        return stats
+
+
+live_queue = LiveQueue()
+live_hub.on_change(live_queue.on_change)
@@ -0,0 +1,56 @@
+"""add indexes for hot appointment, user, notification and visit log predicates
+
+Revision ID: a4e7c2d9b813
+Revises: f1c6a8e3b520
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e7c2d9b813'
+down_revision: Union[str, Sequence[str], None] = 'f1c6a8e3b520'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Indexes matching the WHERE clauses the endpoints actually use (see benchmarks/explain_indexes.py)."""
+    # Day queue, today's counts: appointment_date = ? AND status ...
+    op.create_index('idx_appointments_date_status', 'appointments', ['appointment_date', 'status'])
+    # Slot availability checks only look at bookings that still hold their slot
+    op.create_index('idx_appointments_open_slots', 'appointments', ['appointment_date', 'appointment_time'],
+                    postgresql_where=sa.text("status NOT IN ('cancelled', 'completed')"))
+    # Patient history: user_id = ? AND status = 'completed'
+    op.create_index('idx_appointments_user_status', 'appointments', ['user_id', 'status'])
+
+    # Login, registration and password reset all match LOWER(email) = LOWER(?)
+    op.create_index('idx_users_lower_email', 'users', [sa.text('LOWER(email)')])
+    # Staff lookups; patients are most of the table and are served by idx_users_patients_last_name_id
+    # (f1c6a8e3b520)
+    op.create_index('idx_users_staff_role', 'users', ['role'],
+                    postgresql_where=sa.text("role <> 'Patient'"))
+
+    op.create_index('idx_notifications_user_created', 'notifications',
+                    ['user_id', sa.text('created_at DESC')])
+    op.create_index('idx_notifications_user_unread', 'notifications', ['user_id'],
+                    postgresql_where=sa.text('is_read = false'))
+
+    # Visitor stats: type = ? AND timestamp::date = ?
+    op.create_index('idx_visit_logs_type_day', 'visit_logs', ['type', sa.text('(("timestamp")::date)')])
+
+
+def downgrade() -> None:
+    """Drop hot predicate indexes."""
+    op.drop_index('idx_visit_logs_type_day', table_name='visit_logs')
+    op.drop_index('idx_notifications_user_unread', table_name='notifications')
+    op.drop_index('idx_notifications_user_created', table_name='notifications')
+    op.drop_index('idx_users_staff_role', table_name='users')
+    op.drop_index('idx_users_lower_email', table_name='users')
+    op.drop_index('idx_appointments_user_status', table_name='appointments')
+    op.drop_index('idx_appointments_open_slots', table_name='appointments')
+    op.drop_index('idx_appointments_date_status', table_name='appointments')
@@ -0,0 +1,42 @@
+"""index foreign keys that reference users
+
+Revision ID: b7d3f5a1c924
+Revises: a4e7c2d9b813
+Create Date: 2026-10-17 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3f5a1c924'
+down_revision: Union[str, Sequence[str], None] = 'a4e7c2d9b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Deleting a user checks every referencing table; without these each check is a full scan."""
+    # Also serves the patient history lookups: patient_id = ? ORDER BY created_at DESC
+    op.create_index('idx_soap_notes_patient_created', 'soap_notes',
+                    ['patient_id', sa.text('created_at DESC')])
+    op.create_index('idx_visit_logs_user_id', 'visit_logs', ['user_id'])
+    op.create_index('idx_medical_records_user_id', 'medical_records', ['user_id'])
+    op.create_index('idx_medical_records_doctor_id', 'medical_records', ['doctor_id'])
+    op.create_index('idx_lab_results_patient_id', 'lab_results', ['patient_id'])
+    op.create_index('idx_bmi_logs_user_id', 'bmi_logs', ['user_id'])
+    op.create_index('idx_bp_logs_user_id', 'bp_logs', ['user_id'])
+
+
+def downgrade() -> None:
+    """Drop user foreign key indexes."""
+    op.drop_index('idx_bp_logs_user_id', table_name='bp_logs')
+    op.drop_index('idx_bmi_logs_user_id', table_name='bmi_logs')
+    op.drop_index('idx_lab_results_patient_id', table_name='lab_results')
+    op.drop_index('idx_medical_records_doctor_id', table_name='medical_records')
+    op.drop_index('idx_medical_records_user_id', table_name='medical_records')
+    op.drop_index('idx_visit_logs_user_id', table_name='visit_logs')
+    op.drop_index('idx_soap_notes_patient_created', table_name='soap_notes')
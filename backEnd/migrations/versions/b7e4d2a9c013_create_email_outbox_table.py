@@ -0,0 +1,61 @@
+"""create email_outbox table
+
+Revision ID: b7e4d2a9c013
+Revises: a2f93c1d7e88
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d2a9c013'
+down_revision: Union[str, Sequence[str], None] = 'a2f93c1d7e88'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Create email_outbox, the durable queue drained by email_outbox.py workers.
+
+    html/body hold credentials and reset codes, so they only live as long as the
+    message is undelivered: workers set them to NULL when a row is sent, and on
+    dead rows once they are EMAIL_DEAD_RETENTION (default 24 h) old.
+    """
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('sender', sa.String(length=255), nullable=True),
+        sa.Column('recipients', postgresql.ARRAY(sa.Text()), nullable=False),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('html', sa.Text(), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        # pending -> sending -> sent, or back to pending with backoff, or dead after max_attempts
+        sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_attempts', sa.Integer(), server_default='6', nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Workers only ever scan due, unfinished rows
+    op.create_index(
+        'idx_email_outbox_due', 'email_outbox', ['next_attempt_at'],
+        postgresql_where=sa.text("status IN ('pending', 'sending')")
+    )
+    op.create_index('idx_email_outbox_status', 'email_outbox', ['status'])
+
+
+def downgrade() -> None:
+    """Drop email_outbox table."""
+    op.drop_index('idx_email_outbox_status', table_name='email_outbox')
+    op.drop_index('idx_email_outbox_due', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,42 @@
+"""create scheduler_jobs table
+
+Revision ID: c3f8a1e6d254
+Revises: b7e4d2a9c013
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a1e6d254'
+down_revision: Union[str, Sequence[str], None] = 'b7e4d2a9c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create scheduler_jobs: one row per periodic job (see scheduler.py)."""
+    op.create_table(
+        'scheduler_jobs',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_finished_at', sa.DateTime(), nullable=True),
+        # running / ok / error
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        # host:pid of the process that ran it last
+        sa.Column('holder', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Drop scheduler_jobs table."""
+    op.drop_table('scheduler_jobs')
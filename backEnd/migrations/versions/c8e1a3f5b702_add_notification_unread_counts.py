@@ -0,0 +1,95 @@
+"""add per-user unread notification counters
+
+Revision ID: c8e1a3f5b702
+Revises: b7d3f5a1c924
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e1a3f5b702'
+down_revision: Union[str, Sequence[str], None] = 'b7d3f5a1c924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Unread notifications per user for the bell badge, kept current by the triggers below."""
+    op.create_table(
+        'notification_unread_counts',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('unread', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE')
+    )
+
+    # Incremental feed: user_id = ? AND id > ? ORDER BY id
+    op.create_index('idx_notifications_user_id_id', 'notifications', ['user_id', 'id'])
+
+    op.execute("""
+        CREATE FUNCTION notifications_count_new() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO notification_unread_counts AS c (user_id, unread)
+            SELECT user_id, COUNT(*) FROM new_rows WHERE NOT is_read
+            GROUP BY user_id ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET unread = c.unread + EXCLUDED.unread;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Read/unread flips and (rarely) rows moved between users
+        CREATE FUNCTION notifications_count_updated() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO notification_unread_counts AS c (user_id, unread)
+            SELECT user_id, SUM(delta) FROM (
+                SELECT user_id, -1 AS delta FROM old_rows WHERE NOT is_read
+                UNION ALL
+                SELECT user_id, 1 FROM new_rows WHERE NOT is_read
+            ) d
+            GROUP BY user_id HAVING SUM(delta) <> 0 ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET unread = c.unread + EXCLUDED.unread;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Only UPDATE: when the user itself is being deleted its counter row may already be gone
+        CREATE FUNCTION notifications_count_deleted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE notification_unread_counts c SET unread = c.unread - d.n
+            FROM (SELECT user_id, COUNT(*) AS n FROM old_rows WHERE NOT is_read GROUP BY user_id) d
+            WHERE c.user_id = d.user_id;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER trg_notifications_count_insert AFTER INSERT ON notifications
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notifications_count_new();
+        CREATE TRIGGER trg_notifications_count_update AFTER UPDATE ON notifications
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notifications_count_updated();
+        CREATE TRIGGER trg_notifications_count_delete AFTER DELETE ON notifications
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notifications_count_deleted();
+    """)
+
+    op.execute("""
+        INSERT INTO notification_unread_counts (user_id, unread)
+        SELECT user_id, COUNT(*) FROM notifications WHERE NOT is_read GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Drop unread notification counters and their triggers."""
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_notifications_count_delete ON notifications;
+        DROP TRIGGER IF EXISTS trg_notifications_count_update ON notifications;
+        DROP TRIGGER IF EXISTS trg_notifications_count_insert ON notifications;
+        DROP FUNCTION IF EXISTS notifications_count_deleted();
+        DROP FUNCTION IF EXISTS notifications_count_updated();
+        DROP FUNCTION IF EXISTS notifications_count_new();
+    """)
+    op.drop_index('idx_notifications_user_id_id', table_name='notifications')
+    op.drop_table('notification_unread_counts')
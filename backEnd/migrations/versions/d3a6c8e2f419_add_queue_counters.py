@@ -0,0 +1,40 @@
+"""add per-day queue number counters
+
+Revision ID: d3a6c8e2f419
+Revises: c8e1a3f5b702
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a6c8e2f419'
+down_revision: Union[str, Sequence[str], None] = 'c8e1a3f5b702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Last queue number handed out per check-in day (see security.check_in_appointment)."""
+    op.create_table(
+        'queue_counters',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('last_number', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    # Continue from the numbers already given out, so today's queue has no repeats
+    op.execute("""
+        INSERT INTO queue_counters (day, last_number)
+        SELECT appointment_date, MAX(queue_number) FROM appointments
+        WHERE queue_number IS NOT NULL
+        GROUP BY appointment_date
+    """)
+
+
+def downgrade() -> None:
+    """Drop queue number counters."""
+    op.drop_table('queue_counters')
@@ -0,0 +1,130 @@
+"""create analytics rollup tables
+
+Revision ID: d5a7c9e1f306
+Revises: c3f8a1e6d254
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a7c9e1f306'
+down_revision: Union[str, Sequence[str], None] = 'c3f8a1e6d254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Daily FHSIS rollups for /api/admin/analytics, kept current by analytics.py."""
+    # Appointment counts per (day, metric, dimension, status), e.g. ('vaccine', 'BCG')
+    op.create_table(
+        'analytics_daily_counts',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=30), nullable=False),
+        sa.Column('dimension', sa.Text(), nullable=False, server_default=''),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+    op.create_index('idx_analytics_daily_counts_day', 'analytics_daily_counts', ['day'])
+
+    # Appointments belonging to each FHSIS program, for the patient lists
+    op.create_table(
+        'analytics_program_appointments',
+        sa.Column('program', sa.String(length=30), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.Column('appointment_date', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('program', 'appointment_id')
+    )
+    op.create_index('idx_analytics_program_date', 'analytics_program_appointments',
+                    ['program', 'appointment_date'])
+    op.create_index('idx_analytics_program_appointment_date', 'analytics_program_appointments',
+                    ['appointment_date'])
+
+    # Days whose rollups are out of date; filled by the triggers below, drained by the refresh job
+    op.create_table(
+        'analytics_dirty_days',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+    op.execute("""
+        CREATE FUNCTION analytics_mark_new_days() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT DISTINCT appointment_date FROM new_rows
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE FUNCTION analytics_mark_old_days() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT DISTINCT appointment_date FROM old_rows
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Only changes to the columns the rollups read (not e.g. reminder_sent)
+        CREATE FUNCTION analytics_mark_updated_days() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT d.day FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES (o.appointment_date), (n.appointment_date)) AS d(day)
+            WHERE (o.appointment_date, o.status, o.service_type, o.diagnosis, o.user_id)
+                  IS DISTINCT FROM (n.appointment_date, n.status, n.service_type, n.diagnosis, n.user_id)
+            GROUP BY d.day
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Dengue hotspots are grouped by the patient's area
+        CREATE FUNCTION analytics_mark_user_days() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO analytics_dirty_days (day)
+            SELECT DISTINCT appointment_date FROM appointments WHERE user_id = NEW.id
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER trg_analytics_appointments_insert AFTER INSERT ON appointments
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION analytics_mark_new_days();
+        CREATE TRIGGER trg_analytics_appointments_update AFTER UPDATE ON appointments
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION analytics_mark_updated_days();
+        CREATE TRIGGER trg_analytics_appointments_delete AFTER DELETE ON appointments
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION analytics_mark_old_days();
+        CREATE TRIGGER trg_analytics_users_area AFTER UPDATE OF subdivision, barangay, address ON users
+            FOR EACH ROW
+            WHEN ((OLD.subdivision, OLD.barangay, OLD.address) IS DISTINCT FROM (NEW.subdivision, NEW.barangay, NEW.address))
+            EXECUTE FUNCTION analytics_mark_user_days();
+    """)
+
+    # Everything starts dirty; the first refresh builds the rollups
+    op.execute("INSERT INTO analytics_dirty_days (day) SELECT DISTINCT appointment_date FROM appointments")
+
+
+def downgrade() -> None:
+    """Drop analytics rollup tables and triggers."""
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_analytics_users_area ON users;
+        DROP TRIGGER IF EXISTS trg_analytics_appointments_delete ON appointments;
+        DROP TRIGGER IF EXISTS trg_analytics_appointments_update ON appointments;
+        DROP TRIGGER IF EXISTS trg_analytics_appointments_insert ON appointments;
+        DROP FUNCTION IF EXISTS analytics_mark_user_days();
+        DROP FUNCTION IF EXISTS analytics_mark_updated_days();
+        DROP FUNCTION IF EXISTS analytics_mark_old_days();
+        DROP FUNCTION IF EXISTS analytics_mark_new_days();
+    """)
+    op.drop_table('analytics_dirty_days')
+    op.drop_index('idx_analytics_program_appointment_date', table_name='analytics_program_appointments')
+    op.drop_index('idx_analytics_program_date', table_name='analytics_program_appointments')
+    op.drop_table('analytics_program_appointments')
+    op.drop_index('idx_analytics_daily_counts_day', table_name='analytics_daily_counts')
+    op.drop_table('analytics_daily_counts')
@@ -0,0 +1,60 @@
+"""add appointment status events
+
+Revision ID: e6b4d2a8c135
+Revises: d3a6c8e2f419
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b4d2a8c135'
+down_revision: Union[str, Sequence[str], None] = 'd3a6c8e2f419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """When each appointment entered each status, for wait_estimator.py to learn service durations."""
+    op.create_table(
+        'appointment_status_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='CASCADE')
+    )
+    # Latest 'serving' event of an appointment; also serves the FK on delete
+    op.create_index('idx_appointment_status_events_appointment', 'appointment_status_events',
+                    ['appointment_id', 'status', 'changed_at'])
+
+    op.execute("""
+        CREATE FUNCTION appointments_log_status() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO appointment_status_events (appointment_id, status)
+            SELECT n.id, n.status FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE o.status IS DISTINCT FROM n.status
+            ORDER BY n.id;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER trg_appointments_log_status AFTER UPDATE ON appointments
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION appointments_log_status();
+    """)
+
+
+def downgrade() -> None:
+    """Drop appointment status events."""
+    op.execute("""
+        DROP TRIGGER IF EXISTS trg_appointments_log_status ON appointments;
+        DROP FUNCTION IF EXISTS appointments_log_status();
+    """)
+    op.drop_index('idx_appointment_status_events_appointment', table_name='appointment_status_events')
+    op.drop_table('appointment_status_events')
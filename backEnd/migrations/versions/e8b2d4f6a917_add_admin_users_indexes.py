@@ -0,0 +1,36 @@
+"""add indexes for admin users listing
+
+Revision ID: e8b2d4f6a917
+Revises: d5a7c9e1f306
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2d4f6a917'
+down_revision: Union[str, Sequence[str], None] = 'd5a7c9e1f306'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Keyset pagination and name-prefix search for /api/admin/users."""
+    # Scanned backwards this is ORDER BY created_at DESC, id DESC
+    op.create_index('idx_users_created_at_id', 'users', ['created_at', 'id'])
+    # LIKE 'prefix%' on LOWER(name) regardless of the database collation
+    op.create_index('idx_users_lower_first_name', 'users', [sa.text('LOWER(first_name) text_pattern_ops')])
+    op.create_index('idx_users_lower_last_name', 'users', [sa.text('LOWER(last_name) text_pattern_ops')])
+    op.create_index('idx_medical_staff_details_user_id', 'medical_staff_details', ['user_id'])
+
+
+def downgrade() -> None:
+    """Drop admin users listing indexes."""
+    op.drop_index('idx_medical_staff_details_user_id', table_name='medical_staff_details')
+    op.drop_index('idx_users_lower_last_name', table_name='users')
+    op.drop_index('idx_users_lower_first_name', table_name='users')
+    op.drop_index('idx_users_created_at_id', table_name='users')
@@ -0,0 +1,38 @@
+"""add indexes for doctor patients listing
+
+Revision ID: f1c6a8e3b520
+Revises: e8b2d4f6a917
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a8e3b520'
+down_revision: Union[str, Sequence[str], None] = 'e8b2d4f6a917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Pages, last visit and patient-number search for /api/doctor/patients."""
+    # Keyset pages ordered by (last_name, id) over patients only
+    op.create_index('idx_users_patients_last_name_id', 'users', ['last_name', 'id'],
+                    postgresql_where=sa.text("role = 'Patient' OR role IS NULL"))
+    # Latest completed visit per patient is the first entry for its user_id
+    op.create_index('idx_appointments_completed_user_date', 'appointments',
+                    ['user_id', sa.text('appointment_date DESC')],
+                    postgresql_where=sa.text("status = 'completed'"))
+    op.create_index('idx_users_lower_patient_number', 'users',
+                    [sa.text('LOWER(patient_number) text_pattern_ops')])
+
+
+def downgrade() -> None:
+    """Drop doctor patients listing indexes."""
+    op.drop_index('idx_users_lower_patient_number', table_name='users')
+    op.drop_index('idx_appointments_completed_user_date', table_name='appointments')
+    op.drop_index('idx_users_patients_last_name_id', table_name='users')
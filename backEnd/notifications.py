@@ -1,3 +1,5 @@
+import os
+
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
 import psycopg2
@@ -5,23 +7,83 @@ from psycopg2.extras import RealDictCursor
 
 notifications_bp = Blueprint('notifications', __name__)
 
+NOTIFICATIONS_PAGE_DEFAULT = 50
+NOTIFICATIONS_PAGE_MAX = int(os.getenv('NOTIFICATIONS_PAGE_MAX', '200'))
+# Ids are handed out before commit, so a notification can become visible after a higher
+# id was already returned; since_id polls also re-send this many seconds of older ones
+NOTIFICATIONS_LATE_WINDOW = float(os.getenv('NOTIFICATIONS_LATE_WINDOW', '300'))
+
+NOTIFICATION_COLUMNS = "id, user_id, type, message, is_read, related_id, created_at"
+
+
+def fetch_unread_count(cursor, user_id):
+    """Unread notifications for a user, from the counter the notifications triggers maintain."""
+    cursor.execute("SELECT unread FROM notification_unread_counts WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    return row['unread'] if isinstance(row, dict) else row[0]
+
+
 @notifications_bp.route('/api/notifications', methods=['GET'])
 def get_notifications():
+    """
+    Newest notifications first. ?limit= caps the rows (default 50).
+
+    ?since_id= returns only notifications newer than that id, oldest batch
+    first if there are more than `limit`; X-Has-More says to ask again with
+    the highest id received. It also repeats those at or below since_id
+    created in the last NOTIFICATIONS_LATE_WINDOW seconds, which may have
+    committed after the client's last poll; clients drop ids they already
+    have. X-Unread-Count carries the badge count.
+    """
     try:
         user_id = request.args.get('user_id')
         if not user_id:
              return jsonify({"error": "User ID is required"}), 400
+        try:
+            user_id = int(user_id)
+            since_id = request.args.get('since_id')
+            since_id = int(since_id) if since_id else None
+            limit = int(request.args.get('limit', NOTIFICATIONS_PAGE_DEFAULT))
+            if not 1 <= limit <= NOTIFICATIONS_PAGE_MAX:
+                raise ValueError(f"limit must be between 1 and {NOTIFICATIONS_PAGE_MAX}")
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query: {e}"}), 400
 
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-        cursor.execute("""
-            SELECT * FROM notifications 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC
-        """, (user_id,))
-        
-        notifications = cursor.fetchall()
+        if since_id is None:
+            cursor.execute(f"""
+                SELECT {NOTIFICATION_COLUMNS} FROM notifications
+                WHERE user_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            """, (user_id, limit))
+            notifications = cursor.fetchall()
+            has_more = False
+        else:
+            # Oldest first so a client that is far behind can catch up without gaps
+            cursor.execute(f"""
+                SELECT {NOTIFICATION_COLUMNS} FROM notifications
+                WHERE user_id = %s AND id > %s
+                ORDER BY id ASC
+                LIMIT %s
+            """, (user_id, since_id, limit + 1))
+            notifications = cursor.fetchall()
+            has_more = len(notifications) > limit
+            notifications = notifications[:limit]
+            # Lower ids that may have committed late (idx_notifications_user_created)
+            cursor.execute(f"""
+                SELECT {NOTIFICATION_COLUMNS} FROM notifications
+                WHERE user_id = %s AND id <= %s AND created_at >= LOCALTIMESTAMP - %s * INTERVAL '1 second'
+                ORDER BY id ASC
+                LIMIT %s
+            """, (user_id, since_id, NOTIFICATIONS_LATE_WINDOW, limit))
+            notifications = (cursor.fetchall() + notifications)[::-1]
+
+        unread = fetch_unread_count(cursor, user_id)
         cursor.close()
         conn.close()
 
@@ -29,12 +91,61 @@ def get_notifications():
             if notif.get('created_at'):
                 notif['created_at'] = notif['created_at'].isoformat()
 
-        return jsonify(notifications), 200
+        response = jsonify(notifications)
+        response.headers['X-Unread-Count'] = str(unread)
+        response.headers['X-Has-More'] = 'true' if has_more else 'false'
+        response.headers['Access-Control-Expose-Headers'] = 'X-Unread-Count, X-Has-More'
+        return response, 200
 
     except Exception as e:
         print(f"Error fetching notifications: {e}")
         return jsonify({"error": str(e)}), 500
 
+@notifications_bp.route('/api/notifications/read', methods=['PUT'])
+def mark_many_as_read():
+    """
+    Mark several notifications read in one statement.
+
+    Body: {"user_id": 1, "ids": [4, 5]} or {"user_id": 1, "up_to_id": 9}
+    (everything up to and including that id, e.g. "mark all as read").
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            user_id = int(data.get('user_id'))
+            if data.get('ids') is not None:
+                if not isinstance(data['ids'], list):
+                    raise ValueError("ids must be a list")
+                ids = [int(i) for i in data['ids']]
+                selector, param = "id = ANY(%s)", ids
+            elif data.get('up_to_id') is not None:
+                selector, param = "id <= %s", int(data['up_to_id'])
+            else:
+                return jsonify({"error": "ids or up_to_id is required"}), 400
+        except (TypeError, ValueError):
+            return jsonify({"error": "user_id, ids and up_to_id must be integers"}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute(f"""
+            UPDATE notifications
+            SET is_read = true
+            WHERE user_id = %s AND is_read = false AND {selector}
+            RETURNING id
+        """, (user_id, param))
+        updated = sorted(row['id'] for row in cursor.fetchall())
+        unread = fetch_unread_count(cursor, user_id)
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        return jsonify({"updated": updated, "unread_count": unread}), 200
+
+    except Exception as e:
+        print(f"Error marking notifications as read: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @notifications_bp.route('/api/notifications/<int:notification_id>/read', methods=['PUT'])
 def mark_as_read(notification_id):
     try:
@@ -72,12 +183,7 @@ def get_unread_count():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT COUNT(*) FROM notifications 
-            WHERE user_id = %s AND is_read = false
-        """, (user_id,))
-        
-        count = cursor.fetchone()[0]
+        count = fetch_unread_count(cursor, user_id)
         cursor.close()
         conn.close()
 
@@ -0,0 +1,277 @@
+# pyre-ignore-all-errors
+"""
+OCR backends used by the ID scanning endpoints.
+
+OCR_BACKEND selects the implementation:
+  ocrspace (default)  - OCR.space HTTP API, needs OCR_API_KEY
+  stub                - local canned text, for tests and offline development
+  replay              - text recorded per image hash under OCR_REPLAY_DIR
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+
+from ocr_log import event, log  # type: ignore
+
+OCR_SPACE_URL = 'https://api.ocr.space/parse/image'
+# Read timeout per OCR call; connecting gets its own, much shorter budget
+OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', '180'))
+OCR_CONNECT_TIMEOUT = float(os.getenv('OCR_CONNECT_TIMEOUT', '10'))
+# Keep-alive connections kept open to the OCR host
+OCR_HTTP_POOL_SIZE = int(os.getenv('OCR_HTTP_POOL_SIZE', '8'))
+# Threads used by recognize_sides() for the synchronous endpoints
+OCR_SIDE_WORKERS = int(os.getenv('OCR_SIDE_WORKERS', '8'))
+
+# Sample PhilSys front text returned by the stub backend when nothing else is configured
+STUB_SAMPLE_TEXT = """REPUBLIKA NG PILIPINAS
+Republic of the Philippines
+PAMBANSANG PAGKAKAKILANLAN
+Philippine Identification Card
+1234-5678-9012-3456
+Apelyido/Last Name
+DELA CRUZ
+Mga Pangalan/Given Names
+JUAN
+Gitnang Apelyido/Middle Name
+SANTOS
+Petsa ng Kapanganakan/Date of Birth
+JANUARY 01, 1990
+"""
+
+
+class OCRError(Exception):
+    """OCR failed; status_code is the HTTP status the API should answer with."""
+
+    status_code = 500
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class OCRTimeout(OCRError):
+    status_code = 504
+
+
+class OCRNoText(OCRError):
+    status_code = 400
+
+
+class OCRCancelled(OCRError):
+    """The other side of the scan already failed, so this call was abandoned."""
+
+
+class OCRBackend:
+    """
+    Turns one preprocessed JPEG into raw text.
+    `cancel` is an optional threading.Event; once set, implementations should
+    give up as early as they can by raising OCRCancelled.
+    """
+
+    name = 'base'
+
+    def recognize(self, image_bytes, filename='image.jpg', timeout=None, cancel=None):
+        raise NotImplementedError
+
+
+def _check_cancelled(cancel, filename):
+    if cancel is not None and cancel.is_set():
+        raise OCRCancelled(f"OCR for {filename} cancelled")
+
+
+class OCRSpaceBackend(OCRBackend):
+    name = 'ocrspace'
+
+    def __init__(self, api_key=None, url=OCR_SPACE_URL, timeout=OCR_TIMEOUT,
+                 connect_timeout=OCR_CONNECT_TIMEOUT):
+        self.api_key = api_key if api_key is not None else os.getenv('OCR_API_KEY')
+        self.url = url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        # One keep-alive session for every scan; the TLS handshake is paid once
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OCR_HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def recognize(self, image_bytes, filename='image.jpg', timeout=None, cancel=None):
+        _check_cancelled(cancel, filename)
+        payload = {
+            'apikey': self.api_key,
+            'language': 'eng',
+            'isOverlayRequired': 'false',
+            'scale': 'true',
+            'OCREngine': '1'
+        }
+
+        start_time = time.time()
+        try:
+            response = self.session.post(
+                self.url,
+                files={'file': (filename, image_bytes, 'image/jpeg')},
+                data=payload,
+                timeout=(self.connect_timeout, timeout or self.timeout)
+            )
+        except requests.exceptions.Timeout:
+            raise OCRTimeout("OCR API Request Timed Out. The service is unusually slow right now. Please try again or fill manually.")
+        except requests.exceptions.RequestException as e:
+            raise OCRError(f"OCR Request Error: {str(e)}")
+        event('ocr_call', logging.DEBUG, backend=self.name, image=filename, ms=round((time.time() - start_time) * 1000))
+        _check_cancelled(cancel, filename)
+
+        if response.status_code != 200:
+            log.warning("OCR.space HTTP %s: %.300s", response.status_code, response.text)
+            raise OCRError(f"OCR API error: {response.status_code}")
+
+        result = response.json()
+        if not result.get('ParsedResults'):
+            err_msg = result.get('ErrorMessage', 'No text detected')
+            raise OCRNoText(f"No text detected. OCR Details: {err_msg}")
+
+        return result['ParsedResults'][0].get('ParsedText', '')
+
+
+class StubOCRBackend(OCRBackend):
+    """
+    Returns canned text without any network access.
+    OCR_STUB_TEXT / OCR_STUB_FILE override the front-side sample, back images
+    ('back*' filenames) get back_text; OCR_STUB_DELAY (seconds) simulates
+    upstream latency.
+    """
+
+    name = 'stub'
+
+    def __init__(self, text=None, back_text='', delay=None):
+        if text is None:
+            text = os.getenv('OCR_STUB_TEXT')
+        if text is None and os.getenv('OCR_STUB_FILE'):
+            with open(os.getenv('OCR_STUB_FILE'), encoding='utf-8') as f:
+                text = f.read()
+        self.text = STUB_SAMPLE_TEXT if text is None else text
+        self.back_text = back_text
+        self.delay = float(os.getenv('OCR_STUB_DELAY', '0')) if delay is None else delay
+
+    def recognize(self, image_bytes, filename='image.jpg', timeout=None, cancel=None):
+        if self.delay:
+            delay = min(self.delay, timeout) if timeout else self.delay
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+        _check_cancelled(cancel, filename)
+        if filename.startswith('back'):
+            return self.back_text
+        return self.text
+
+
+class ReplayOCRBackend(OCRBackend):
+    """
+    Serves text recorded earlier for the exact same preprocessed image, stored
+    as OCR_REPLAY_DIR/<sha256>.txt. With OCR_REPLAY_RECORD=1, unknown images
+    go to OCR.space and the returned text (never the image) is recorded.
+    OCR_REPLAY_DELAY adds simulated upstream latency for offline benchmarks.
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory=None, record=None, delay=None, upstream=None):
+        self.directory = directory or os.getenv('OCR_REPLAY_DIR', 'ocr_replay')
+        if record is None:
+            record = os.getenv('OCR_REPLAY_RECORD', '').lower() in ('1', 'true', 'yes')
+        self.record = record
+        self.delay = float(os.getenv('OCR_REPLAY_DELAY', '0')) if delay is None else delay
+        self.upstream = upstream
+        if self.record and self.upstream is None:
+            self.upstream = OCRSpaceBackend()
+
+    def _path(self, image_bytes):
+        return os.path.join(self.directory, hashlib.sha256(image_bytes).hexdigest() + '.txt')
+
+    def recognize(self, image_bytes, filename='image.jpg', timeout=None, cancel=None):
+        path = self._path(image_bytes)
+        if os.path.exists(path):
+            if self.delay:
+                if cancel is not None:
+                    cancel.wait(self.delay)
+                else:
+                    time.sleep(self.delay)
+            _check_cancelled(cancel, filename)
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+
+        if not self.record:
+            raise OCRNoText(f"No text detected. OCR Details: no recording for {filename}")
+
+        text = self.upstream.recognize(image_bytes, filename=filename, timeout=timeout, cancel=cancel)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return text
+
+
+BACKENDS = {
+    OCRSpaceBackend.name: OCRSpaceBackend,
+    StubOCRBackend.name: StubOCRBackend,
+    ReplayOCRBackend.name: ReplayOCRBackend,
+}
+
+
+def get_ocr_backend(name=None):
+    name = (name or os.getenv('OCR_BACKEND', 'ocrspace')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+_side_executor = None
+_side_executor_lock = threading.Lock()
+
+
+def _get_side_executor():
+    global _side_executor
+    if _side_executor is None:
+        with _side_executor_lock:
+            if _side_executor is None:
+                _side_executor = ThreadPoolExecutor(max_workers=OCR_SIDE_WORKERS, thread_name_prefix='ocr-side')
+    return _side_executor
+
+
+def recognize_sides(backend, preprocess, front_bytes, back_bytes=None, timeout=None):
+    """
+    Preprocess and OCR both sides of an ID at the same time and return
+    (front_text, back_text). A front failure is raised and cancels the back
+    request; a back failure only logs and yields empty text, as before.
+    """
+    cancel = threading.Event()
+
+    def run(side, image_bytes):
+        _check_cancelled(cancel, f'{side}.jpg')
+        return backend.recognize(preprocess(image_bytes), filename=f'{side}.jpg',
+                                 timeout=timeout, cancel=cancel)
+
+    pool = _get_side_executor()
+    front_future = pool.submit(run, 'front', front_bytes)
+    back_future = pool.submit(run, 'back', back_bytes) if back_bytes else None
+
+    try:
+        front_text = front_future.result()
+    except Exception:
+        cancel.set()
+        if back_future is not None:
+            back_future.cancel()
+        raise
+
+    back_text = ''
+    if back_future is not None:
+        try:
+            back_text = back_future.result()
+        except Exception as e:
+            log.warning("Back ID OCR error (non-fatal): %s", e)
+    return front_text, back_text
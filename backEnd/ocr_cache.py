@@ -0,0 +1,157 @@
+# pyre-ignore-all-errors
+"""
+Content-hash cache for ID scans.
+
+Raw OCR text is keyed by the SHA-256 of the preprocessed JPEG, and parser
+output by a hash of the texts and expected ID type, so a re-uploaded photo
+skips the OCR round trip entirely. Only text and parsed fields are stored,
+never the images themselves.
+
+OCR_CACHE_SIZE / OCR_CACHE_TTL size the in-memory tier. Setting OCR_CACHE_DIR
+adds an on-disk tier (JSON files, same expiry) that survives restarts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from ocr_backends import OCRBackend  # type: ignore
+from ocr_log import log  # type: ignore
+from ttl_cache import TTLCache  # type: ignore
+
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '256'))
+OCR_CACHE_TTL = float(os.getenv('OCR_CACHE_TTL', '3600'))
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR')
+# Expired files are swept from the disk tier every this many writes
+_PURGE_EVERY = 50
+
+
+def content_key(kind, *parts):
+    """Stable cache key: kind plus the SHA-256 of the given bytes/str parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return f"{kind}-{digest.hexdigest()}"
+
+
+class OCRResultCache:
+    def __init__(self, directory=OCR_CACHE_DIR, maxsize=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL):
+        self.ttl = ttl
+        self.directory = directory or None
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'disk_hits': 0, 'disk_writes': 0, 'disk_errors': 0, 'disk_expired': 0}
+        if self.directory:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or not self.directory:
+            return value
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Unreadable OCR cache file %s: %s", path, e)
+            self._count('disk_errors')
+            return None
+
+        remaining = entry.get('expires_at', 0) - time.time()
+        if remaining <= 0:
+            self._count('disk_expired')
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        self._count('disk_hits')
+        self.memory.set(key, entry['value'], ttl=remaining)
+        return entry['value']
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if not self.directory:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': time.time() + self.ttl, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            log.warning("Failed to write OCR cache file %s: %s", path, e)
+            self._count('disk_errors')
+            return
+
+        with self._lock:
+            self._stats['disk_writes'] += 1
+            self._writes += 1
+            purge = self._writes % _PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Delete expired files from the disk tier; returns how many were removed."""
+        if not self.directory:
+            return 0
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    expired = json.load(f).get('expires_at', 0) <= now
+            except (OSError, ValueError):
+                expired = True
+            if expired:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self):
+        stats = {'memory': self.memory.stats(), 'disk_enabled': bool(self.directory)}
+        with self._lock:
+            stats.update(self._stats)
+        return stats
+
+
+class CachedOCRBackend(OCRBackend):
+    """Wraps another backend and remembers its text per preprocessed image."""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+
+    def recognize(self, image_bytes, filename='image.jpg', timeout=None, cancel=None):
+        key = content_key('text', image_bytes)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached['text']
+        text = self.backend.recognize(image_bytes, filename=filename, timeout=timeout, cancel=cancel)
+        self.cache.set(key, {'text': text})
+        return text
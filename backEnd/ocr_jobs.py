@@ -0,0 +1,206 @@
+# pyre-ignore-all-errors
+"""
+Background OCR jobs for ID scans.
+
+POST /api/ocr-jobs (or /api/ocr-dual?async=1) hands the uploaded images to a
+bounded worker pool and returns a job id straight away, so a slow OCR upstream
+no longer pins a Flask worker for minutes. Front and back sides run as
+separate pool tasks; whichever finishes last parses the combined text.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_backends import get_ocr_backend  # type: ignore
+from ocr_log import log  # type: ignore
+from ttl_cache import TTLCache  # type: ignore
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '4'))
+# Jobs waiting or running at once; further submissions are refused
+OCR_MAX_PENDING_JOBS = int(os.getenv('OCR_MAX_PENDING_JOBS', '32'))
+# How long finished jobs (and their results) stay available for polling
+OCR_JOB_TTL = float(os.getenv('OCR_JOB_TTL', '600'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised by submit() when OCR_MAX_PENDING_JOBS jobs are already in flight."""
+
+
+class OCRJob:
+    def __init__(self, job_id, content_key, id_type, sides):
+        self.id = job_id
+        self.content_key = content_key
+        self.id_type = id_type
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None
+        self.texts = {side: None for side in sides}
+        self.futures = {}
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.finished = threading.Event()
+        # Set when the front fails so a still-running back call is abandoned
+        self.cancel = threading.Event()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'sides': {side: ('done' if text is not None else 'pending') for side, text in self.texts.items()},
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == DONE:
+            data['result'] = self.result
+        elif self.status == FAILED:
+            data['error'] = self.error
+            data['error_status'] = self.error_status
+        return data
+
+
+class OCRJobManager:
+    """
+    preprocess(image_bytes) -> jpeg bytes, and
+    parse(front_text, back_text, id_type) -> JSON-able result dict
+    are injected by app.py so this module stays free of Flask/parsing code.
+    """
+
+    def __init__(self, preprocess, parse, backend=None, workers=OCR_WORKERS,
+                 max_pending=OCR_MAX_PENDING_JOBS, job_ttl=OCR_JOB_TTL):
+        self.preprocess = preprocess
+        self.parse = parse
+        self.backend = backend or get_ocr_backend()
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr')
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Queued and running jobs (at most max_pending) are held until they finish,
+        # so neither eviction nor expiry can lose one that a client is polling
+        self._active = {}             # job id -> OCRJob
+        self._active_by_content = {}  # content key -> job id
+        # Finished jobs expire after job_ttl; identical uploads reuse a live job
+        self._jobs = TTLCache(maxsize=max(256, max_pending * 4), ttl=job_ttl)
+        self._by_content = TTLCache(maxsize=max(256, max_pending * 4), ttl=job_ttl)
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'done': 0, 'failed': 0}
+
+    @staticmethod
+    def content_key(front_bytes, back_bytes, id_type):
+        digest = hashlib.sha256()
+        digest.update(front_bytes)
+        digest.update(b'\0back\0')
+        digest.update(back_bytes or b'')
+        digest.update(b'\0type\0')
+        digest.update((id_type or '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def submit(self, front_bytes, back_bytes=None, id_type=None):
+        """Queue a scan and return its OCRJob (an existing one for identical uploads)."""
+        key = self.content_key(front_bytes, back_bytes, id_type)
+        with self._lock:
+            existing_id = self._active_by_content.get(key) or self._by_content.get(key)
+            existing = (self._active.get(existing_id) or self._jobs.get(existing_id)) if existing_id else None
+            if existing is not None and existing.status != FAILED:
+                self._stats['deduplicated'] += 1
+                return existing
+
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise QueueFull(f"OCR queue is full ({self.max_pending} scans in progress)")
+            self._pending += 1
+            self._stats['submitted'] += 1
+
+            sides = ['front'] + (['back'] if back_bytes else [])
+            job = OCRJob(uuid.uuid4().hex, key, id_type, sides)
+            self._active[job.id] = job
+            self._active_by_content[key] = job.id
+
+        job.futures['front'] = self._executor.submit(self._run_side, job, 'front', front_bytes)
+        if back_bytes:
+            job.futures['back'] = self._executor.submit(self._run_side, job, 'back', back_bytes)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._active.get(job_id)
+        return job if job is not None else self._jobs.get(job_id)
+
+    def _run_side(self, job, side, image_bytes):
+        if job.finished.is_set():
+            return
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = RUNNING
+        try:
+            processed = self.preprocess(image_bytes)
+            text = self.backend.recognize(processed, filename=f'{side}.jpg', cancel=job.cancel)
+        except Exception as e:
+            self._side_failed(job, side, e)
+            return
+        self._side_done(job, side, text)
+
+    def _side_failed(self, job, side, error):
+        if side == 'back':
+            # Same as the synchronous endpoint: the back of the ID is optional
+            log.warning("Back ID OCR error (non-fatal): %s", error)
+            self._side_done(job, side, '')
+            return
+        status = getattr(error, 'status_code', 500)
+        with self._lock:
+            if job.finished.is_set():
+                return
+            job.cancel.set()
+            back = job.futures.get('back')
+            if back is not None:
+                back.cancel()
+        self._finish(job, error=str(error), error_status=status)
+
+    def _side_done(self, job, side, text):
+        with self._lock:
+            if job.finished.is_set():
+                return
+            job.texts[side] = text
+            if any(t is None for t in job.texts.values()):
+                return
+        try:
+            result = self.parse(job.texts['front'], job.texts.get('back') or '', job.id_type)
+        except Exception as e:
+            self._finish(job, error=str(e), error_status=500)
+            return
+        self._finish(job, result=result)
+
+    def _finish(self, job, result=None, error=None, error_status=None):
+        with self._lock:
+            if job.finished.is_set():
+                return
+            job.result = result
+            job.error = error
+            job.error_status = error_status
+            job.status = FAILED if error else DONE
+            job.finished_at = time.time()
+            job.futures = {}
+            self._pending -= 1
+            self._stats['failed' if error else 'done'] += 1
+            # Keep the finished job pollable for a full TTL from now
+            self._jobs.set(job.id, job)
+            self._by_content.set(job.content_key, job.id)
+            self._active.pop(job.id, None)
+            if self._active_by_content.get(job.content_key) == job.id:
+                del self._active_by_content[job.content_key]
+            job.finished.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['max_pending'] = self.max_pending
+        stats['backend'] = self.backend.name
+        return stats
@@ -0,0 +1,112 @@
+# pyre-ignore-all-errors
+"""
+Leveled, sampled logging for the OCR pipeline.
+
+Everything logs through the "bhcare.ocr" logger. Its only handler is a
+QueueHandler, so request and worker threads just enqueue records and one
+listener thread does the console I/O. Nothing on the scan path writes files.
+
+Raw OCR text, parsed fields and the parser's decision trace are kept for a
+sampled fraction of scans in a bounded in-memory ring buffer (this replaces
+ocr_last_run.txt); see GET /api/admin/ocr-debug.
+
+    OCR_LOG_LEVEL=INFO          WARNING in quiet production, DEBUG for full traces
+    OCR_LOG_SAMPLE_RATE=0       fraction of scans (0-1) captured into the buffer
+    OCR_DEBUG_BUFFER_SIZE=50    captured scans kept in memory
+"""
+import atexit
+import collections
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+
+OCR_LOG_LEVEL = os.getenv('OCR_LOG_LEVEL', 'INFO').upper()
+OCR_LOG_SAMPLE_RATE = float(os.getenv('OCR_LOG_SAMPLE_RATE', '0'))
+OCR_DEBUG_BUFFER_SIZE = int(os.getenv('OCR_DEBUG_BUFFER_SIZE', '50'))
+
+log = logging.getLogger('bhcare.ocr')
+
+
+def _console_handler():
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s [OCR] %(levelname)s %(message)s'))
+    return console
+
+
+def _configure():
+    log.setLevel(OCR_LOG_LEVEL)
+    log.propagate = False
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, _console_handler())
+    log.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def reset_for_subprocess():
+    """In a forked worker the queue listener thread is gone; log straight to stderr."""
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+    log.addHandler(_console_handler())
+
+
+_configure()
+
+
+def event(name, level=logging.INFO, **fields):
+    """One structured line: event('scan', total_ms=812, id_type='UMID ID') -> scan total_ms=812 id_type="UMID ID"."""
+    if log.isEnabledFor(level):
+        pairs = ' '.join(f"{k}={json.dumps(v) if isinstance(v, str) else v}" for k, v in fields.items())
+        log.log(level, '%s %s', name, pairs)
+
+
+def sampled():
+    """Whether this scan's details should be captured (OCR_LOG_SAMPLE_RATE)."""
+    return OCR_LOG_SAMPLE_RATE > 0 and random.random() < OCR_LOG_SAMPLE_RATE
+
+
+class DebugBuffer:
+    """Fixed-size ring of captured scans, newest last."""
+
+    def __init__(self, maxlen=OCR_DEBUG_BUFFER_SIZE):
+        self._dumps = collections.deque(maxlen=maxlen)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    def add(self, dump):
+        with self._lock:
+            dump = {'id': next(self._ids), 'captured_at': datetime.now().isoformat(timespec='seconds'), **dump}
+            self._dumps.append(dump)
+            self.captured += 1
+        return dump
+
+    def recent(self, limit=None):
+        """Newest first."""
+        with self._lock:
+            dumps = list(self._dumps)
+        dumps.reverse()
+        return dumps[:limit] if limit else dumps
+
+    def clear(self):
+        with self._lock:
+            self._dumps.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._dumps),
+                'maxsize': self._dumps.maxlen,
+                'captured': self.captured,
+                'sample_rate': OCR_LOG_SAMPLE_RATE,
+                'log_level': logging.getLevelName(log.level),
+            }
+
+
+debug_buffer = DebugBuffer()
@@ -0,0 +1,1199 @@
+# pyre-ignore-all-errors
+"""
+Field extraction for Philippine ID OCR text.
+
+Every pattern is compiled once at import time, and each scan is normalized a
+single time (_OCRText: lines, upper-cased and flattened variants, OCR digit
+fixes) and shared by all extractors instead of re-deriving it per field.
+
+parse_batch() streams many texts through the parser over a process pool for
+offline re-parsing (see reparse_ocr.py and POST /api/ocr/parse-batch).
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from ocr_log import log, reset_for_subprocess  # type: ignore
+
+# ============= PATTERN TABLES =============
+NAME_CLEAN_RE = re.compile(r'[^a-zA-Z\s\-]')
+
+# (pattern, format, confidence); the first two are also used for the global date scan
+DATE_PATTERNS = [
+    (re.compile(r'(\d{4})[/-](\d{2})[/-](\d{2})', re.I), '%Y-%m-%d', 0.95),
+    (re.compile(r'(\d{2})[/-](\d{2})[/-](\d{4})', re.I), '%m/%d/%Y', 0.90),
+    (re.compile(r'(JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[a-z]*\s+(\d{1,2})[\s,]+(\d{4})', re.I), 'text', 0.85)
+]
+NUMERIC_DATE_PATTERNS = DATE_PATTERNS[:2]
+MONTHS = {'JAN': '01', 'FEB': '02', 'MAR': '03', 'APR': '04', 'MAY': '05', 'JUN': '06',
+          'JUL': '07', 'AUG': '08', 'SEP': '09', 'OCT': '10', 'NOV': '11', 'DEC': '12'}
+
+# (id_type, keywords, all keywords required?) - first match wins
+ID_TYPE_RULES = [
+    ('Postal ID', ('POSTAL',), False),
+    ('SSS ID', ('SOCIAL SECURITY', ' SSS '), False),
+    ('UMID ID', ('UNIFIED MULTI-PURPOSE', 'UMID'), False),
+    ('National ID', ('PHILIPPINES IDENTIFICATION', 'NATIONAL ID', 'PHILID'), False),
+    ('PRC ID', ('PROFESSIONAL REGULATION', ' PRC '), False),
+    ('Voter\'s ID', ('VOTER',), False),
+    ('PhilHealth ID', ('PHILHEALTH',), False),
+    ('Driver\'s License', ('DRIVER', 'LICENSE'), True),
+]
+
+CRN_PATTERNS = [
+    re.compile(r'CRN[:\s]*(\d{4}-\d{7}-\d)'),  # UMID pattern: 0028-1215160-9
+    re.compile(r'ID\s*NO\.?[:\s]*([A-Z0-9-]{10,20})'),
+    re.compile(r'SSS\s*NO\.?[:\s]*(\d{2}-\d{7}-\d)'),
+    re.compile(r'PRC\s*NO\.?[:\s]*(\d{7})')
+]
+CRN_LABELS = ('ID NUMBER', 'ID NO', 'CRN', 'NATIONAL ID', 'PHILID')
+CRN_VALUE_RE = re.compile(r'\b([A-Z0-9-]{6,20})\b')
+
+# Common OCR confusions in numeric fields: O -> 0, I/L -> 1 (applied to upper-cased text)
+OCR_DIGIT_FIXES = str.maketrans('OIL', '011')
+PHILHEALTH_PATTERNS = [
+    re.compile(r'(\d{2})[- ]?(\d{9})[- ]?(\d{1})'),  # 12 digits: XX-XXXXXXXXX-X
+    re.compile(r'(\d{12})'),  # raw 12 digits
+    re.compile(r'PHILHEALTH\s*(?:ID|NO)?[:\s]*([0-9-]{12,14})')
+]
+NON_DIGIT_RE = re.compile(r'[^0-9]')
+
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+TIN_LINE_RE = re.compile(r'^TIN\s*:?\s*\d{3}')
+NATIONAL_ID_MARKERS = ('NATIONAL ID', 'PHILID', 'REPUBLIKA')
+LAST_NAME_LABELS = ('LAST NAME', 'SURNAME', 'FAMILY NAME', ' SUR NAMES')
+FIRST_NAME_LABELS = ('FIRST NAME', 'GIVEN NAME', 'GIVEN NAM ES')
+MIDDLE_NAME_LABELS = ('MIDDLE NAME', 'MIDDLE INITIAL', 'M.I.')
+
+SUFFIXES = {'JR': 'Jr.', 'SR': 'Sr.', 'II': 'II', 'III': 'III', 'IV': 'IV', 'V': 'V'}
+NON_UPPER_RE = re.compile(r'[^A-Z]')
+
+BIRTH_KEYWORDS = ('DATE OF BIRTH', 'BIRTH DATE', 'DOB', 'D.O.B',
+                  'BIRTHDAY', 'BORN', 'BIRTHDATE', 'DATE BIRTH')
+
+SEX_LABEL_PATTERNS = [
+    re.compile(r'(?:SEX|GENDER|KASARIAN)[:\s]+([MF])(?:\s|$|\b)'),  # "Sex: M" with word boundary
+    re.compile(r'(?:SEX|GENDER|KASARIAN)[:\s]+(MALE|FEMALE)'),  # "Sex: MALE"
+    re.compile(r'\b(MALE|FEMALE)\s+(?:SEX|GENDER)'),  # "MALE Sex" (reversed)
+]
+# Sex indicator far from its label (table layouts)
+SEX_TABLE_RE = re.compile(r'(?:SEX|GENDER|KASARIAN)(?:[\s\S]{0,50})\b([MF])\b(?![A-RT-Z])')
+
+PHONE_LABEL_PATTERNS = [
+    re.compile(r'(?:TEL\.?\s*NO\.?|TELEPHONE|MOBILE|CONTACT\s*NO\.?|PHONE)[:\s]*(\+?63|0)?[\s-]?([0-9]{3})[\s-]?([0-9]{3,4})[\s-]?([0-9]{3,4})'),
+    re.compile(r'(?:TEL\.?\s*NO\.?|MOBILE)[:\s]*([0-9]{4})([0-9]{3})([0-9]{4})'),  # 10-digit format
+]
+PHONE_SEPARATORS_RE = re.compile(r'[\s-]+')
+MOBILE_PATTERNS = [
+    re.compile(r'\b(09[0-9]{2})[\s-]?([0-9]{3})[\s-]?([0-9]{4})\b'),
+    re.compile(r'\b(\+639[0-9]{2})[\s-]?([0-9]{3})[\s-]?([0-9]{4})\b'),
+]
+LANDLINE_PATTERNS = [
+    re.compile(r'\b(02|032|033|034|035|036|038|042|043|044|045|046|047|048|049|052|053|054|055|056|062|063|064|065|072|074|075|077|078|082|083|084|085|086|088)[\s-]?([0-9]{3,4})[\s-]?([0-9]{4})\b'),
+]
+
+CALOOCAN_INDICATORS = ('CALOOCAN', 'KALOOKAN', 'KALOOCAN')
+CALOOCAN_DEFAULTS = {
+    'region': '130000000',
+    'region_name': 'National Capital Region (NCR)',
+    'province': '133900000',
+    'province_name': 'Metro Manila',
+    'city_code': '137404000',
+}
+CALOOCAN_SPLIT_RE = re.compile(r'\b(?:CALOOCAN|CITY|METRO|PHILS)\b', re.I)
+CALOOCAN_STRIP_RE = re.compile(r'CALOOCAN\s*CITY?|CALOOCAN\b')
+BARANGAY_PATTERNS = [
+    re.compile(r'BARANGAY\s+(\d+)'),
+    re.compile(r'BRGY\.?\s*(\d+)'),
+    re.compile(r'BRG?Y\s+(\d+)'),
+    re.compile(r'\bBRGY\s+NO\.?\s*(\d+)'),
+]
+ADDRESS_KEYWORDS = ('ADDRESS', 'RESIDENCE', 'HOME', 'STREET', 'CITY', 'PROVINCE')
+# Labels that end a multi-line address block
+ADDRESS_STOP_LABELS = ('ID NO', 'DATE OF', 'LICENSE NO', 'EXPIRATION', 'AGENCY CODE')
+TIN_ADDRESS_STOP_LABELS = ('DATE', 'BIRTH', 'ISSUE', 'SIGNATURE')
+ID_NUMBER_LINE_RE = re.compile(r'^[\d\s-]+$')
+NON_DIGIT_ANY_RE = re.compile(r'[^\d]')
+
+BLOCK_PATTERNS = [re.compile(p) for p in (r'BLK\.?\s*#?\s*(\d+)', r'BLOCK\s+#?\s*(\d+)', r'\bB\.?\s*-?\s*(\d+)')]
+LOT_PATTERNS = [re.compile(p) for p in (r'\b(?:LOT|LT|L)[\.\s#\-]*([0-9]+[A-Z]?|[A-Z])\b', r'\bLOT\s+([0-9A-Z\-]+)\b')]
+STREET_RE = re.compile(r'([A-Z0-9\s#]{3,30}?)\s+(?:ST\b|STREET|RD\b|ROAD|AVE\b|AVENUE|BLVD|DRIVE|LANE)')
+# The lazy prefix above backtracks at every offset; this linear scan tells us first whether a suffix exists at all
+STREET_SUFFIX_RE = re.compile(r'\s(?:ST\b|STREET|RD\b|ROAD|AVE\b|AVENUE|BLVD|DRIVE|LANE)')
+STREET_CLEAN_RE = re.compile(r'\b(Lts?|No\.)\s*[\d\-A-Z]+')
+# Area-based streets like "BAGUMBONG" right before the barangay/city
+STREET_FALLBACK_RE = re.compile(r'(?:\d+\b)?\s*([A-Z\s]{3,25})[,\s]+(?:BRGY|BARANGAY|CALOOCAN)')
+STREET_FALLBACK_ANCHORS = ('BRGY', 'BARANGAY', 'CALOOCAN')
+STREET_FALLBACK_EXCLUDE = ('LOT', 'BLK', 'BLOCK', 'NO.', 'ID ')
+HOUSE_PATTERNS = [
+    re.compile(r'\b(?:HOUSE|HS)[\.\s]*NO\.?[\s#]*([0-9A-Z\-]+)\b'),
+    re.compile(r'\bNO\.?\s*([0-9]+[A-Z\-]*)\b'),  # Requires at least one digit
+    re.compile(r'^#\s*([0-9A-Z\-]+)'),  # Starting with #
+    re.compile(r'^\b([0-9]{1,4}[A-Z]?)\b\s+(?=[A-Z])')  # Starting with a number
+]
+HOUSE_BEFORE_STREET_RE = re.compile(r'#?(\d+[A-Z]?)\s*$')
+# (keywords, pattern): the pattern can only match when one of its keywords is present
+SUBDIVISION_PATTERNS = [
+    (('HOMES', 'VILL', 'SUBD', 'HEIGHTS', 'ESTATES', 'RESIDENCES'),
+     re.compile(r'([A-Z0-9][A-Z0-9\s]+?)\s+(HOMES|VILLAGE|VILL\.?|SUBDIVISION|SUBD\.?|VILLAS|HEIGHTS|ESTATES|RESIDENCES)')),
+    (('NORTHVILLE',), re.compile(r'(NORTHVILLE\s*[A-Z0-9\s]*)'))  # National ID specific
+]
+ZIP_RE = re.compile(r'\b([0-9]{4})\b')  # Philippine ZIP codes are 4 digits
+ZIP_SEPARATOR_RE = re.compile(r'[\s\-]+(\d{4})\b')
+FOUR_DIGITS_RE = re.compile(r'\b\d{4}\b')
+ONLY_FOUR_DIGITS_RE = re.compile(r'^\d{4}$')
+ONLY_DIGITS_RE = re.compile(r'^\d+$')
+NON_ALPHA_RE = re.compile(r'[^A-Z\s]')
+
+
+# ============= FIELD VALIDATORS =============
+class FieldValidator:
+    @staticmethod
+    def validate_name(text):
+        """Validate and clean name fields"""
+        if not text:
+            return None, 0.0
+        cleaned = NAME_CLEAN_RE.sub('', text).strip()
+        if not cleaned or len(cleaned) < 2:
+            return None, 0.0
+        confidence = 0.9 if len(cleaned) > 2 else 0.6
+        return cleaned.title(), confidence
+
+    @staticmethod
+    def validate_date(text):
+        """Validate and parse date fields"""
+        if not text:
+            return None, 0.0
+
+        for pattern, fmt, conf in DATE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                try:
+                    if fmt == 'text':
+                        month_name = str(match.group(1) or "")
+                        m = MONTHS.get(month_name[0:3].upper(), "01")  # type: ignore
+                        d = str(match.group(2) or "01").zfill(2)
+                        y = str(match.group(3))
+                        return f"{y}-{m}-{d}", conf
+                    elif fmt == '%m/%d/%Y':
+                        date_str = f"{match.group(1)}/{match.group(2)}/{match.group(3)}"
+                        dt = datetime.strptime(date_str, fmt)
+                        return dt.strftime('%Y-%m-%d'), conf
+                    else:
+                        date_str = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
+                        return date_str, conf
+                except:
+                    continue
+        return None, 0.0
+
+    @staticmethod
+    def validate_gender(text):
+        """Validate gender field"""
+        if not text:
+            return None, 0.0
+        return FieldValidator.gender_from_upper(text.upper())
+
+    @staticmethod
+    def gender_from_upper(clean):
+        """validate_gender for text that is already upper-cased"""
+        if 'FEMALE' in clean or clean == 'F':
+            return 'Female', 0.95
+        elif 'MALE' in clean or clean == 'M':
+            return 'Male', 0.95
+        return None, 0.0
+
+
+class _OCRText:
+    """One scan's text, normalized once and shared by every extractor."""
+
+    __slots__ = ('raw', 'raw_upper', 'lines', 'upper_lines', 'clean', 'clean_upper', 'clean_digits')
+
+    def __init__(self, text):
+        self.raw = text
+        self.raw_upper = text.upper()
+        self.lines = [l.strip() for l in text.split('\n') if len(l.strip()) > 1]
+        self.upper_lines = [l.upper() for l in self.lines]
+        # Single-line view used by the whole-text searches
+        self.clean = text.replace('\n', ' ')
+        self.clean_upper = self.raw_upper.replace('\n', ' ')
+        self.clean_digits = self.clean_upper.translate(OCR_DIGIT_FIXES)
+
+
+# ============= ADVANCED OCR PARSER =============
+class PHIDParser:
+    def __init__(self, expected_id_type=None, trace=None):
+        self.expected_id_type = expected_id_type
+        # Optional list that collects every decision message (sampled debug captures)
+        self.trace = trace
+        self.fields = {
+            'first_name': None,
+            'middle_name': None,
+            'last_name': None,
+            'suffix': None,
+            'dob': None,
+            'gender': None,
+            'phone': None,
+            'contact': None, # Match registration form key
+            'address': None,
+            'city': None,
+            'id_type': expected_id_type if expected_id_type else 'Government ID',
+            'crn': None,
+            'email': None,
+            'region': None,
+            'region_name': None,
+            'province': None,
+            'province_name': None,
+            'city_code': None,
+            'barangay': None,
+            'barangay_code': None
+        }
+        self.confidence = {}
+
+    def _log(self, msg, *args):
+        if self.trace is not None:
+            self.trace.append(msg % args if args else msg)
+        log.debug(msg, *args)
+
+    def parse(self, text):
+        """Parse OCR text with confidence scoring"""
+        ocr = _OCRText(text)
+
+        # 0. Identify ID Type for better guidance
+        self._identify_id_type(ocr.clean_upper)
+
+        # 1. Extract Names
+        self._extract_names(ocr.lines, ocr.upper_lines)
+        self._extract_suffix_from_names()
+
+        # 2. Extract DOB
+        self._extract_dob(ocr)
+
+        # 3. Extract Gender
+        self._extract_gender(ocr)
+
+        # 4. Extract CRN/ID No.
+        self._extract_crn(ocr)
+
+        # 5. Extract Phone Number
+        self._extract_phone(ocr)
+
+        # 5b. Extract Email
+        self._extract_email(ocr.clean)
+
+        # 5c. Extract PhilHealth ID
+        self._extract_philhealth_id(ocr.clean_digits)
+
+        # 6. Extract Address
+        self._extract_address(ocr)
+
+        return self.fields, self.confidence
+
+    def _identify_id_type(self, upper_text):
+        """Detect the type of Philippine ID from OCR text"""
+        if self.expected_id_type:
+             self._log("[ID TYPE] Using user-selected type: %s", self.expected_id_type)
+             self.fields['id_type'] = self.expected_id_type
+             return
+
+        for id_type, keywords, require_all in ID_TYPE_RULES:
+            hits = (k in upper_text for k in keywords)
+            if all(hits) if require_all else any(hits):
+                self.fields['id_type'] = id_type
+                break
+        self._log("[ID TYPE] Auto-identified as: %s", self.fields['id_type'])
+
+    def _extract_crn(self, ocr):
+        """Extract CRN or ID Number"""
+        # Strategy 1: Look for patterns in the whole text (same line)
+        for pattern in CRN_PATTERNS:
+             match = pattern.search(ocr.clean_upper)
+             if match:
+                 self.fields['crn'] = match.group(1)
+                 self.confidence['crn'] = 0.95
+                 self._log("[CRN] Found via same-line: %s", self.fields['crn'])
+                 return
+
+        # Strategy 2: Look for ID Number labels and grab the next word/line
+        lines = ocr.clean.split('\n')
+        for i, line in enumerate(lines):
+            if any(l in line.upper() for l in CRN_LABELS):
+                # Check next 2 lines for a potential ID number (alphanumeric, 6-20 chars)
+                search_scope = " ".join(lines[i:min(i+3, len(lines))])
+                # Remove the label itself to avoid matching it
+                clean_scope = search_scope.replace(line, '').strip()
+                match = CRN_VALUE_RE.search(clean_scope)
+                if match:
+                     self.fields['crn'] = match.group(1)
+                     self.confidence['crn'] = 0.85
+                     self._log("[CRN] Found via next-line search: %s", self.fields['crn'])
+                     return
+
+    def _extract_philhealth_id(self, normalized_text):
+        """Extract PhilHealth ID (Format: XX-XXXXXXXXX-X) from digit-normalized text"""
+        for pattern in PHILHEALTH_PATTERNS:
+            match = pattern.search(normalized_text)
+            if match:
+                if pattern.groups == 3:
+                    val = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
+                else:
+                    raw = NON_DIGIT_RE.sub('', str(match.group(1) or ""))
+                    if len(raw) == 12:
+                        val = f"{raw[0:2]}-{raw[2:11]}-{raw[11:]}"  # type: ignore
+                    else:
+                        continue
+
+                self.fields['philhealth_id'] = val
+                self.confidence['philhealth_id'] = 0.95
+                self._log("[PHILHEALTH] Found: %s", val)
+                return
+
+    def _extract_email(self, text):
+        """Extract email address from OCR text"""
+        match = EMAIL_RE.search(text)
+        if match:
+            self.fields['email'] = match.group(0).lower()
+            self.confidence['email'] = 0.95
+            self._log("[EMAIL] Found: %s", self.fields['email'])
+
+    def _extract_names(self, lines, upper_lines):
+        """Extract names with broader header and label detection for all PH IDs"""
+
+        # NATIONAL ID SPECIFIC LOGIC (Top Priority, no header labels)
+        if self.fields.get('id_type') == "National ID":
+             # Find "National ID" or "Republika" line
+             start_idx = -1
+             for i, ul in enumerate(upper_lines):
+                 if any(k in ul for k in NATIONAL_ID_MARKERS):
+                     start_idx = i
+
+             if start_idx != -1:
+                 # Names are usually the next 3 lines
+                 idx = start_idx + 1
+                 if idx < len(lines):
+                     last, _ = FieldValidator.validate_name(lines[idx])
+                     self.fields['last_name'] = last
+                     self.confidence['last_name'] = 0.90
+
+                 idx += 1
+                 if idx < len(lines):
+                     first, _ = FieldValidator.validate_name(lines[idx])
+                     self.fields['first_name'] = first
+                     self.confidence['first_name'] = 0.90
+
+                 idx += 1
+                 if idx < len(lines) and 'SEX' not in upper_lines[idx] and 'DATE' not in upper_lines[idx]:
+                     middle, _ = FieldValidator.validate_name(lines[idx])
+                     self.fields['middle_name'] = middle
+                     self.confidence['middle_name'] = 0.90
+
+                 self._log("[NAMES] Extracted via National ID rules: %s %s %s", self.fields['first_name'], self.fields['middle_name'], self.fields['last_name'])
+                 return
+
+        # TIN ID SPECIFIC LOGIC
+        if self.fields.get('id_type') == "TIN ID":
+             for i, ul in enumerate(upper_lines):
+                 if TIN_LINE_RE.match(ul):
+                     # Name is typically the line right above the TIN number
+                     if i > 0:
+                         name_line = lines[i-1].strip()
+                         # Format is usually: Last Name, First Name Middle Name
+                         if ',' in name_line:
+                             parts = [p.strip() for p in name_line.split(',', 1)]
+                             self.fields['last_name'], _ = FieldValidator.validate_name(parts[0])
+                             self.confidence['last_name'] = 0.90
+
+                             if len(parts) > 1:
+                                 rest = parts[1].split()
+                                 if len(rest) > 1:
+                                     self.fields['first_name'], _ = FieldValidator.validate_name(' '.join(rest[:-1]))
+                                     self.fields['middle_name'], _ = FieldValidator.validate_name(rest[-1])
+                                 elif len(rest) == 1:
+                                     self.fields['first_name'], _ = FieldValidator.validate_name(rest[0])
+                                 self.confidence['first_name'] = 0.90
+                                 self.confidence['middle_name'] = 0.90
+                         else:
+                             # Fallback if comma is missed
+                             parts = name_line.split()
+                             if len(parts) >= 1:
+                                 self.fields['last_name'], _ = FieldValidator.validate_name(parts[0])
+                             if len(parts) >= 2:
+                                 self.fields['first_name'], _ = FieldValidator.validate_name(parts[1])
+                             if len(parts) > 2:
+                                 self.fields['middle_name'], _ = FieldValidator.validate_name(' '.join(parts[2:]))
+
+                     self._log("[NAMES] Extracted via TIN ID rules: %s %s %s", self.fields.get('first_name'), self.fields.get('middle_name'), self.fields.get('last_name'))
+                     return
+
+        # Strategy 1: Combined header (e.g. UMID, SSS, PRC, DL)
+        header_idx = None
+        for i, ul in enumerate(upper_lines):
+            has_last = 'LAST' in ul or 'SURNAME' in ul
+            has_first = 'FIRST' in ul or 'GIVEN' in ul
+            has_middle = 'MIDDLE' in ul
+
+            if (has_last and has_first) or (has_last and has_middle) or (has_last and i + 1 < len(lines) and ',' in lines[i+1]):
+                header_idx = i
+                break
+
+        if header_idx is not None and header_idx + 1 < len(lines):
+            data_line = lines[header_idx + 1]
+
+            # DRIVER'S LICENSE SPECIFIC LOGIC (Format: SALVACION, LANCE ALDRIC CUREG)
+            if self.fields.get('id_type') == "Driver's License" and ',' in data_line:
+                parts = [p.strip() for p in data_line.split(',', 1)]
+                last, conf_l = FieldValidator.validate_name(parts[0])
+                self.fields['last_name'] = last
+                self.confidence['last_name'] = 0.95
+
+                if len(parts) > 1:
+                     rest = parts[1].strip().split()
+                     # In DL, the last word is almost always the middle name (unless there's a suffix, which we handle later)
+                     if len(rest) > 1:
+                          middle, conf_m = FieldValidator.validate_name(rest[-1])
+                          self.fields['middle_name'] = middle
+                          self.confidence['middle_name'] = 0.90
+
+                          first, conf_f = FieldValidator.validate_name(' '.join(rest[:-1]))
+                          self.fields['first_name'] = first
+                          self.confidence['first_name'] = 0.90
+                     elif len(rest) == 1:
+                          first, conf_f = FieldValidator.validate_name(rest[0])
+                          self.fields['first_name'] = first
+                          self.confidence['first_name'] = 0.90
+                self._log("[NAMES] Extracted via Driver's License rules: %s %s %s", self.fields['first_name'], self.fields['middle_name'], self.fields['last_name'])
+                return
+
+
+            if ',' in data_line:
+                parts = [p.strip() for p in data_line.split(',', 1)]
+                last, conf_l = FieldValidator.validate_name(parts[0])
+                self.fields['last_name'] = last
+                self.confidence['last_name'] = conf_l
+
+                if len(parts) > 1:
+                    rest = parts[1].strip().split()
+                    if len(rest) >= 1:
+                        first, conf_f = FieldValidator.validate_name(rest[0])
+                        self.fields['first_name'] = first
+                        self.confidence['first_name'] = conf_f
+                    if len(rest) >= 2:
+                        middle, conf_m = FieldValidator.validate_name(' '.join(rest[1:]))
+                        self.fields['middle_name'] = middle
+                        self.confidence['middle_name'] = conf_m
+                return
+            else:
+                # OCR missed the comma (e.g. "ESTIOKO GREGORY JR REYES")
+                parts = data_line.split()
+                if len(parts) >= 1:
+                    last, conf_l = FieldValidator.validate_name(parts[0])
+                    self.fields['last_name'] = last
+                    self.confidence['last_name'] = conf_l
+                if len(parts) >= 2:
+                    first, conf_f = FieldValidator.validate_name(parts[1])
+                    self.fields['first_name'] = first
+                    self.confidence['first_name'] = conf_f
+                if len(parts) > 2:
+                    middle, conf_m = FieldValidator.validate_name(' '.join(parts[2:]))
+                    self.fields['middle_name'] = middle
+                    self.confidence['middle_name'] = conf_m
+                return
+
+        # Strategy 2: Individual labels (Generalized for all cards)
+        for i, line in enumerate(lines):
+            ul = upper_lines[i]
+            if i + 1 < len(lines):
+                # Surname Labels
+                if any(k in ul for k in LAST_NAME_LABELS):
+                    # Check same line after colon first
+                    if ':' in line:
+                        potential = line.split(':', 1)[1].strip()
+                        if len(potential) > 2:
+                            val, conf = FieldValidator.validate_name(potential)
+                            self.fields['last_name'] = val
+                            self.confidence['last_name'] = conf
+                            continue
+                    # Check next line
+                    val, conf = FieldValidator.validate_name(lines[i+1])
+                    if val and not self.fields['last_name']:
+                        self.fields['last_name'] = val
+                        self.confidence['last_name'] = conf
+
+                # First Name Labels
+                elif any(k in ul for k in FIRST_NAME_LABELS):
+                    if ':' in line:
+                        potential = line.split(':', 1)[1].strip()
+                        if len(potential) > 2:
+                            val, conf = FieldValidator.validate_name(potential)
+                            self.fields['first_name'] = val
+                            self.confidence['first_name'] = conf
+                            continue
+                    val, conf = FieldValidator.validate_name(lines[i+1])
+                    if val and not self.fields['first_name']:
+                        self.fields['first_name'] = val
+                        self.confidence['first_name'] = conf
+
+                # Middle Name Labels
+                elif any(k in ul for k in MIDDLE_NAME_LABELS):
+                    if ':' in line:
+                        potential = line.split(':', 1)[1].strip()
+                        if len(potential) > 1:
+                            val, conf = FieldValidator.validate_name(potential)
+                            self.fields['middle_name'] = val
+                            self.confidence['middle_name'] = conf
+                            continue
+                    val, conf = FieldValidator.validate_name(lines[i+1])
+                    if val and not self.fields['middle_name']:
+                        self.fields['middle_name'] = val
+                        self.confidence['middle_name'] = conf
+
+        # Strategy 3: Unlabeled PhilHealth ID Format Fallback (e.g. LAST NAME, FIRST NAME MIDDLE NAME)
+        if self.fields['id_type'] == 'PhilHealth ID' and not self.fields.get('last_name'):
+            # Looking for a line with a comma (LAST_NAME, FIRST MODIFIER) right after the header/id
+            for i, line in enumerate(lines):
+                 if ',' in line and len(line) > 5 and 'PHILHEALTH' not in upper_lines[i]:
+                     parts = [p.strip() for p in line.split(',', 1)]
+
+                     # Extract Last Name (before the comma)
+                     last, conf_l = FieldValidator.validate_name(parts[0])
+                     if last:
+                         self.fields['last_name'] = last
+                         self.confidence['last_name'] = conf_l
+
+                     # Extract First and Middle Names (after the comma)
+                     if len(parts) > 1:
+                         rest = parts[1].split()
+                         # Simple heuristic: last word is usually the middle name, middle words are first name
+                         if len(rest) == 2:
+                             # (First, Middle)
+                             first, conf_f = FieldValidator.validate_name(rest[0])
+                             self.fields['first_name'] = first
+                             self.confidence['first_name'] = conf_f
+
+                             middle, conf_m = FieldValidator.validate_name(rest[1])
+                             self.fields['middle_name'] = middle
+                             self.confidence['middle_name'] = conf_m
+                         elif len(rest) > 2:
+                             # Multiple first names (e.g. Juan De La Cruz)
+                             # Assume the last word is the middle name
+                             middle, conf_m = FieldValidator.validate_name(rest[-1])
+                             self.fields['middle_name'] = middle
+                             self.confidence['middle_name'] = conf_m
+
+                             first, conf_f = FieldValidator.validate_name(' '.join(rest[:-1]))
+                             self.fields['first_name'] = first
+                             self.confidence['first_name'] = conf_f
+                     self._log("[NAMES] Extracted via PhilHealth rules: %s %s %s", self.fields['first_name'], self.fields['middle_name'], self.fields['last_name'])
+                     return
+
+        # POST-PROCESSING FOR DRIVER'S LICENSE:
+        if self.fields.get('id_type') == "Driver's License" and not self.fields.get('middle_name'):
+             first_name_str = self.fields.get('first_name')
+             if isinstance(first_name_str, str):
+                 f_name_parts = first_name_str.split()
+                 if len(f_name_parts) > 1:
+                     self.fields['middle_name'] = str(f_name_parts.pop())
+                     self.fields['first_name'] = str(' '.join(f_name_parts))
+                     self.confidence['middle_name'] = 0.85
+                     self._log("[NAMES] Post-processed DL names: %s %s %s", self.fields.get('first_name'), self.fields.get('middle_name'), self.fields.get('last_name'))
+
+    def _extract_suffix_from_names(self):
+        """Extract suffix from names if present (e.g., Jr, Sr, III)"""
+        for field in ['last_name', 'first_name', 'middle_name']:
+            val = self.fields.get(field)
+            if val:
+                parts = val.split()
+                new_parts = []
+                extracted = None
+                for part in parts:
+                    clean_part = NON_UPPER_RE.sub('', part.upper())
+                    if clean_part in SUFFIXES and not self.fields.get('suffix'):
+                        extracted = SUFFIXES.get(clean_part)
+                        self.fields['suffix'] = str(extracted)
+                        self.confidence['suffix'] = float(self.confidence.get(field, 0.9) or 0.9)
+                    else:
+                        new_parts.append(part)
+
+                if extracted and len(new_parts) != len(parts):
+                    if new_parts:
+                        self.fields[field] = ' '.join(new_parts)
+                    else:
+                        self.fields[field] = None
+                    self._log("[SUFFIX] Extracted %s from %s. Main is now '%s'", extracted, field, self.fields[field])
+
+    def _extract_dob(self, ocr):
+        """Extract date of birth with smart filtering to avoid issuance/expiry dates"""
+        # Strategy 1: Look for labeled birth date
+        if any(keyword in ocr.clean_upper for keyword in BIRTH_KEYWORDS):
+            dob, conf = self._find_valid_birth_date(ocr.clean)
+            if dob:
+                self.fields['dob'] = dob
+                self.confidence['dob'] = conf
+                self._log("[DOB] Found via label: %s", dob)
+                return
+
+        # Strategy 2: Global search for any date that passes as a birth date
+        all_dates = self._find_all_dates(ocr.clean)
+        for date_str, conf in all_dates:
+            if self._is_valid_birth_date(date_str):
+                # Check if it might be an issuance/expiry date (heuristic: close to today)
+                dt = datetime.strptime(date_str, '%Y-%m-%d')
+                age = (datetime.now() - dt).days / 365.25
+                if 10 < age < 120:
+                    self.fields['dob'] = date_str
+                    self.confidence['dob'] = conf * 0.7
+                    self._log("[DOB] Found via age validation: %s", date_str)
+                    return
+
+        self._log("[DOB] No valid birth date found")
+
+    def _find_valid_birth_date(self, text):
+        """Find a date in text and validate it's a reasonable birth date"""
+        dob, conf = FieldValidator.validate_date(text)
+        if dob and self._is_valid_birth_date(dob):
+            return dob, conf
+        return None, 0.0
+
+    def _find_all_dates(self, text):
+        """Find all dates in text"""
+        dates = []
+        for pattern, fmt, conf in NUMERIC_DATE_PATTERNS:
+            for match in pattern.finditer(text):
+                try:
+                    if fmt == '%m/%d/%Y':
+                        date_str = f"{match.group(1)}/{match.group(2)}/{match.group(3)}"
+                        dt = datetime.strptime(date_str, fmt)
+                        dates.append((dt.strftime('%Y-%m-%d'), conf))
+                    else:
+                        date_str = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
+                        dates.append((date_str, conf))
+                except:
+                    continue
+        return dates
+
+    def _is_valid_birth_date(self, date_str):
+        """Check if date is a reasonable birth date (at least 10 years ago, not in future)"""
+        try:
+            birth_date = datetime.strptime(date_str, '%Y-%m-%d')
+            today = datetime.now()
+
+            # Reject future dates
+            if birth_date > today:
+                self._log("[DOB] Rejected %s (future date)", date_str)
+                return False
+
+            age_years = (today - birth_date).days / 365.25
+
+            # Birth date should be between 10 and 120 years ago
+            if 10 <= age_years <= 120:
+                return True
+            else:
+                self._log("[DOB] Rejected %s (age would be %.1f years)", date_str, age_years)
+                return False
+        except:
+            return False
+
+    def _extract_gender(self, ocr):
+        """Extract gender with improved label detection"""
+        upper_text = ocr.raw_upper
+
+        # Strategy 1: Look for "Sex:" or "Gender:" labels with flexible spacing
+        # Handles: "Sex M", "Sex: M", "Sex    M" (multiple spaces/tabs)
+        for pattern in SEX_LABEL_PATTERNS:
+            match = pattern.search(upper_text)
+            if match:
+                value = match.group(1)
+                gender, conf = FieldValidator.validate_gender(value)
+                if gender:
+                    self.fields['gender'] = gender
+                    self.confidence['gender'] = conf
+                    self._log("[GENDER] Found via label: %s", gender)
+                    return
+
+        # Strategy 2: Table layout pattern (e.g. Sex indicator far from label)
+        match = SEX_TABLE_RE.search(upper_text)
+        if match:
+            gender, conf = FieldValidator.validate_gender(match.group(1))
+            if gender:
+                self.fields['gender'] = gender
+                self.confidence['gender'] = 0.85
+                self._log("[GENDER] Found in table layout: %s", gender)
+                return
+
+        # Strategy 3: Fallback - look for MALE/FEMALE anywhere in text
+        gender, conf = FieldValidator.gender_from_upper(upper_text) if upper_text else (None, 0.0)
+        if gender:
+            self.fields['gender'] = gender
+            # If it's a PhilHealth ID and we found M/F without a label, it's very likely correct
+            if self.fields.get('id_type') == 'PhilHealth ID':
+                 self.confidence['gender'] = 0.90
+                 self._log("[GENDER] Found without label (PhilHealth Confident): %s", gender)
+            else:
+                 self.confidence['gender'] = conf * 0.7  # Lower confidence without label
+                 self._log("[GENDER] Found without label: %s", gender)
+
+    def _extract_phone(self, ocr):
+        """Extract phone number (mobile or landline)"""
+        # Strategy 1: Look for labeled phone numbers (highest confidence)
+        # Patterns: "Tel. No.:", "Mobile:", "Contact No:", "Phone:"
+        for pattern in PHONE_LABEL_PATTERNS:
+            match = pattern.search(ocr.raw_upper)
+            if match:
+                # Reconstruct phone number from groups
+                if pattern.groups == 4:
+                    country = match.group(1) or ''
+                    phone = f"{country}{match.group(2)}{match.group(3)}{match.group(4)}".strip()
+                elif pattern.groups == 3:
+                    phone = f"{match.group(1)}{match.group(2)}{match.group(3)}"
+                else:
+                    phone = ''.join(g for g in match.groups() if g)
+
+                # Clean and validate
+                phone = PHONE_SEPARATORS_RE.sub('', phone)
+
+                if 10 <= len(phone) <= 13:
+                    self.fields['contact'] = phone
+                    self.confidence['phone'] = 0.95
+                    self._log("[PHONE] Found via label: %s", phone)
+                    return
+
+        # Strategy 2: Mobile patterns (Accounting for OCR errors 0/O, 1/I)
+        for pattern in MOBILE_PATTERNS:
+            match = pattern.search(ocr.clean_digits)
+            if match:
+                phone = ''.join(match.groups()).replace(' ', '').replace('-', '')
+                self.fields['contact'] = phone
+                self.confidence['phone'] = 0.85
+                self._log("[PHONE] Found mobile: %s", phone)
+                return
+
+        # Strategy 3: Look for landline patterns (02 XXXX XXXX or similar)
+        for pattern in LANDLINE_PATTERNS:
+            match = pattern.search(ocr.raw)
+            if match:
+                phone = ''.join(match.groups()).replace(' ', '').replace('-', '')
+                self.fields['phone'] = phone
+                self.confidence['phone'] = 0.75
+                self._log("[PHONE] Found landline: %s", phone)
+                return
+
+        self._log("[PHONE] Not found")
+
+    def _set_caloocan(self, with_confidence):
+        self.fields['city'] = 'Caloocan City'
+        self.confidence['city'] = 0.95
+        self.fields.update(CALOOCAN_DEFAULTS)
+        if with_confidence:
+            for key in CALOOCAN_DEFAULTS:
+                self.confidence[key] = 0.95
+
+    def _extract_address(self, ocr):
+        """Extract address components with enhanced multi-line support and Caloocan detection"""
+        lines, upper_lines = ocr.lines, ocr.upper_lines
+        upper_text = ocr.clean_upper
+
+        # PHILHEALTH SPECIFIC LOGIC
+        if self.fields.get('id_type') == 'PhilHealth ID':
+            # In PhilHealth, the address is typically 1-2 lines after the Date of Birth/Gender line.
+            addr_start_idx = -1
+            dob_val = self.fields.get('dob')
+            dob_year = str(dob_val).split('-')[0] if dob_val else None
+            for i, ul in enumerate(upper_lines):
+                 if dob_year and dob_year in ul: # The year is in the line
+                     addr_start_idx = i
+                 elif 'MALE' in ul or 'FEMALE' in ul:
+                     addr_start_idx = i
+
+            if addr_start_idx != -1:
+                 candidates = []
+                 for j in range(1, 4):
+                     search_idx = addr_start_idx + j
+                     if search_idx < len(lines):
+                         l = lines[search_idx].strip()
+                         # Stop if we hit a PhilHealth Number or noise
+                         if ID_NUMBER_LINE_RE.match(l) and len(NON_DIGIT_ANY_RE.sub('', l)) >= 10:
+                             break
+                         if len(l) < 4:
+                             break
+                         candidates.append(l)
+
+                 if candidates:
+                     full_addr = " ".join(candidates)
+                     self.fields['full_address'] = full_addr
+                     self.confidence['full_address'] = 0.90
+                     self._log("[ADDRESS] Extracted PhilHealth block: %s", full_addr)
+                     self._parse_address_components(full_addr)
+                     return
+
+        # TIN ID SPECIFIC LOGIC
+        if self.fields.get('id_type') == 'TIN ID':
+            tin_idx = -1
+            for i, ul in enumerate(upper_lines):
+                if TIN_LINE_RE.match(ul):
+                    tin_idx = i
+                    break
+
+            if tin_idx != -1:
+                candidates = []
+                for j in range(1, 4):
+                    _idx = tin_idx + j
+                    if _idx < len(lines):
+                        l = lines[_idx].strip()
+                        # Stop if we hit Date of Birth or Issue Date
+                        if any(k in upper_lines[_idx] for k in TIN_ADDRESS_STOP_LABELS):
+                            break
+                        if len(l) > 3:
+                            candidates.append(l)
+
+                if candidates:
+                    full_addr = " ".join(candidates)
+                    self.fields['full_address'] = full_addr
+                    self.confidence['full_address'] = 0.90
+                    self._log("[ADDRESS] Extracted TIN ID block: %s", full_addr)
+                    self._parse_address_components(full_addr)
+                    return
+
+        is_caloocan = any(indicator in upper_text for indicator in CALOOCAN_INDICATORS)
+
+        if is_caloocan:
+            self._set_caloocan(with_confidence=True)
+
+        # Barangay Extraction
+        for pattern in BARANGAY_PATTERNS:
+            match = pattern.search(upper_text)
+            if match:
+                brgy_num = match.group(1)
+                self.fields['barangay'] = f'Barangay {brgy_num}'
+                self.confidence['barangay'] = 0.95
+                if brgy_num == '174':
+                    self.fields['barangay_code'] = '137404174'
+                break
+
+        # Full Address Extraction (Multi-Line Focus)
+        addr_line_idx = None
+        for i, ul in enumerate(upper_lines):
+            if any(kw in ul for kw in ADDRESS_KEYWORDS):
+                addr_line_idx = i
+                break
+
+        if addr_line_idx is not None:
+            # Merge up to 3 lines after label
+            candidates = []
+            for j in range(1, 4):
+                search_idx = addr_line_idx + j
+                if search_idx < len(lines):
+                    l = lines[search_idx].strip()
+                    # Stop merging if we hit these labels which indicate the end of the address block
+                    if any(k in upper_lines[search_idx] for k in ADDRESS_STOP_LABELS):
+                        break
+                    if len(l) > 3:
+                        candidates.append(l)
+
+            if candidates:
+                full_addr = " ".join(candidates)
+                self.fields['full_address'] = full_addr
+                self.confidence['full_address'] = 0.85
+                self._parse_address_components(full_addr)
+
+        # Fallback Strategy for unlabeled address (e.g. National ID, Voter's ID)
+        if not self.fields.get('full_address'):
+             # Look for city/location keywords and grab preceding lines
+             for i, line in enumerate(lines):
+                 ul = upper_lines[i]
+                 if any(ind in ul for ind in CALOOCAN_INDICATORS):
+                    candidates = []
+                    if i > 0: candidates.insert(0, lines[i-1])
+                    if i > 1 and len(candidates[0]) < 10: candidates.insert(0, lines[i-2])
+
+                    if len(ul) > 20: # Use same line if long (e.g. Street City)
+                        parts = CALOOCAN_SPLIT_RE.split(line)
+                        if len(parts) > 0 and len(parts[0].strip()) > 5:
+                            candidates.append(parts[0].strip())
+
+                    candidate_text = " ".join(candidates).strip()
+                    if len(candidate_text) > 10:
+                        self.fields['full_address'] = candidate_text
+                        self.confidence['full_address'] = 0.75
+                        self._parse_address_components(candidate_text)
+                        break
+
+        # Always attempt parsing from full text if components still missing
+        if not any(self.fields.get(f) for f in ['house_number', 'street_name', 'subdivision']):
+             self._parse_address_components(ocr.clean, upper_text)
+
+        # Post-process Caloocan ZIP Code
+        if self.fields.get('city') == 'Caloocan City':
+            ext_zip = str(self.fields.get('zip_code') or '')
+            if not ext_zip.isdigit() or not (1400 <= int(ext_zip) <= 1428):
+                if self.fields.get('barangay') == 'Barangay 174':
+                    self.fields['zip_code'] = '1423'
+                else:
+                    self.fields['zip_code'] = '1400'
+                self.confidence['zip_code'] = 0.95
+                self._log("[ADDRESS] Adjusted Caloocan ZIP: %s", self.fields['zip_code'])
+
+    def _parse_address_components(self, address_text, upper_addr=None):
+        """Parse detailed address components from full address string"""
+        if upper_addr is None:
+            upper_addr = address_text.upper()
+
+        # Block Number
+        for pattern in BLOCK_PATTERNS:
+            match = pattern.search(upper_addr)
+            if match:
+                self.fields['block_number'] = f"Block {match.group(1)}"
+                self.confidence['block_number'] = 0.95
+                self._log("[ADDRESS] Block No: %s", self.fields['block_number'])
+                break
+
+        # Lot Number
+        for pattern in LOT_PATTERNS:
+            match = pattern.search(upper_addr)
+            if match:
+                val = match.group(1).replace('B', '8').replace('O', '0') if len(match.group(1)) == 1 else match.group(1)
+                self.fields['lot_number'] = f"Lot {val}"
+                self.confidence['lot_number'] = 0.95
+                self._log("[ADDRESS] Lot No: %s", self.fields['lot_number'])
+                break
+
+        # Street Name
+        match = STREET_RE.search(upper_addr) if STREET_SUFFIX_RE.search(upper_addr) else None
+        if match:
+            raw_street = match.group(1).strip()
+            # Clean up
+            if 'BLK' not in raw_street and 'LOT' not in raw_street:
+                 clean = STREET_CLEAN_RE.sub('', raw_street).strip()
+                 if len(clean) > 3:
+                    self.fields['street_name'] = clean.title()
+                    self.confidence['street_name'] = 0.95
+                    self._log("[ADDRESS] Street: %s", self.fields['street_name'])
+
+        # Fallback Street (before Location)
+        if not self.fields.get('street_name'):
+             fallback = None
+             if any(k in upper_addr for k in STREET_FALLBACK_ANCHORS):
+                 fallback = STREET_FALLBACK_RE.search(upper_addr)
+             if fallback:
+                 cand = fallback.group(1).strip()
+                 if not any(k in cand for k in STREET_FALLBACK_EXCLUDE):
+                     self.fields['street_name'] = cand.title()
+                     self.confidence['street_name'] = 0.85
+                     self._log("[ADDRESS] Street (Fallback): %s", self.fields['street_name'])
+
+        # House Number
+        for pattern in HOUSE_PATTERNS:
+            match = pattern.search(upper_addr)
+            if match:
+                val = match.group(1).strip()
+                if len(val) <= 6: # sanity check
+                    self.fields['house_number'] = val
+                    self.confidence['house_number'] = 0.95
+                    self._log("[ADDRESS] House No: %s", self.fields['house_number'])
+                    break
+
+        # Contextual House No (before Street)
+        if not self.fields.get('house_number') and self.fields.get('street_name'):
+             street_upper = str(self.fields.get('street_name') or "").upper()
+             try:
+                 pre = upper_addr.split(street_upper)[0].strip().rstrip(',')
+                 num_match = HOUSE_BEFORE_STREET_RE.search(pre)
+                 if num_match:
+                     self.fields['house_number'] = num_match.group(1)
+                     self.confidence['house_number'] = 0.85
+                     self._log("[ADDRESS] Contextual House No: %s", self.fields['house_number'])
+             except: pass
+
+        # Subdivision/Village
+        for keywords, pattern in SUBDIVISION_PATTERNS:
+            if not any(k in upper_addr for k in keywords):
+                continue
+            match = pattern.search(upper_addr)
+            if match:
+                val = match.group(1).split(',')[0].strip() # Stop at comma
+                if len(val) > 3:
+                    self.fields['subdivision'] = val.title()
+                    self.confidence['subdivision'] = 0.95
+                    self._log("[ADDRESS] Subdivision: %s", self.fields['subdivision'])
+                    break
+
+        # ZIP Code
+        zip_match = ZIP_RE.search(upper_addr)
+        if zip_match:
+            self.fields['zip_code'] = zip_match.group(1)
+            self.confidence['zip_code'] = 0.95
+            self._log("[ADDRESS] ZIP: %s", self.fields['zip_code'])
+
+        # Heuristic City, Province, Barangay Extraction for Non-Caloocan
+        if not self.fields.get('city'):
+            # Pre-check for explicit NCR cities like Caloocan to avoid them being mapped as Province
+            if 'CALOOCAN' in upper_addr:
+                self._set_caloocan(with_confidence=False)
+
+                # Re-clean up any leftover heuristcs
+                cleaned_str = CALOOCAN_STRIP_RE.sub('', upper_addr).strip(' ,')
+                parts = [p.strip() for p in cleaned_str.split(',') if p.strip()]
+                if len(parts) >= 1:
+                    # Last remaining part is likely the Barangay
+                    brgy_str = parts[-1]
+                    if len(brgy_str) > 3 and not ONLY_DIGITS_RE.match(brgy_str):
+                        self.fields['barangay'] = brgy_str.title()
+                        self.confidence['barangay'] = 0.70
+                return
+            # Pre-process upper_addr to replace " - 1234" or " 1234" at the end with ", 1234"
+            # This handles cases where ZIP is separated by a dash (common in PhilHealth) or just space
+            normalized_addr = ZIP_SEPARATOR_RE.sub(r', \1', upper_addr)
+            parts = [p.strip() for p in normalized_addr.split(',') if p.strip()]
+
+            if len(parts) >= 2:
+                # Find the index of the part containing the ZIP code or use the last part
+                zip_part_idx = len(parts) - 1
+                for i, p in enumerate(parts):
+                    if FOUR_DIGITS_RE.search(p):
+                        zip_part_idx = i
+                        break
+
+                # Province is usually the part right before or containing the ZIP code
+                prov_str = ""
+
+                # If ZIP is in its own part (like "BULACAN, 3023" -> parts: "BULACAN", "3023")
+                if ONLY_FOUR_DIGITS_RE.match(parts[zip_part_idx].strip()):
+                    prov_idx = zip_part_idx - 1
+                else:
+                    prov_idx = zip_part_idx
+
+                if prov_idx >= 0:
+                    prov_str = FOUR_DIGITS_RE.sub('', parts[prov_idx]).strip()
+                    # Clean up random characters that might be left over
+                    prov_str = NON_ALPHA_RE.sub('', prov_str).strip()
+                    if len(prov_str) > 3:
+                        self.fields['province'] = prov_str.title()
+                        self.confidence['province'] = 0.80
+                        self._log("[ADDRESS] Province (Heuristic): %s", self.fields['province'])
+
+                    city_idx = prov_idx - 1
+                    if city_idx >= 0:
+                        city_str = parts[city_idx].strip()
+                        if len(city_str) > 3:
+                            self.fields['city'] = city_str.title()
+                            self.confidence['city'] = 0.80
+                            self._log("[ADDRESS] City/Muni (Heuristic): %s", self.fields['city'])
+
+                        brgy_idx = city_idx - 1
+                        if brgy_idx >= 0 and not self.fields.get('barangay'):
+                            brgy_str = parts[brgy_idx].strip()
+                            if len(brgy_str) > 3:
+                                self.fields['barangay'] = brgy_str.title()
+                                self.confidence['barangay'] = 0.70
+                                self._log("[ADDRESS] Barangay (Heuristic): %s", self.fields['barangay'])
+
+
+def format_ocr_dump(id_type, text):
+    """Inverse of split_ocr_dump: the ocr_last_run.txt layout used by fixtures and reparse_ocr.py."""
+    return f"EXPECTED ID TYPE: {id_type}\n{text}"
+
+
+def split_ocr_dump(content):
+    """
+    Split an ocr_last_run.txt style dump into (expected_id_type, text).
+    Dumps start with "EXPECTED ID TYPE: <type>"; 'None' means auto-detect.
+    """
+    first, sep, rest = content.partition('\n')
+    if first.startswith('EXPECTED ID TYPE:'):
+        id_type = first.split(':', 1)[1].strip()
+        return (None if id_type in ('', 'None') else id_type), rest
+    return None, content
+
+
+# ============= BATCH PARSING =============
+def parse_record(record):
+    """Parse one {'id', 'id_type', 'text'} record; errors are returned, not raised."""
+    started = time.perf_counter()
+    try:
+        fields, confidence = PHIDParser(expected_id_type=record.get('id_type')).parse(record.get('text') or '')
+        result = {'id': record.get('id'), 'fields': fields, 'confidence': confidence}
+    except Exception as e:
+        result = {'id': record.get('id'), 'error': str(e)}
+    result['parse_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _parse_chunk(records):
+    return [parse_record(r) for r in records]
+
+
+def _init_worker():
+    # Forked workers inherit the OCR log queue but not the thread draining it
+    reset_for_subprocess()
+
+
+class BatchStats:
+    """Throughput counters for one parse_batch() run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = 0
+        self.errors = 0
+        self.parse_ms = 0.0
+
+    def add(self, result):
+        self.records += 1
+        self.errors += 'error' in result
+        self.parse_ms += result['parse_ms']
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'records': self.records,
+            'errors': self.errors,
+            'elapsed_s': round(elapsed, 3),
+            'ids_per_sec': round(self.records / elapsed, 1) if elapsed > 0 else None,
+            'mean_parse_ms': round(self.parse_ms / self.records, 3) if self.records else None,
+        }
+
+
+def parse_batch(records, workers=None, chunksize=32, stats=None, mp_context=None):
+    """
+    Yield parse_record() results for an iterable of records, in input order.
+
+    Records are consumed lazily in chunks of `chunksize`, with at most two
+    chunks per worker in flight, so arbitrarily long inputs stream in bounded
+    memory. workers=0 parses in the calling process; otherwise a pool of
+    `workers` processes is used (default: one per CPU).
+    """
+    if workers is None:
+        # On a single CPU a worker process only adds pickling overhead
+        workers = os.cpu_count() or 1
+        if workers == 1:
+            workers = 0
+
+    def chunks():
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def emit(results):
+        for result in results:
+            if stats is not None:
+                stats.add(result)
+            yield result
+
+    if workers <= 0:
+        for chunk in chunks():
+            yield from emit(_parse_chunk(chunk))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker) as pool:
+        pending = []
+        for chunk in chunks():
+            pending.append(pool.submit(_parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from emit(pending.pop(0).result())
+        for future in pending:
+            yield from emit(future.result())
@@ -1,93 +1,151 @@
 # pyre-ignore-all-errors
+import os
+import threading
 import time
 import psycopg2.extras # type: ignore
-from threading import Thread
 from datetime import datetime, timedelta
-from database import get_db_connection # type: ignore
-from email_config import send_appointment_reminder_email # type: ignore
+from database import db_connection # type: ignore
+from email_config import build_appointment_reminder_email # type: ignore
+from email_outbox import SMTPSession # type: ignore
+from scheduler import ScheduledJob # type: ignore
 
-def check_reminders(app, mail):
+# Reminders are flagged reminder_sent once per chunk, so a crash mid-run
+# re-sends at most one chunk
+REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', '50'))
+# Seconds between reminder runs (deployment-wide, not per process)
+REMINDER_INTERVAL = float(os.getenv('REMINDER_INTERVAL', '3600'))
+REMINDER_LOCK_ID = 1
+
+_stats_lock = threading.Lock()
+_stats = {'runs': 0, 'sent': 0, 'failed': 0, 'last_run': None}
+
+
+def format_display_time(raw_time):
+    """12-hour display time from a time object or 'HH:MM[:SS]' string"""
+    # Handle both string and time objects
+    if isinstance(raw_time, str):
+        try:
+            # try HH:MM or HH:MM:SS
+            return datetime.strptime(raw_time, '%H:%M:%S').time().strftime('%I:%M %p')
+        except:
+            try:
+                return datetime.strptime(raw_time, '%H:%M').time().strftime('%I:%M %p')
+            except:
+                return raw_time
+    return raw_time.strftime('%I:%M %p')
+
+
+def fetch_due_reminders(day):
+    """Appointments on `day` that still need a reminder"""
+    with db_connection(psycopg2.extras.RealDictCursor) as (conn, cursor):
+        # Filter by status = 'confirmed' or 'pending'
+        cursor.execute("""
+            SELECT a.id, a.appointment_date, a.appointment_time, a.service_type, u.first_name, u.email
+            FROM appointments a
+            JOIN users u ON a.user_id = u.id
+            WHERE a.appointment_date = %s
+              AND a.reminder_sent = FALSE
+              AND a.status NOT IN ('cancelled', 'completed')
+        """, (day,))
+        return cursor.fetchall()
+
+
+def render_reminders(appointments):
+    """[(appointment_id, email, Message)] for every appointment with an email address"""
+    rendered = []
+    for apt in appointments:
+        if not apt['email']:
+            continue
+        try:
+            msg = build_appointment_reminder_email(
+                apt['email'],
+                apt['first_name'],
+                apt['appointment_date'].strftime('%B %d, %Y'),
+                format_display_time(apt['appointment_time']),
+                apt['service_type']
+            )
+            rendered.append((apt['id'], apt['email'], msg))
+        except Exception as e:
+            print(f"[ReminderService] Could not render reminder for appointment #{apt['id']}: {e}")
+    return rendered
+
+
+def mark_reminders_sent(appointment_ids):
+    with db_connection() as (conn, cursor):
+        cursor.execute("UPDATE appointments SET reminder_sent = TRUE WHERE id = ANY(%s)", (appointment_ids,))
+
+
+def send_due_reminders(mail, day=None, chunk_size=REMINDER_CHUNK_SIZE):
     """
-    Background worker that checks for upcoming appointments 
-    and sends email reminders. Runs every hour.
+    Send every reminder due for `day` (default: tomorrow) over one SMTP
+    connection, in chunks of `chunk_size`. Each chunk's delivered appointments
+    are flagged with a single UPDATE. Returns the run's metrics.
     """
-    with app.app_context():
-        print("[ReminderService] Background worker started.")
-        while True:
+    day = day or (datetime.now() + timedelta(days=1)).date()
+    started = time.perf_counter()
+    rendered = render_reminders(fetch_due_reminders(day))
+    if rendered:
+        print(f"[ReminderService] Found {len(rendered)} appointments for {day}.")
+
+    sent = failed = chunks = 0
+    with SMTPSession(mail) as smtp:
+        for start in range(0, len(rendered), chunk_size):
             try:
-                # Find all appointments for tomorrow that haven't been notified yet
-                tomorrow = (datetime.now() + timedelta(days=1)).date()
-                
-                conn = get_db_connection()
-                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                
-                # Check for "near" appointments (tomorrow)
-                # Filter by status = 'confirmed' or 'pending'
-                cursor.execute("""
-                    SELECT a.id, a.appointment_date, a.appointment_time, a.service_type, u.first_name, u.email
-                    FROM appointments a
-                    JOIN users u ON a.user_id = u.id
-                    WHERE a.appointment_date = %s
-                      AND a.reminder_sent = FALSE
-                      AND a.status NOT IN ('cancelled', 'completed')
-                """, (tomorrow,))
-                
-                to_remind = cursor.fetchall()
-                
-                if to_remind:
-                    print(f"[ReminderService] Found {len(to_remind)} appointments for tomorrow.")
-                
-                for apt in to_remind:
-                    try:
-                        # Format date and time for better display
-                        display_date = apt['appointment_date'].strftime('%B %d, %Y')
-                        
-                        raw_time = apt['appointment_time']
-                        # Handle both string and time objects
-                        if isinstance(raw_time, str):
-                            try:
-                                # try HH:MM or HH:MM:SS
-                                t = datetime.strptime(raw_time, '%H:%M:%S').time()
-                                display_time = t.strftime('%I:%M %p')
-                            except:
-                                try:
-                                    t = datetime.strptime(raw_time, '%H:%M').time()
-                                    display_time = t.strftime('%I:%M %p')
-                                except:
-                                    display_time = raw_time
-                        else:
-                            display_time = raw_time.strftime('%I:%M %p')
-
-                        if apt['email']:
-                            send_appointment_reminder_email(
-                                mail, 
-                                apt['email'], 
-                                apt['first_name'], 
-                                display_date, 
-                                display_time, 
-                                apt['service_type']
-                            )
-                            
-                            # Mark as sent
-                            cursor.execute("UPDATE appointments SET reminder_sent = TRUE WHERE id = %s", (apt['id'],))
-                            conn.commit()
-                            print(f"[ReminderService] Reminder sent to {apt['email']} for appointment #{apt['id']}")
-                    
-                    except Exception as e:
-                        print(f"[ReminderService] Error sending to {apt['email'] or 'unknown'}: {e}")
-                
-                cursor.close()
-                conn.close()
-            
+                smtp.open()
             except Exception as e:
-                print(f"[ReminderService] Loop error: {e}")
-            
-            # Wait 1 hour (3600 seconds) before checking again
-            time.sleep(3600)
-
-def start_reminder_service(app, mail):
-    """Initializes and starts the reminder background thread"""
-    thread = Thread(target=check_reminders, args=(app, mail))
-    thread.daemon = True
-    thread.start()
-    return thread
+                # Mail server unreachable: everything left stays unsent for the next run
+                print(f"[ReminderService] SMTP connection failed, {len(rendered) - start} reminders deferred: {e}")
+                failed += len(rendered) - start
+                break
+
+            sent_ids = []
+            for apt_id, email, msg in rendered[start:start + chunk_size]:
+                try:
+                    smtp.send(msg)
+                    sent_ids.append(apt_id)
+                except Exception as e:
+                    failed += 1
+                    print(f"[ReminderService] Error sending to {email}: {e}")
+            if sent_ids:
+                mark_reminders_sent(sent_ids)
+                sent += len(sent_ids)
+            chunks += 1
+
+    elapsed = time.perf_counter() - started
+    run = {
+        'date': day.isoformat(),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'due': len(rendered),
+        'sent': sent,
+        'failed': failed,
+        'chunks': chunks,
+        'smtp_connections': smtp.connections,
+        'elapsed_s': round(elapsed, 3),
+        'messages_per_sec': round(sent / elapsed, 1) if sent and elapsed > 0 else 0.0,
+    }
+    with _stats_lock:
+        _stats['runs'] += 1
+        _stats['sent'] += sent
+        _stats['failed'] += failed
+        _stats['last_run'] = run
+    if rendered:
+        print(f"[ReminderService] Sent {sent}/{len(rendered)} reminders in {elapsed:.2f}s "
+              f"({run['messages_per_sec']} msg/s, {smtp.connections} SMTP connection(s))")
+    return run
+
+
+def reminder_stats():
+    """Totals since startup plus the last run's metrics"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def start_reminder_service(app, mail, interval=REMINDER_INTERVAL):
+    """
+    Start this process's reminder scheduler thread. Every app process may call
+    this; the advisory lock in scheduler.py makes sure only one of them sends
+    reminders each interval.
+    """
+    job = ScheduledJob('appointment_reminders', REMINDER_LOCK_ID, interval,
+                       lambda: send_due_reminders(mail), app=app)
+    return job.start()
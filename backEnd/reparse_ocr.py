@@ -0,0 +1,78 @@
+# pyre-ignore-all-errors
+"""
+Re-parse archived OCR text with the current PHIDParser (offline, no OCR.space).
+
+    python reparse_ocr.py archive/ocr_dumps -o reparsed.jsonl
+    python reparse_ocr.py dump1.txt records.jsonl --workers 8 --id-type "PhilHealth ID"
+
+Inputs are files or directories (searched recursively):
+  *.txt    ocr_last_run.txt style dumps ("EXPECTED ID TYPE: ..." header + OCR text)
+  *.jsonl  one {"id": ..., "id_type": ..., "text": ...} object per line
+
+Writes one JSON line per record ({"id", "fields", "confidence", "parse_ms"} or
+{"id", "error"}) to --output or stdout; throughput stats go to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+
+from ocr_parser import BatchStats, parse_batch, split_ocr_dump  # type: ignore
+
+
+def iter_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(('.txt', '.jsonl')):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_records(paths, default_id_type=None):
+    """Yield parser records lazily so huge archives never sit in memory."""
+    for path in iter_paths(paths):
+        if path.endswith('.jsonl'):
+            with open(path, encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    record.setdefault('id', f"{path}:{line_no}")
+                    if not record.get('id_type'):
+                        record['id_type'] = default_id_type
+                    yield record
+        else:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                id_type, text = split_ocr_dump(f.read())
+            yield {'id': path, 'id_type': id_type or default_id_type, 'text': text}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='dump files, .jsonl files or directories')
+    parser.add_argument('-o', '--output', help='JSONL output file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count, 0 = in-process)')
+    parser.add_argument('--chunksize', type=int, default=32, help='records sent to a worker at a time')
+    parser.add_argument('--id-type', help='ID type for records that do not specify one')
+    args = parser.parse_args()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    stats = BatchStats()
+    try:
+        for result in parse_batch(iter_records(args.inputs, args.id_type), workers=args.workers,
+                                  chunksize=args.chunksize, stats=stats):
+            out.write(json.dumps(result) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary = stats.to_dict()
+    print(f"Parsed {summary['records']} records ({summary['errors']} errors) in {summary['elapsed_s']:.2f}s: "
+          f"{summary['ids_per_sec'] or 0:.0f} IDs/sec, {summary['mean_parse_ms'] or 0:.3f} ms mean parse", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
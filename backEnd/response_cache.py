@@ -0,0 +1,169 @@
+# pyre-ignore-all-errors
+"""
+Cached GET responses for the admin dashboard endpoints.
+
+    @app.route("/api/admin/stats", methods=["GET"])
+    @response_cache.cached(ttl=15, stale=60)
+    def get_admin_stats(): ...
+
+Responses are keyed on endpoint, path, query args and the X-User-Role
+header. Within `ttl` seconds a cached 200 is served as-is; for `stale`
+seconds after that it is still served, while one background thread
+re-runs the view to refresh it (stale-while-revalidate). Concurrent misses
+for the same key wait for a single computation. Every cached response
+carries an ETag, and If-None-Match gets a 304 with no body.
+
+    RESPONSE_CACHE_ENABLED=1   0 turns the decorator into a pass-through
+    RESPONSE_CACHE_SIZE=256    cached responses kept (LRU)
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+
+from flask import Response, current_app, make_response, request  # type: ignore
+
+from ttl_cache import TTLCache  # type: ignore
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+
+ROLE_HEADER = 'X-User-Role'
+
+
+class ResponseCache:
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, enabled=RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.entries = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._filling = {}       # key -> Lock held while one request computes a miss
+        self._refreshing = set()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'not_modified': 0,
+                       'refreshes': 0, 'refresh_errors': 0, 'uncacheable': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _key():
+        role = (request.headers.get(ROLE_HEADER) or '').strip().lower()
+        return (request.endpoint, request.path, tuple(sorted(request.args.items(multi=True))), role)
+
+    @staticmethod
+    def _entry(response, ttl):
+        body = response.get_data()
+        now = time.monotonic()
+        return {
+            'body': body,
+            'status': response.status_code,
+            'mimetype': response.mimetype,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'stored_at': now,
+            'fresh_until': now + ttl,
+        }
+
+    def _store(self, key, response, ttl, stale):
+        """Cache a 200 response; returns the entry, or None if it isn't cacheable."""
+        if response.status_code != 200 or response.direct_passthrough:
+            return None
+        entry = self._entry(response, ttl)
+        self.entries.set(key, entry, ttl=ttl + stale)
+        return entry
+
+    def cached(self, ttl, stale=0):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = self._key()
+                entry = self.entries.get(key)
+                if entry is None:
+                    entry, response = self._fill(key, view, args, kwargs, ttl, stale)
+                    if entry is None:
+                        self._count('uncacheable')
+                        return response
+                    # No response means another request filled it while we waited
+                    state = 'MISS' if response is not None else 'HIT'
+                elif entry['fresh_until'] > time.monotonic():
+                    self._count('hits')
+                    state = 'HIT'
+                else:
+                    self._count('stale_hits')
+                    state = 'STALE'
+                    self._refresh_async(key, view, args, kwargs, ttl, stale)
+                return self._respond(entry, state)
+            return wrapper
+        return decorator
+
+    def _fill(self, key, view, args, kwargs, ttl, stale):
+        """Compute a miss once, even when several requests for the key arrive together."""
+        with self._lock:
+            lock = self._filling.setdefault(key, threading.Lock())
+        with lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry, None
+            self._count('misses')
+            try:
+                response = make_response(view(*args, **kwargs))
+                return self._store(key, response, ttl, stale), response
+            finally:
+                with self._lock:
+                    self._filling.pop(key, None)
+
+    def _refresh_async(self, key, view, args, kwargs, ttl, stale):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        app = current_app._get_current_object()
+        path, query_string = request.path, request.query_string
+        headers = {ROLE_HEADER: request.headers[ROLE_HEADER]} if ROLE_HEADER in request.headers else {}
+
+        def refresh():
+            try:
+                with app.test_request_context(path, query_string=query_string, headers=headers):
+                    response = make_response(view(*args, **kwargs))
+                    if self._store(key, response, ttl, stale) is None:
+                        # Keep serving the stale copy rather than caching an error
+                        self._count('refresh_errors')
+                    else:
+                        self._count('refreshes')
+            except Exception as e:
+                print(f"[ResponseCache] Refresh of {path} failed: {e}")
+                self._count('refresh_errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='response-cache-refresh', daemon=True).start()
+
+    def _respond(self, entry, state):
+        response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        # Browsers revalidate every poll; unchanged payloads come back as bodiless 304s
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['Vary'] = ROLE_HEADER
+        response.headers['Age'] = str(int(time.monotonic() - entry['stored_at']))
+        response.headers['X-Cache'] = state
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self._count('not_modified')
+        return response
+
+    def invalidate(self, endpoint=None):
+        """Drop cached responses for one endpoint (view function name), or all of them."""
+        return self.entries.invalidate_where(lambda key: endpoint is None or key[0] == endpoint)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['refreshing'] = len(self._refreshing)
+        stats['enabled'] = self.enabled
+        stats['size'] = len(self.entries)
+        stats['maxsize'] = self.entries.maxsize
+        return stats
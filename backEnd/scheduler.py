@@ -0,0 +1,179 @@
+# pyre-ignore-all-errors
+"""
+Periodic background jobs that run in exactly one app process at a time.
+
+Every process (gunicorn worker, dev server, ...) starts the same
+ScheduledJob thread, which wakes every poll interval and tries to become the
+leader for that tick:
+
+  1. pg_try_advisory_xact_lock(SCHEDULER_LOCK_CLASS, lock_id) - whoever gets
+     it runs the job; everyone else skips the tick. The lock is
+     transaction-scoped, so it is released on commit, rollback or if the
+     process dies, and never leaks on a pooled connection.
+  2. The job's row in scheduler_jobs says when it is next due, so the job runs
+     once per interval across the whole deployment, not once per process.
+
+The row also carries the last run's status/result for the admin status
+endpoints.
+"""
+import os
+import socket
+import threading
+from datetime import datetime
+
+import psycopg2.extras  # type: ignore
+
+from database import db_connection  # type: ignore
+
+# First key of every job's advisory lock ("bhcr"); the second key is the job's lock_id
+SCHEDULER_LOCK_CLASS = 0x62686372
+# How often each process checks whether a job is due
+SCHEDULER_POLL_INTERVAL = float(os.getenv('SCHEDULER_POLL_INTERVAL', '60'))
+
+
+def _iso(value):
+    return value.isoformat(timespec='seconds') if value else None
+
+
+class ScheduledJob:
+    def __init__(self, name, lock_id, interval, fn, app=None, poll_interval=SCHEDULER_POLL_INTERVAL):
+        self.name = name
+        self.lock_id = lock_id
+        self.interval = interval
+        self.fn = fn
+        self.app = app
+        self.poll_interval = min(poll_interval, interval)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'ticks': 0, 'runs': 0, 'errors': 0, 'skipped_locked': 0, 'skipped_not_due': 0,
+                       'last_tick_at': None}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'scheduler-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self.app is not None:
+            with self.app.app_context():
+                self._loop()
+        else:
+            self._loop()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[Scheduler] {self.name} tick failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _ensure_row(self, cur):
+        cur.execute("""
+            INSERT INTO scheduler_jobs (name, next_run_at) VALUES (%s, NOW())
+            ON CONFLICT (name) DO NOTHING
+        """, (self.name,))
+
+    def tick(self):
+        """Run the job if this process wins the lock and it is due; returns its result or None."""
+        with self._lock:
+            self._stats['ticks'] += 1
+            self._stats['last_tick_at'] = datetime.now().isoformat(timespec='seconds')
+
+        # Committed up front so the "running" marker below can see the row
+        with db_connection() as (conn, cur):
+            self._ensure_row(cur)
+
+        with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s, %s) AS locked", (SCHEDULER_LOCK_CLASS, self.lock_id))
+            if not cur.fetchone()['locked']:
+                self._count('skipped_locked')
+                return None
+            cur.execute("SELECT next_run_at <= NOW() AS due FROM scheduler_jobs WHERE name = %s", (self.name,))
+            if not cur.fetchone()['due']:
+                self._count('skipped_not_due')
+                return None
+
+            self._mark_running()
+            result, error = None, None
+            try:
+                result = self.fn()
+            except Exception as e:
+                error = str(e)
+                print(f"[Scheduler] {self.name} failed: {e}")
+                self._count('errors')
+            self._count('runs')
+
+            # NOW() is the transaction start, i.e. when this run began, so the cadence doesn't drift
+            cur.execute("""
+                UPDATE scheduler_jobs
+                SET last_finished_at = CLOCK_TIMESTAMP(), last_status = %s, last_result = %s,
+                    last_error = %s, next_run_at = NOW() + %s * INTERVAL '1 second'
+                WHERE name = %s
+            """, ('error' if error else 'ok', psycopg2.extras.Json(result), error, self.interval, self.name))
+        return result
+
+    def _mark_running(self):
+        with db_connection() as (conn, cur):
+            cur.execute("""
+                UPDATE scheduler_jobs SET last_started_at = NOW(), last_status = 'running', holder = %s
+                WHERE name = %s
+            """, (self.holder, self.name))
+
+    def run_now(self):
+        """Make the job due immediately; the next process to tick runs it."""
+        with db_connection() as (conn, cur):
+            self._ensure_row(cur)
+            cur.execute("UPDATE scheduler_jobs SET next_run_at = NOW() WHERE name = %s", (self.name,))
+        self._wake.set()
+
+    def status(self):
+        """Deployment-wide schedule (from scheduler_jobs) plus this process's counters."""
+        with db_connection(psycopg2.extras.RealDictCursor) as (conn, cur):
+            cur.execute("""
+                SELECT next_run_at, last_started_at, last_finished_at, last_status, last_result, last_error, holder
+                FROM scheduler_jobs WHERE name = %s
+            """, (self.name,))
+            row = cur.fetchone() or {}
+            # Whoever holds the advisory lock right now is mid-run
+            cur.execute("""
+                SELECT pid FROM pg_locks
+                WHERE locktype = 'advisory' AND granted
+                  AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+                  AND classid = %s::bigint::oid AND objid = %s::bigint::oid AND objsubid = 2
+            """, (SCHEDULER_LOCK_CLASS, self.lock_id))
+            lock = cur.fetchone()
+        with self._lock:
+            process = dict(self._stats)
+        process.update({
+            'holder': self.holder,
+            'thread_alive': bool(self._thread and self._thread.is_alive()),
+            'poll_interval_s': self.poll_interval,
+        })
+        return {
+            'name': self.name,
+            'interval_s': self.interval,
+            'running': lock is not None,
+            'next_run_at': _iso(row.get('next_run_at')),
+            'last_started_at': _iso(row.get('last_started_at')),
+            'last_finished_at': _iso(row.get('last_finished_at')),
+            'last_status': row.get('last_status'),
+            'last_result': row.get('last_result'),
+            'last_error': row.get('last_error'),
+            'last_holder': row.get('holder'),
+            'process': process,
+        }
@@ -1,7 +1,14 @@
 from flask import Blueprint, jsonify, request
 from database import get_db_connection
+from live_events import live_hub, notify_appointment_change
 import psycopg2.extras
 from datetime import datetime
+import os
+from wait_estimator import wait_estimator
+
+# Expected wait (minutes) from which the board shows BUSY / MODERATE
+WAIT_BUSY_MINUTES = int(os.getenv('WAIT_BUSY_MINUTES', '45'))
+WAIT_MODERATE_MINUTES = int(os.getenv('WAIT_MODERATE_MINUTES', '15'))
 
 security_bp = Blueprint('security', __name__)
 
@@ -80,79 +87,107 @@ def check_in_appointment(appointment_id):
         
         today = datetime.now().date()
         
-        # Get next queue number for today
-        cursor.execute("""
-            SELECT COALESCE(MAX(queue_number), 0) + 1 
-            FROM appointments 
-            WHERE appointment_date = %s
-        """, (today,))
-        next_queue = cursor.fetchone()[0]
-        
+        # Take the next number from today's counter and assign it in one statement.
+        # The counter row is locked only until commit, so concurrent kiosks never
+        # share a number; a rolled-back check-in may leave a gap.
         cursor.execute("""
+            WITH next AS (
+                INSERT INTO queue_counters (day, last_number) VALUES (%s, 1)
+                ON CONFLICT (day) DO UPDATE SET last_number = queue_counters.last_number + 1
+                RETURNING last_number
+            )
             UPDATE appointments 
-            SET status = 'waiting', queue_number = %s 
+            SET status = 'waiting', queue_number = (SELECT last_number FROM next) 
             WHERE id = %s
-            RETURNING id
-        """, (next_queue, appointment_id))
+            RETURNING id, appointment_date, queue_number
+        """, (today, appointment_id))
         
-        if not cursor.fetchone():
+        checked_in = cursor.fetchone()
+        if not checked_in:
             return jsonify({"error": "Appointment not found"}), 404
+        change = notify_appointment_change(cursor, appointment_id, checked_in[1], event='check_in')
             
         conn.commit()
+        live_hub.dispatch(change)
         cursor.close()
         conn.close()
         
-        return jsonify({"message": "Checked in successfully", "queue_number": next_queue}), 200
+        return jsonify({"message": "Checked in successfully", "queue_number": checked_in[2]}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def opening_hours(cursor, day):
+    """(opening, closing) datetimes on `day` from the active schedule slots; (None, None) when closed"""
+    cursor.execute("""
+        SELECT MIN(start_time) AS opening, MAX(end_time) AS closing FROM schedule_slots
+        WHERE day_of_week = %s AND is_active = true
+    """, (day.weekday(),))
+    hours = cursor.fetchone()
+    if hours['opening'] is None:
+        return None, None
+    return datetime.combine(day, hours['opening']), datetime.combine(day, hours['closing'])
+
+def fetch_center_status(cursor, day):
+    """Summarized status for public display on `day`, with waits from wait_estimator"""
+    estimate = wait_estimator.estimate(cursor, day)
+    expected_wait = estimate['next_wait_minutes']
+    opening, closing = opening_hours(cursor, day)
+    now = datetime.now()
+
+    # Minutes the desks can still give to new patients before closing
+    minutes_left = (closing - max(now, opening)).total_seconds() / 60 if closing else 0
+    open_desk_minutes = sum(max(0, minutes_left - busy) for busy in estimate['free_at'])
+    remaining_slots = int(open_desk_minutes // wait_estimator.duration())
+
+    status_label = "OPEN"
+    color = "green"
+    message = "Low waiting time"
+
+    if minutes_left <= 0:
+        status_label = "CLOSED"
+        color = "gray"
+        message = "Closed for today"
+    elif expected_wait >= minutes_left:
+        status_label = "FULL"
+        color = "red"
+        message = "We are at full capacity for today"
+    elif expected_wait >= WAIT_BUSY_MINUTES:
+        status_label = "BUSY"
+        color = "orange"
+        message = f"High volume of patients (~{expected_wait} mins)"
+    elif expected_wait >= WAIT_MODERATE_MINUTES:
+        status_label = "MODERATE"
+        color = "yellow"
+        message = f"Moderate wait (~{expected_wait} mins)"
+
+    return {
+        "status": status_label,
+        "color": color,
+        "message": message,
+        "waiting_count": estimate['waiting_count'],
+        "serving_count": estimate['serving_count'],
+        "remaining_slots": remaining_slots,
+        "expected_wait_minutes": expected_wait,
+        # Checked-in patients in serving order; queue numbers only, no names on the public board
+        "etas": estimate['etas']
+    }
+
+
+live_hub.topic('center-status', fetch_center_status)
+
+
 @security_bp.route('/api/center-status', methods=['GET'])
 def get_center_status():
     """Get summarized status for public display"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        today = datetime.now().date()
-        
-        # 1. Waiting count
-        cursor.execute("SELECT COUNT(id) as count FROM appointments WHERE status = 'waiting' AND appointment_date = %s", (today,))
-        waiting_count = cursor.fetchone()['count']
-        
-        # 2. Daily capacity (Assume 50 slots per day base on schedule_slots x services)
-        # For simplicity, let's say max is 40
-        max_capacity = 40
-        cursor.execute("SELECT COUNT(id) as count FROM appointments WHERE appointment_date = %s", (today,))
-        total_booked = cursor.fetchone()['count']
-        
-        occupancy_rate = (total_booked / max_capacity) * 100 if max_capacity > 0 else 0
-        
-        status_label = "OPEN"
-        color = "green"
-        message = "Low waiting time"
-        
-        if occupancy_rate >= 95:
-            status_label = "FULL"
-            color = "red"
-            message = "We are at full capacity for today"
-        elif occupancy_rate >= 75:
-            status_label = "BUSY"
-            color = "orange"
-            message = "High volume of patients"
-        elif waiting_count > 5:
-            status_label = "MODERATE"
-            color = "yellow"
-            message = f"Moderate wait (~{waiting_count * 10} mins)"
-
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "status": status_label,
-            "color": color,
-            "message": message,
-            "waiting_count": waiting_count,
-            "remaining_slots": max(0, max_capacity - total_booked)
-        }), 200
+        # Shared by every viewer until an appointment changes (or WAIT_CACHE_TTL)
+        status = wait_estimator.board(fetch_center_status, datetime.now().date())
+        return jsonify(status), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@security_bp.route('/api/center-status/stream', methods=['GET'])
+def stream_center_status():
+    """Center status as Server-Sent Events: a snapshot, then changed fields"""
+    return live_hub.stream('center-status')
@@ -0,0 +1,287 @@
+# pyre-ignore-all-errors
+"""
+Expected waits for the public center-status board.
+
+How long each service takes is learned from appointment_status_events: the
+time from 'serving' to 'completed', folded into an exponentially weighted
+moving average per service type (and one across all services) so recent
+visits count most. Until a service has such samples, its typical visit
+length from visit_logs (entry to exit on the day of a completed appointment,
+wait included) stands in, then services.duration_minutes, then
+WAIT_DEFAULT_MINUTES. History is read once; after that each estimate folds
+in only the completions recorded since. Event ids are handed out before
+their transactions commit, so a lower id can appear after a higher one has
+been read: each pass re-reads the ids of the last WAIT_LEARN_OVERLAP seconds
+and skips completions it has already learned.
+
+estimate() plays today's queue forward: desks busy with a patient free up
+when that service's expected length has passed, then checked-in patients
+('waiting') are served in priority order (verified pregnant, verified PWD,
+pregnant, queue number), each at the first free desk. That gives every
+waiting patient an ETA and the wait for whoever checks in next.
+
+board() serves the public payload from a short-lived cache that appointment
+changes clear (through live_events), so any number of lobby screens cost
+one computation per change.
+
+    WAIT_DESKS=1                   desks assumed open (more while more patients are being served)
+    WAIT_EWMA_ALPHA=0.2            weight of each new completion
+    WAIT_DEFAULT_MINUTES=15
+    WAIT_HISTORY_DAYS=60
+    WAIT_MAX_SERVICE_MINUTES=180   longer serving->completed spans are ignored (forgotten clicks)
+    WAIT_CACHE_TTL=30              seconds; ETAs move with the clock even without changes
+    WAIT_LEARN_OVERLAP=300         seconds an event's transaction may take to commit and still be learned
+"""
+import heapq
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+
+from psycopg2.extras import RealDictCursor  # type: ignore
+
+from database import db_connection  # type: ignore
+from live_events import live_hub, touches_today  # type: ignore
+from ttl_cache import TTLCache  # type: ignore
+
+WAIT_DESKS = int(os.getenv('WAIT_DESKS', '1'))
+WAIT_EWMA_ALPHA = float(os.getenv('WAIT_EWMA_ALPHA', '0.2'))
+WAIT_DEFAULT_MINUTES = float(os.getenv('WAIT_DEFAULT_MINUTES', '15'))
+WAIT_HISTORY_DAYS = int(os.getenv('WAIT_HISTORY_DAYS', '60'))
+WAIT_MAX_SERVICE_MINUTES = float(os.getenv('WAIT_MAX_SERVICE_MINUTES', '180'))
+WAIT_CACHE_TTL = float(os.getenv('WAIT_CACHE_TTL', '30'))
+WAIT_LEARN_OVERLAP = float(os.getenv('WAIT_LEARN_OVERLAP', '300'))
+
+ALL_SERVICES = '*'
+# A patient being served past the expected length is assumed to be nearly done
+MIN_REMAINING_MINUTES = 1.0
+
+# serving -> completed spans, in order of completion
+COMPLETIONS_QUERY = """
+    SELECT c.id, a.service_type, EXTRACT(EPOCH FROM c.changed_at - s.changed_at) / 60 AS minutes
+    FROM appointment_status_events c
+    JOIN appointments a ON a.id = c.appointment_id
+    JOIN LATERAL (
+        SELECT e.changed_at FROM appointment_status_events e
+        WHERE e.appointment_id = c.appointment_id AND e.status = 'serving' AND e.changed_at <= c.changed_at
+        ORDER BY e.changed_at DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE c.status = 'completed' AND c.id > %(after)s AND c.id <= %(until)s AND c.changed_at >= %(since)s
+    ORDER BY c.id
+"""
+
+# Median visit length per service, from entry/exit logs of patients with a completed appointment that day
+VISIT_PRIORS_QUERY = """
+    SELECT COALESCE(a.service_type, '') AS service_type,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM x.exit_at - v."timestamp") / 60) AS minutes,
+           GROUPING(a.service_type) AS overall
+    FROM visit_logs v
+    JOIN LATERAL (
+        SELECT MIN(x."timestamp") AS exit_at FROM visit_logs x
+        WHERE x.user_id = v.user_id AND x.type = 'exit'
+          AND x."timestamp" > v."timestamp" AND x."timestamp"::date = v."timestamp"::date
+    ) x ON x.exit_at IS NOT NULL
+    JOIN appointments a
+      ON a.user_id = v.user_id AND a.appointment_date = v."timestamp"::date AND a.status = 'completed'
+    WHERE v.type = 'entry' AND v.user_id IS NOT NULL AND v."timestamp" >= %(since)s
+      AND x.exit_at - v."timestamp" <= %(max_span)s
+    GROUP BY ROLLUP (a.service_type)
+"""
+
+ACTIVE_QUERY = """
+    SELECT a.id, a.service_type, a.status, a.queue_number, a.is_pregnant,
+           COALESCE(a.staff_verified_pregnant, false) AS staff_verified_pregnant,
+           COALESCE(a.staff_verified_pwd, false) AS staff_verified_pwd,
+           (SELECT EXTRACT(EPOCH FROM LOCALTIMESTAMP - MAX(e.changed_at)) / 60
+            FROM appointment_status_events e
+            WHERE e.appointment_id = a.id AND e.status = 'serving') AS serving_minutes
+    FROM appointments a
+    WHERE a.appointment_date = %s AND a.status IN ('waiting', 'serving')
+"""
+
+
+def service_key(service_type):
+    return (service_type or '').strip().lower()
+
+
+def serving_order(row):
+    pregnant = {True: 0, False: 1}.get(row['is_pregnant'], 2)
+    return (not row['staff_verified_pregnant'], not row['staff_verified_pwd'], pregnant,
+            row['queue_number'] is None, row['queue_number'] or 0, row['id'])
+
+
+class WaitEstimator:
+    def __init__(self, desks=WAIT_DESKS, alpha=WAIT_EWMA_ALPHA, default_minutes=WAIT_DEFAULT_MINUTES,
+                 history_days=WAIT_HISTORY_DAYS, max_minutes=WAIT_MAX_SERVICE_MINUTES, cache_ttl=WAIT_CACHE_TTL,
+                 learn_overlap=WAIT_LEARN_OVERLAP):
+        self.desks = max(1, desks)
+        self.alpha = alpha
+        self.default_minutes = default_minutes
+        self.history_days = history_days
+        self.max_minutes = max_minutes
+        self.learn_overlap = learn_overlap
+        self.durations = {}          # service_key -> expected minutes
+        self.samples = Counter()     # service_key -> completions learned from
+        self.cache = TTLCache(maxsize=8, ttl=cache_ttl)
+        self._floor = None           # events up to this id are settled; None until history has been read
+        self._marks = deque()        # (monotonic time, highest event id read then), newest last
+        self._learned = set()        # completion ids above _floor already folded in
+        self._generation = 0         # bumped by every change, so a stale result is never cached
+        self._lock = threading.RLock()       # in-memory state only; never held across a query
+        self._learn_lock = threading.Lock()  # one learn() reads the database at a time
+        self._fill_lock = threading.Lock()
+        self._stats = {'computations': 0, 'cache_hits': 0, 'completions_learned': 0}
+
+    # Learning
+
+    def duration(self, service_type=None):
+        """Expected minutes for a service (None: across all services)."""
+        key = ALL_SERVICES if service_type is None else service_key(service_type)
+        return self.durations.get(key) or self.durations.get(ALL_SERVICES) or self.default_minutes
+
+    def _observe(self, key, minutes):
+        if self.samples[key] == 0:
+            # The visit-length prior includes waiting; the first real sample replaces it
+            self.durations[key] = minutes
+        else:
+            self.durations[key] += self.alpha * (minutes - self.durations[key])
+        self.samples[key] += 1
+
+    def learn(self, cursor):
+        """Fold completions recorded since the last call into the averages (all history on the first call)."""
+        # One pass at a time reads the database (without _lock); _lock only guards folding the rows in
+        with self._learn_lock:
+            with self._lock:
+                floor = self._floor
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM appointment_status_events")
+            until = cursor.fetchone()['id']
+            since = datetime.now() - timedelta(days=self.history_days)
+            priors = services = None
+            if floor is None:
+                cursor.execute(VISIT_PRIORS_QUERY, {'since': since, 'max_span': timedelta(hours=12)})
+                priors = cursor.fetchall()
+                cursor.execute("SELECT name, duration_minutes FROM services WHERE duration_minutes > 0")
+                services = cursor.fetchall()
+                # Events older than the overlap are settled; newer ones are re-read for a while
+                cursor.execute("""
+                    SELECT COALESCE(MAX(id), 0) AS id FROM appointment_status_events
+                    WHERE changed_at < LOCALTIMESTAMP - %s * INTERVAL '1 second'
+                """, (self.learn_overlap,))
+                floor = cursor.fetchone()['id']
+                after = 0
+            else:
+                after = floor
+            rows = []
+            if until > after:
+                cursor.execute(COMPLETIONS_QUERY, {'after': after, 'until': until, 'since': since})
+                rows = cursor.fetchall()
+
+            with self._lock:
+                if priors is not None:
+                    for row in priors:
+                        key = ALL_SERVICES if row['overall'] else service_key(row['service_type'])
+                        if row['minutes'] and key not in self.durations:
+                            self.durations[key] = float(row['minutes'])
+                    for row in services:
+                        self.durations.setdefault(service_key(row['name']), float(row['duration_minutes']))
+                    self._floor = floor
+                for row in rows:
+                    if row['id'] in self._learned:
+                        continue
+                    if row['id'] > self._floor:
+                        self._learned.add(row['id'])
+                    minutes = float(row['minutes'])
+                    if 0 < minutes <= self.max_minutes:
+                        self._observe(service_key(row['service_type']), minutes)
+                        self._observe(ALL_SERVICES, minutes)
+                        self._stats['completions_learned'] += 1
+
+                # Ids read more than learn_overlap ago have had time to commit: stop re-reading them
+                now = time.monotonic()
+                self._marks.append((now, until))
+                while self._marks and now - self._marks[0][0] >= self.learn_overlap:
+                    self._floor = max(self._floor, self._marks.popleft()[1])
+                self._learned = {event_id for event_id in self._learned if event_id > self._floor}
+
+    # Estimates
+
+    def estimate(self, cursor, day):
+        """Desks, per-patient ETAs and the wait for the next check-in on `day` (a RealDictCursor)."""
+        self.learn(cursor)
+        cursor.execute(ACTIVE_QUERY, (day,))
+        rows = cursor.fetchall()
+        with self._lock:
+            serving = [row for row in rows if row['status'] == 'serving']
+            waiting = sorted((row for row in rows if row['status'] == 'waiting'), key=serving_order)
+            desks = max(self.desks, len(serving))
+
+            # Minutes from now until each desk is free
+            free_at = [max(self.duration(row['service_type']) - float(row['serving_minutes'] or 0),
+                           MIN_REMAINING_MINUTES) for row in serving]
+            free_at += [0.0] * (desks - len(serving))
+            heapq.heapify(free_at)
+
+            etas = []
+            for position, row in enumerate(waiting, 1):
+                start = heapq.heappop(free_at)
+                etas.append({'position': position, 'queue_number': row['queue_number'],
+                             'service_type': row['service_type'], 'eta_minutes': round(start)})
+                heapq.heappush(free_at, start + self.duration(row['service_type']))
+            self._stats['computations'] += 1
+
+        return {
+            'desks': desks,
+            'serving_count': len(serving),
+            'waiting_count': len(waiting),
+            'next_wait_minutes': round(free_at[0]),
+            'free_at': sorted(free_at),
+            'etas': etas,
+        }
+
+    # Cached board
+
+    def on_change(self, change):
+        """live_events callback: today's board is out of date."""
+        if change is None or touches_today(change):
+            with self._lock:
+                self._generation += 1
+                self.cache.clear()
+
+    def board(self, build, day=None):
+        """build(cursor, day) for the public board, computed once per change (or WAIT_CACHE_TTL)."""
+        day = day or date.today()
+        payload = self.cache.get(day)
+        if payload is not None:
+            self._count('cache_hits')
+            return payload
+        # One viewer computes; the others wait for its result
+        with self._fill_lock:
+            payload = self.cache.get(day)
+            if payload is not None:
+                self._count('cache_hits')
+                return payload
+            generation = self._generation
+            with db_connection(RealDictCursor) as (conn, cur):
+                payload = build(cur, day)
+            with self._lock:
+                if generation == self._generation:
+                    self.cache.set(day, payload)
+            return payload
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['desks'] = self.desks
+            stats['minutes_by_service'] = {key: round(value, 1) for key, value in sorted(self.durations.items())}
+            stats['samples_by_service'] = dict(self.samples)
+        return stats
+
+
+wait_estimator = WaitEstimator()
+live_hub.on_change(wait_estimator.on_change)
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import AppointmentCalendar from './components/AppointmentCalendar';
 import { formatSystemTime } from './utils/dateFormatter';
+import { applyQueueDelta, QueueDelta, subscribeLive } from './utils/liveStream';
 import {
     Box,
     Flex,
@@ -167,8 +168,17 @@ const MedicalStaffDashboard: React.FC<MedicalStaffDashboardProps> = ({ onLogout
         fetchQueue();
         fetchServices();
         fetchPatients();
-        const interval = setInterval(fetchQueue, 30000); // Poll every 30s
-        return () => clearInterval(interval);
+        // Queue changes are pushed; poll every 30s only if the stream is unavailable
+        let interval: ReturnType<typeof setInterval> | undefined;
+        const unsubscribe = subscribeLive<any[], QueueDelta<any>>('/api/queue/stream', {
+            onSnapshot: setQueue,
+            onDelta: (delta) => setQueue(prev => applyQueueDelta(prev, delta)),
+            onUnavailable: () => { interval = interval ?? setInterval(fetchQueue, 30000); },
+        });
+        return () => {
+            unsubscribe();
+            if (interval) clearInterval(interval);
+        };
     }, []);
 
     // PSGC Initial Load
@@ -9,7 +9,8 @@ import {
     Tooltip,
     Flex,
 } from '@chakra-ui/react';
-import { FiUsers, FiActivity } from 'react-icons/fi';
+import { FiUsers, FiActivity, FiClock } from 'react-icons/fi';
+import { subscribeLive } from '../utils/liveStream';
 
 const HealthCenterStatus: React.FC = () => {
     const [statusData, setStatusData] = useState<any>(null);
@@ -30,14 +31,29 @@ const HealthCenterStatus: React.FC = () => {
             }
         };
 
-        fetchStatus();
-        const interval = setInterval(fetchStatus, 30000); // 30 sec updates
-        return () => clearInterval(interval);
+        // Pushed as it changes; poll every 30 sec only if the stream is unavailable
+        let interval: ReturnType<typeof setInterval> | undefined;
+        const unsubscribe = subscribeLive<any, any>('/api/center-status/stream', {
+            onSnapshot: (data) => {
+                setStatusData(data);
+                setLoading(false);
+            },
+            onDelta: (delta) => setStatusData((prev: any) => ({ ...prev, ...delta })),
+            onUnavailable: () => {
+                if (interval) return;
+                fetchStatus();
+                interval = setInterval(fetchStatus, 30000);
+            },
+        });
+        return () => {
+            unsubscribe();
+            if (interval) clearInterval(interval);
+        };
     }, []);
 
     if (loading || !statusData) return null;
 
-    const { status, color, message, waiting_count, remaining_slots } = statusData;
+    const { status, color, message, waiting_count, remaining_slots, expected_wait_minutes } = statusData;
 
     return (
         <Tooltip label={message} placement="bottom-start" hasArrow>
@@ -84,6 +100,18 @@ const HealthCenterStatus: React.FC = () => {
 
                         <Divider orientation="vertical" h="30px" />
 
+                        <VStack align="start" spacing={0} flex="1">
+                            <HStack spacing={1} color="gray.500">
+                                <Icon as={FiClock} boxSize={3} />
+                                <Text fontSize="10px" fontWeight="bold" textTransform="uppercase">Est. Wait</Text>
+                            </HStack>
+                            <Text fontSize="lg" fontWeight="800" color="teal.800">
+                                {status === 'CLOSED' || expected_wait_minutes == null ? '—' : `~${expected_wait_minutes} min`}
+                            </Text>
+                        </VStack>
+
+                        <Divider orientation="vertical" h="30px" />
+
                         <VStack align="start" spacing={0} flex="1">
                             <HStack spacing={1} color="gray.500">
                                 <Icon as={FiActivity} boxSize={3} />
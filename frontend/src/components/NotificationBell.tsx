@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
     Box,
     IconButton,
@@ -15,6 +15,7 @@ import {
     Spinner,
     Flex,
     Icon,
+    Button,
 } from '@chakra-ui/react';
 import { FiBell, FiInfo } from 'react-icons/fi';
 
@@ -28,14 +29,33 @@ const NotificationBell: React.FC<NotificationBellProps> = ({ userId }) => {
     const [loading, setLoading] = useState(false);
     const [isOpen, setIsOpen] = useState(false);
 
+    // Highest id received; polls ask for what is newer (plus recent lower ids that may
+    // have committed late, which are merged in by id)
+    const lastIdRef = useRef<number | null>(null);
+
     const fetchNotifications = async () => {
-        setLoading(true);
+        if (lastIdRef.current === null) setLoading(true);
         try {
-            const response = await fetch(`/api/notifications?user_id=${userId}`);
-            if (response.ok) {
+            let hasMore = true;
+            while (hasMore) {
+                const sinceId = lastIdRef.current;
+                const query = sinceId === null ? '' : `&since_id=${sinceId}`;
+                const response = await fetch(`/api/notifications?user_id=${userId}${query}`);
+                if (!response.ok) break;
                 const data = await response.json();
-                setNotifications(data);
-                setUnreadCount(data.filter((n: any) => !n.is_read).length);
+                setUnreadCount(Number(response.headers.get('X-Unread-Count') ?? 0));
+                if (data.length > 0) {
+                    lastIdRef.current = Math.max(lastIdRef.current ?? 0, data[0].id);
+                    // A poll and an open of the popover can overlap; keep each id once
+                    setNotifications(prev => {
+                        if (sinceId === null) return data;
+                        const known = new Set(prev.map(n => n.id));
+                        const fresh = data.filter((n: any) => !known.has(n.id));
+                        if (fresh.length === 0) return prev;
+                        return [...fresh, ...prev].sort((a, b) => b.id - a.id);
+                    });
+                }
+                hasMore = response.headers.get('X-Has-More') === 'true';
             }
         } catch (error) {
             console.error("Error fetching notifications:", error);
@@ -44,23 +64,34 @@ const NotificationBell: React.FC<NotificationBellProps> = ({ userId }) => {
         }
     };
 
-    const markAsRead = async (id: number) => {
+    const markRead = async (body: { ids: number[] } | { up_to_id: number }) => {
         try {
-            const response = await fetch(`/api/notifications/${id}/read`, {
-                method: 'PUT'
+            const response = await fetch('/api/notifications/read', {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ user_id: userId, ...body })
             });
             if (response.ok) {
-                setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
-                setUnreadCount(prev => Math.max(0, prev - 1));
+                const result = await response.json();
+                const updated = new Set<number>(result.updated);
+                setNotifications(prev => prev.map(n => updated.has(n.id) ? { ...n, is_read: true } : n));
+                setUnreadCount(result.unread_count);
             }
         } catch (error) {
-            console.error("Error marking notification as read:", error);
+            console.error("Error marking notifications as read:", error);
         }
     };
 
+    const markAsRead = (id: number) => markRead({ ids: [id] });
+
+    const markAllAsRead = () => {
+        if (lastIdRef.current !== null) markRead({ up_to_id: lastIdRef.current });
+    };
+
     // Initial fetch
     useEffect(() => {
         if (userId) {
+            lastIdRef.current = null;
             fetchNotifications();
             // Optional: Poll every 30 seconds
             const interval = setInterval(fetchNotifications, 30000);
@@ -105,7 +136,16 @@ const NotificationBell: React.FC<NotificationBellProps> = ({ userId }) => {
             <PopoverContent w="350px" boxShadow="xl">
                 <PopoverArrow />
                 <PopoverCloseButton />
-                <PopoverHeader fontWeight="bold" borderBottomWidth="1px">Notifications</PopoverHeader>
+                <PopoverHeader fontWeight="bold" borderBottomWidth="1px">
+                    <Flex align="center" justify="space-between" pr={6}>
+                        Notifications
+                        {unreadCount > 0 && (
+                            <Button size="xs" variant="ghost" colorScheme="teal" onClick={markAllAsRead}>
+                                Mark all as read
+                            </Button>
+                        )}
+                    </Flex>
+                </PopoverHeader>
                 <PopoverBody maxH="400px" overflowY="auto" p={0}>
                     {loading ? (
                         <Flex justify="center" p={4}><Spinner size="sm" /></Flex>
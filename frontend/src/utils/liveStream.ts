@@ -0,0 +1,36 @@
+// Server-Sent Events from the backend (backEnd/live_events.py): a full
+// `snapshot` when the stream opens, then `delta` events as data changes.
+
+export interface QueueDelta<T> {
+    upsert: T[];
+    remove: number[];
+    order: number[];
+}
+
+interface LiveHandlers<S, D> {
+    onSnapshot: (state: S) => void;
+    onDelta: (delta: D) => void;
+    // Stream refused (e.g. 503 when disabled) or unsupported: fall back to polling
+    onUnavailable: () => void;
+}
+
+export const subscribeLive = <S, D>(url: string, handlers: LiveHandlers<S, D>): (() => void) => {
+    if (typeof EventSource === 'undefined') {
+        handlers.onUnavailable();
+        return () => {};
+    }
+    const source = new EventSource(url);
+    source.addEventListener('snapshot', (e) => handlers.onSnapshot(JSON.parse((e as MessageEvent).data)));
+    source.addEventListener('delta', (e) => handlers.onDelta(JSON.parse((e as MessageEvent).data)));
+    source.onerror = () => {
+        // Dropped connections are retried by EventSource itself; CLOSED means the server said no
+        if (source.readyState === EventSource.CLOSED) handlers.onUnavailable();
+    };
+    return () => source.close();
+};
+
+export const applyQueueDelta = <T extends { id: number }>(rows: T[], delta: QueueDelta<T>): T[] => {
+    const byId = new Map(rows.map(row => [row.id, row]));
+    delta.upsert.forEach(row => byId.set(row.id, row));
+    return delta.order.map(id => byId.get(id)).filter((row): row is T => row !== undefined);
+};